@@ -0,0 +1,91 @@
+"""
+Latency of a users page with total count: sequential queries vs window count vs concurrent queries.
+
+Requires migrated database from settings, seeded rows are removed at the end::
+
+    $ python -m benchmarks.users_list_count --rows 100000 --iterations 200
+"""
+import argparse
+import asyncio
+import functools
+import statistics
+import time
+from typing import Awaitable, Callable
+
+from src.app.config.settings import settings
+from src.app.core.repositories.types import ListCountMode
+from src.app.core.repositories.users import UsersRepository
+from src.app.extensions.db import db
+from src.app.extensions.shards import shards
+
+BENCHMARK_USERNAME = "benchmark"
+FILTER_DATA = {"username": BENCHMARK_USERNAME}
+
+
+async def seed(rows_count: int) -> None:
+    rows = [
+        {"username": BENCHMARK_USERNAME, "email": f"benchmark_{index}@example.com", "meta": {}}
+        for index in range(rows_count)
+    ]
+    await UsersRepository.create_many(rows)
+    analyze = functools.partial(db.status, db.text("ANALYZE users"))
+    await (shards.run_on_each(analyze) if shards.is_enabled else analyze())
+
+
+async def sequential(offset: int, limit: int) -> None:
+    await UsersRepository.get_list(filter_data=FILTER_DATA, limit=limit, offset=offset)
+    await UsersRepository.count(filter_data=FILTER_DATA)
+
+
+async def window(offset: int, limit: int) -> None:
+    await UsersRepository.get_list_with_count(
+        filter_data=FILTER_DATA, limit=limit, offset=offset, mode=ListCountMode.WINDOW
+    )
+
+
+async def concurrent(offset: int, limit: int) -> None:
+    await UsersRepository.get_list_with_count(
+        filter_data=FILTER_DATA, limit=limit, offset=offset, mode=ListCountMode.CONCURRENT
+    )
+
+
+async def measure(
+    func: Callable[[int, int], Awaitable[None]], iterations: int, offset: int, limit: int
+) -> list:
+    await func(offset, limit)  # warm up caches
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await func(offset, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def main(rows_count: int, iterations: int, offset: int, limit: int) -> None:
+    await db.set_bind(settings.POSTGRES_DB_URL)
+    await shards.connect()
+    try:
+        await seed(rows_count)
+        print(f"rows={rows_count} iterations={iterations} offset={offset} limit={limit}")
+        print(f"{'variant':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for func in (sequential, window, concurrent):
+            timings = sorted(await measure(func, iterations, offset, limit))
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            mean, p50 = statistics.mean(timings), statistics.median(timings)
+            print(f"{func.__name__:<12}{mean:>10.2f}{p50:>10.2f}{p95:>10.2f}")
+    finally:
+        await UsersRepository.delete(filter_data=FILTER_DATA)
+        await shards.close()
+        await db.pop_bind().close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=settings.BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.iterations, args.offset, args.limit))
@@ -3,6 +3,7 @@ from typing import Type, Callable
 from starlette.requests import Request
 
 from src.app.core.services.base import Service
+from src.app.core.utils.deadline import set_deadline
 
 
 def get_service(
@@ -13,3 +14,13 @@ def get_service(
         return tmp_service_type
 
     return get_service_inner
+
+
+def with_deadline(seconds: float) -> Callable:
+    """Deadline of the route, shorter than the global one, Depends(with_deadline(2)) in route dependencies"""
+
+    async def with_deadline_inner() -> None:
+        # async, so it is set in the context of the endpoint and not of a threadpool worker
+        set_deadline(seconds)
+
+    return with_deadline_inner
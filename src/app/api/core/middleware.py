@@ -0,0 +1,76 @@
+import asyncio
+from typing import Iterable, Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.app.core.utils.deadline import deadline
+
+
+class DeadlineMiddleware:
+    """
+    Sets the request deadline for repository calls, see core.utils.deadline. Handling of the request
+    is cancelled when the client disconnects before the response is sent or the deadline passes before
+    it is started, queries in flight with it, so connections are released. 504 is returned then
+    if the response is not started. A started response is not cut off by the deadline and the app
+    is awaited after the response is sent, background tasks run then.
+    Streaming paths, like exports, are cancelled by the disconnect only.
+    """
+
+    def __init__(
+        self, app: ASGIApp, timeout: Optional[float] = None, exclude_paths: Iterable[str] = ()
+    ) -> None:
+        self.app = app
+        self.timeout = timeout or None  # seconds, 0 or None - only routes deadlines are applied
+        self.exclude_paths = set(exclude_paths)
+
+    @staticmethod
+    async def _listen(receive: Receive, messages: asyncio.Queue) -> None:
+        # messages are passed to the app, the disconnect one cancels it
+        while True:
+            message = await receive()
+            await messages.put(message)
+            if message["type"] == "http.disconnect":
+                return
+
+    @staticmethod
+    def _disconnected(listener: asyncio.Future) -> bool:
+        # the listener is cancelled once the response is sent
+        return listener.done() and not listener.cancelled()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout = None if scope.get("path") in self.exclude_paths else self.timeout
+        messages: asyncio.Queue = asyncio.Queue()
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            response_started = True
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                # the disconnect after the response is sent is not an abort
+                listener.cancel()
+            await send(message)
+
+        with deadline(timeout):
+            handler = asyncio.ensure_future(self.app(scope, messages.get, send_wrapper))
+        listener = asyncio.ensure_future(self._listen(receive, messages))
+        try:
+            await asyncio.wait({handler, listener}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            while response_started and not handler.done() and not self._disconnected(listener):
+                pending = {task for task in (handler, listener) if not task.done()}
+                await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            disconnected = self._disconnected(listener)
+        finally:
+            listener.cancel()
+            if not handler.done():
+                handler.cancel()
+                await asyncio.gather(handler, return_exceptions=True)
+        if not handler.cancelled():
+            handler.result()  # exceptions of the app are raised as is
+        elif not disconnected and not response_started:
+            response = JSONResponse({"detail": "Deadline exceeded"}, status_code=504)
+            await response(scope, receive, send)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from fastapi import Query
 from pydantic import BaseModel
 
@@ -11,3 +13,4 @@ class BaseReq(BaseModel):
 class ListReq(BaseReq):
     limit: int = Query(default=settings.BATCH_SIZE, gt=0, description="Limit items in query")
     offset: int = Query(default=0, gt=-1, description="Offset items in query")
+    cursor: Optional[str] = Query(default=None, description="Cursor of the next page, offset is ignored")
@@ -1,5 +1,5 @@
 import uuid
-from typing import List, Any
+from typing import List, Any, Optional
 
 from pydantic import BaseModel
 from pydantic.class_validators import validator
@@ -20,4 +20,6 @@ class UUIDResp(BaseResp):
 
 class ListResp(BaseResp):
     count: int = 0
+    is_count_approximate: bool = False
     results: List[Any] = []
+    next_cursor: Optional[str] = None
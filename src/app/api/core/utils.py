@@ -1,5 +1,79 @@
-from typing import List, Any
+import csv
+import io
+import json
+import uuid
+from datetime import date
+from typing import List, Any, Optional, AsyncIterator
 
+from fastapi import HTTPException
 
-def to_paginated_resp(data: List[Any], total_count: int) -> dict:
-    return {"count": total_count, "results": data}
+
+def to_paginated_resp(
+    data: List[Any],
+    total_count: int,
+    next_cursor: Optional[str] = None,
+    is_count_approximate: bool = False,
+) -> dict:
+    return {
+        "count": total_count,
+        "is_count_approximate": is_count_approximate,
+        "results": data,
+        "next_cursor": next_cursor,
+    }
+
+
+def parse_fields(
+    fields: Optional[str], allowed: List[str], required: Optional[List[str]] = None
+) -> List[str]:
+    """
+    :param fields: str - comma separated fields of the request
+    :param allowed: list[str] - fields of the response
+    :param required: list[str] - fields returned anyway
+    :return: list[str] - requested and required fields in order of allowed ones, all allowed if not requested
+    """
+    if not fields:
+        return list(allowed)
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    if requested - set(allowed):
+        raise HTTPException(status_code=422, detail=f"Invalid value {fields}")
+    requested.update(required or [])
+    return [field for field in allowed if field in requested]
+
+
+def to_export_value(value: Any) -> Any:
+    # same representation as in responses
+    if isinstance(value, uuid.UUID):
+        return value.hex
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+async def to_ndjson(batches: AsyncIterator[list], fields: List[str]) -> AsyncIterator[str]:
+    """
+    :param batches: async iterator of rows lists
+    :param fields: list[str] - fields of rows to export
+    :return: async iterator of JSON lines, a chunk per batch
+    """
+    async for rows in batches:
+        yield "".join(
+            json.dumps({field: to_export_value(row[field]) for field in fields}) + "\n" for row in rows
+        )
+
+
+async def to_csv(batches: AsyncIterator[list], fields: List[str]) -> AsyncIterator[str]:
+    """
+    :param batches: async iterator of rows lists
+    :param fields: list[str] - fields of rows to export, the header
+    :return: async iterator of CSV lines, the header and a chunk per batch
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for rows in batches:
+        writer.writerows([to_export_value(row[field]) for field in fields] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()  # header of an empty export
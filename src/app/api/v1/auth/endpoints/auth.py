@@ -41,7 +41,7 @@ async def tokens_refreshed(
 ) -> dict:
     """Get new access, refresh tokens [Granted by refresh token in header]"""
 
-    user = await user_service.get_first(filter_data={"uuid": refresh_data["uuid"]})
+    user = await user_service.get_first(filter_data={"uuid": refresh_data["uuid"]}, batched=True)
 
     new_tokens = jwt_service.create_tokens_pair(  # noqa
         uuid=str(user.uuid),
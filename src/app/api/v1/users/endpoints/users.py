@@ -1,17 +1,71 @@
 from fastapi import APIRouter, Depends
+from starlette.responses import StreamingResponse
 
 from src.app.api.core.dependencies import get_service
-from src.app.api.v1.users.schemas.resp_schemas import UserResp
+from src.app.api.core.utils import to_paginated_resp, parse_fields, to_csv, to_ndjson
+from src.app.api.v1.users.schemas.req_schemas import (
+    ExportFormat,
+    UserFieldsReq,
+    UsersExportReq,
+    UsersListReq,
+)
+from src.app.api.v1.users.schemas.resp_schemas import UserResp, UsersListResp
 from src.app.core.services.jwt import JWTService
 from src.app.core.services.users import UsersService
 
 router = APIRouter(prefix="/users")
 
+USER_RESP_FIELDS = list(UserResp.__fields__)
+EXPORT_MEDIA_TYPES = {ExportFormat.NDJSON: "application/x-ndjson", ExportFormat.CSV: "text/csv"}
 
-@router.get(path="/me/", response_model=UserResp, name="users:get-current-user-info")
+
+@router.get(path="/", response_model=UsersListResp, response_model_exclude_unset=True, name="users:get-users")
+async def get_users_list(
+    params: UsersListReq = Depends(),
+    user_service: UsersService = Depends(get_service(UsersService)),
+    access_data: dict = Depends(JWTService.access_auth_data),
+) -> dict:
+    fields = parse_fields(params.fields, USER_RESP_FIELDS, required=["uuid"])
+    users, total_count, is_count_approximate, next_cursor = await user_service.get_users(
+        limit=params.limit, offset=params.offset, cursor=params.cursor, fields=fields
+    )
+    return to_paginated_resp(
+        data=[user.dict(include=set(fields)) for user in users],
+        total_count=total_count,
+        next_cursor=next_cursor,
+        is_count_approximate=is_count_approximate,
+    )
+
+
+@router.get(
+    path="/me/",
+    response_model=UserResp,
+    response_model_exclude_unset=True,
+    name="users:get-current-user-info",
+)
 async def get_users(
+    params: UserFieldsReq = Depends(),
     user_service: UsersService = Depends(get_service(UsersService)),
     access_data: dict = Depends(JWTService.access_auth_data),
 ) -> dict:
-    user = await user_service.get_first(filter_data={"uuid": access_data["uuid"]})
-    return user.dict()
+    fields = parse_fields(params.fields, USER_RESP_FIELDS, required=["uuid"])
+    user = await user_service.get_first(
+        filter_data={"uuid": access_data["uuid"]}, fields=fields, batched=True
+    )
+    return user.dict(include=set(fields))
+
+
+@router.get(path="/export/", name="users:export-users")
+async def export_users(
+    params: UsersExportReq = Depends(),
+    user_service: UsersService = Depends(get_service(UsersService)),
+    access_data: dict = Depends(JWTService.access_auth_data),
+) -> StreamingResponse:
+    fields = parse_fields(params.fields, USER_RESP_FIELDS, required=["uuid"])
+    batches = user_service.iter_users_batches(filter_data=params.to_filter_data(), fields=fields)
+    serialize = to_csv if params.format == ExportFormat.CSV else to_ndjson
+    return StreamingResponse(
+        serialize(batches, fields),
+        media_type=EXPORT_MEDIA_TYPES[params.format],
+        headers={"Content-Disposition": f"attachment; filename=users.{params.format.value}"},
+    )
@@ -0,0 +1,41 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from fastapi import Query
+
+from src.app.api.core.schemas.req_schemas import BaseReq, ListReq
+
+
+class UserFieldsReq(BaseReq):
+    fields: Optional[str] = Query(
+        default=None, description="Comma separated fields to return, all by default"
+    )
+
+
+class UsersListReq(ListReq, UserFieldsReq):
+    pass
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class UsersExportReq(UserFieldsReq):
+    format: ExportFormat = Query(default=ExportFormat.NDJSON, description="Format of the export")
+    is_active: Optional[bool] = Query(default=None)
+    gender: Optional[str] = Query(default=None)
+    created_from: Optional[datetime] = Query(default=None, description="Users created at or after")
+    created_to: Optional[datetime] = Query(default=None, description="Users created before")
+    updated_from: Optional[datetime] = Query(default=None, description="Users updated at or after")
+
+    def to_filter_data(self) -> dict:
+        filter_data = {
+            "is_active": self.is_active,
+            "gender": self.gender,
+            "created_at__gte": self.created_from,
+            "created_at__lt": self.created_to,
+            "updated_at__gte": self.updated_from,
+        }
+        return {field: value for field, value in filter_data.items() if value is not None}
@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
-from src.app.api.core.schemas.resp_schemas import UUIDResp
+from src.app.api.core.schemas.resp_schemas import UUIDResp, ListResp
 
 
 class UserResp(UUIDResp):
@@ -15,3 +15,7 @@ class UserResp(UUIDResp):
     first_name: Optional[str]
     middle_name: Optional[str]
     last_name: Optional[str]
+
+
+class UsersListResp(ListResp):
+    results: List[UserResp] = []
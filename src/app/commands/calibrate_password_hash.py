@@ -0,0 +1,66 @@
+"""
+Picks the bcrypt cost of this machine: the highest one hashing a password within the target time.
+Set the printed value as PASSWORD_HASH_ROUNDS, hashes of other costs are updated on login.
+
+Run it on the production hardware::
+
+    $ python -m src.app.commands.calibrate_password_hash --target-ms 250
+"""
+import argparse
+import statistics
+import time
+from typing import Dict, Tuple
+
+from loguru import logger
+from passlib.hash import bcrypt
+
+MIN_ROUNDS = 4
+MAX_ROUNDS = 16
+
+
+def measure(rounds: int, samples: int) -> float:
+    """
+    :return: float - median seconds of hashing a password with the cost
+    """
+    hasher = bcrypt.using(rounds=rounds)
+    durations = []
+    for _ in range(samples):
+        started_at = time.perf_counter()
+        hasher.hash("calibrate-password")
+        durations.append(time.perf_counter() - started_at)
+    return statistics.median(durations)
+
+
+def calibrate(
+    target_seconds: float, samples: int = 3, min_rounds: int = MIN_ROUNDS, max_rounds: int = MAX_ROUNDS
+) -> Tuple[int, Dict[int, float]]:
+    """
+    :param target_seconds: float - the longest hashing time per password
+    :param samples: int - hashes per cost, the median is taken
+    :param min_rounds: int - cost returned even if it is over the target
+    :param max_rounds: int - the highest cost to check
+    :return: tuple - picked cost and measured seconds by cost
+    """
+    if not MIN_ROUNDS <= min_rounds <= max_rounds <= MAX_ROUNDS:
+        raise ValueError(f"Not supported rounds range {min_rounds}-{max_rounds}")
+    timings: Dict[int, float] = {}
+    rounds = min_rounds
+    for cost in range(min_rounds, max_rounds + 1):
+        timings[cost] = measure(cost, samples)
+        logger.info(f"Cost {cost}: {timings[cost] * 1000:.1f}ms")
+        if timings[cost] > target_seconds:
+            # every next cost takes twice as long
+            break
+        rounds = cost
+    return rounds, timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--target-ms", type=float, default=250, help="the longest hashing time")
+    parser.add_argument("--samples", type=int, default=3)
+    args = parser.parse_args()
+    picked, _ = calibrate(args.target_ms / 1000, samples=args.samples)
+    print(f"PASSWORD_HASH_ROUNDS={picked}")
@@ -0,0 +1,145 @@
+"""
+Bulk import of users from CSV or NDJSON, rows are streamed by batches through COPY into a staging
+table and merged into users on email. Missing uuid and secret are generated per row.
+
+Requires migrated database from settings::
+
+    $ python -m src.app.commands.import_users users.csv --batch-size 10000
+    $ cat users.ndjson | python -m src.app.commands.import_users - --format ndjson --on-conflict skip
+"""
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List
+
+from loguru import logger
+
+from src.app.config.settings import settings
+from src.app.core.repositories.users import UsersRepository
+from src.app.extensions.db import db
+from src.app.extensions.shards import shards
+
+CONFLICT_FIELDS = ["email"]
+TRUE_VALUES = ("1", "true", "t", "yes", "y")
+PARSERS: Dict[type, Callable[[str], Any]] = {
+    datetime: datetime.fromisoformat,
+    bool: lambda value: value.lower() in TRUE_VALUES,
+    dict: json.loads,
+    list: json.loads,
+}
+
+
+def parse_value(column: Any, value: Any) -> Any:
+    """
+    :param column: Column - column of users table
+    :param value: Any - value as read from the input, CSV values are strings
+    :return: Any - value of the column python type, empty strings are None unless the column is
+        a not nullable string one
+    """
+    if not isinstance(value, str):
+        return value
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = str
+    if value == "" and (column.nullable or python_type is not str):
+        return None
+    if python_type is str:
+        return value
+    return PARSERS.get(python_type, python_type)(value)
+
+
+def parse_row(row: dict) -> dict:
+    columns = UsersRepository.MODEL.__table__.columns
+    return {
+        field: parse_value(columns[field], value) if field in columns else value
+        for field, value in row.items()
+    }
+
+
+def read_csv(stream: IO[str]) -> Iterator[dict]:
+    for row in csv.DictReader(stream):
+        yield parse_row(row)
+
+
+def read_ndjson(stream: IO[str]) -> Iterator[dict]:
+    for line in stream:
+        if line.strip():
+            yield parse_row(json.loads(line))
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+def batched(rows: Iterable[dict], batch_size: int) -> Iterator[List[dict]]:
+    """Batches of up to batch_size rows, a batch is cut earlier when the rows fields change"""
+    batch: List[dict] = []
+    for row in rows:
+        if batch and (len(batch) >= batch_size or row.keys() != batch[0].keys()):
+            yield batch
+            batch = []
+        batch.append(row)
+    if batch:
+        yield batch
+
+
+async def import_users(
+    rows: Iterable[dict],
+    batch_size: int = settings.IMPORT_BATCH_SIZE,
+    on_conflict: str = "update",
+    merge_meta: bool = False,
+) -> dict:
+    """
+    :param rows: Iterable[dict] - users data, read lazily
+    :param batch_size: int - max rows per COPY, one transaction per batch
+    :param on_conflict: str - "update" existing users with the same email or "skip" them
+    :param merge_meta: bool - merge meta of existing users instead of replacing it
+    :return: dict - counts of read and affected (created or updated) rows
+    """
+    if batch_size < 1:
+        raise ValueError("Not supported batch_size less than 1")
+    if on_conflict not in ("update", "skip"):
+        raise ValueError(f"Not supported on_conflict {on_conflict}")
+    stats = {"read": 0, "affected": 0}
+    started_at = time.perf_counter()
+    for batch in batched(rows, batch_size):
+        stats["affected"] += await UsersRepository.copy_upsert(
+            batch,
+            conflict_fields=CONFLICT_FIELDS,
+            update_fields=[] if on_conflict == "skip" else None,
+            merge_fields=["meta"] if merge_meta else None,
+        )
+        stats["read"] += len(batch)
+        rate = stats["read"] / (time.perf_counter() - started_at)
+        logger.info(f"Users import: {stats['read']} read, {stats['affected']} affected, {rate:.0f} rows/s")
+    return stats
+
+
+async def main(path: str, format: str, batch_size: int, on_conflict: str, merge_meta: bool) -> None:
+    stream: IO[str] = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    await db.set_bind(settings.POSTGRES_DB_URL)
+    await shards.connect()
+    try:
+        await import_users(READERS[format](stream), batch_size, on_conflict, merge_meta)
+    finally:
+        await shards.close()
+        await db.pop_bind().close()
+        if stream is not sys.stdin:
+            stream.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("path", help="CSV or NDJSON file, - to read stdin")
+    parser.add_argument("--format", choices=sorted(READERS), default="csv")
+    parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+    parser.add_argument("--on-conflict", choices=["update", "skip"], default="update")
+    parser.add_argument("--merge-meta", action="store_true", help="merge meta of existing users")
+    args = parser.parse_args()
+    asyncio.run(main(args.path, args.format, args.batch_size, args.on_conflict, args.merge_meta))
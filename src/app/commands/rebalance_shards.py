@@ -0,0 +1,128 @@
+"""
+Moves users to the shards of their uuid after shards are added and fills the shard directory.
+Run it with POSTGRES_SHARD_MIGRATING=True set for the app till it finishes, so lookups of rows
+not moved yet fall back to all shards. It may be stopped and run again.
+
+Requires migrated default database and shards from settings::
+
+    $ python -m src.app.commands.rebalance_shards --batch-size 1000
+    $ python -m src.app.commands.rebalance_shards --dry-run
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List, Type
+
+from loguru import logger
+
+from src.app.config.settings import settings
+from src.app.core.repositories.shard_directory import ShardDirectoryRepository
+from src.app.core.repositories.sharded import ShardedPSQLRepository
+from src.app.core.repositories.uow import UnitOfWork
+from src.app.core.repositories.users import UsersRepository
+from src.app.extensions.db import db
+from src.app.extensions.shards import Shard, shards
+
+
+async def move_rows(
+    repository: Type[ShardedPSQLRepository], rows: List[Any], source: Shard, target: Shard
+) -> None:
+    """
+    Copies rows to the target shard, points the directory to it and deletes rows from the source one.
+    Rows of the shard key values copied before are replaced, so a stopped move is repeated safely.
+    """
+    keys = [getattr(row, repository.SHARD_KEY) for row in rows]
+    key_filter = {f"{repository.SHARD_KEY}{repository._ATR_SEPARATOR}in": keys}
+    # ids are generated by the target shard
+    values = [{field: value for field, value in row.to_dict().items() if field != "id"} for row in rows]
+
+    with shards.using(target):
+        async with UnitOfWork():
+            await repository.delete(filter_data=key_filter)
+            await repository.create_many(values)
+    await update_directory(repository, values, target)
+    with shards.using(source):
+        await repository.delete(filter_data=key_filter)
+
+
+async def update_directory(repository: Type[ShardedPSQLRepository], values: List[dict], shard: Shard) -> None:
+    entries = repository._directory_entries(values, shard)
+    if entries:
+        with shards.using(None):
+            await ShardDirectoryRepository.upsert_many(entries, conflict_fields=["key_type", "key"])
+
+
+async def rebalance_shard(
+    repository: Type[ShardedPSQLRepository], shard: Shard, batch_size: int, dry_run: bool
+) -> Dict[str, int]:
+    """
+    :return: dict - counts of checked and moved rows of the shard
+    """
+    stats = {"checked": 0, "moved": 0}
+    last_id = 0
+    while True:
+        with shards.using(shard):
+            rows = await repository.get_list(
+                filter_data={"id__gt": last_id}, order_by=["id"], limit=batch_size
+            )
+        if not rows:
+            return stats
+        last_id = rows[-1].id
+        stats["checked"] += len(rows)
+
+        by_target: Dict[int, list] = {}
+        for row in rows:
+            target = repository.shard_of(getattr(row, repository.SHARD_KEY))
+            by_target.setdefault(target.index, []).append(row)
+        for index, target_rows in by_target.items():
+            if index != shard.index:
+                stats["moved"] += len(target_rows)
+                if not dry_run:
+                    await move_rows(repository, target_rows, shard, shards.shards[index])
+            elif not dry_run:
+                # rows created before sharding have no directory entries
+                await update_directory(repository, [row.to_dict() for row in target_rows], shard)
+        logger.info(f"Shard {shard.index}: {stats['checked']} checked, {stats['moved']} moved")
+
+
+async def rebalance(
+    repository: Type[ShardedPSQLRepository] = UsersRepository,
+    batch_size: int = settings.WRITE_CHUNK_SIZE,
+    dry_run: bool = False,
+) -> Dict[int, dict]:
+    """
+    :param repository: type - repository of the sharded table
+    :param batch_size: int - rows read from a shard and moved at once
+    :param dry_run: bool - only count rows to move
+    :return: dict - counts of checked and moved rows by shard index
+    """
+    if batch_size < 1:
+        raise ValueError("Not supported batch_size less than 1")
+    if not shards.is_enabled:
+        raise ValueError("Not supported rebalance without shards, set POSTGRES_SHARD_DB_URLS")
+    started_at = time.perf_counter()
+    stats = {}
+    for shard in shards.shards:
+        stats[shard.index] = await rebalance_shard(repository, shard, batch_size, dry_run)
+    logger.info(f"Shards rebalanced in {time.perf_counter() - started_at:.1f}s: {stats}")
+    return stats
+
+
+async def main(batch_size: int, dry_run: bool) -> None:
+    await db.set_bind(settings.POSTGRES_DB_URL)
+    await shards.connect()
+    try:
+        await rebalance(batch_size=batch_size, dry_run=dry_run)
+    finally:
+        await shards.close()
+        await db.pop_bind().close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--batch-size", type=int, default=settings.WRITE_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only count rows to move")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.dry_run))
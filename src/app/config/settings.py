@@ -33,14 +33,29 @@ class SettingsBase(PydanticSettings):
     # Auth settings
     # --------------------------------------------------------------------------
     ALGORITHM = "HS256"
+    JWT_CODEC: str = env.str("JWT_CODEC", "hs256")  # hs256 or jose, tokens of both are decoded by each
     ACCESS_TOKEN_EXPIRES_MINUTES = env.int("ACCESS_TOKEN_EXPIRES_MINUTES", 30)
     REFRESH_TOKEN_EXPIRES_DAYS = env.int("REFRESH_TOKEN_EXPIRES_DAYS", 7)
+    ACCESS_TOKEN_CACHE_SIZE: int = env.int(
+        "ACCESS_TOKEN_CACHE_SIZE", 10000
+    )  # verified access tokens kept decoded till they expire, 0 disables
+    PASSWORD_HASH_ROUNDS: int = env.int(
+        "PASSWORD_HASH_ROUNDS", 12
+    )  # bcrypt cost, see commands.calibrate_password_hash, other hashes are updated on login
+    PASSWORD_HASH_EXECUTOR: str = env.str("PASSWORD_HASH_EXECUTOR", "thread")  # thread or process
+    PASSWORD_HASH_WORKERS: int = env.int(
+        "PASSWORD_HASH_WORKERS", os.cpu_count() or 1
+    )  # parallel hashing calls
+    PASSWORD_HASH_MAX_WAITING: int = env.int(
+        "PASSWORD_HASH_MAX_WAITING", 100
+    )  # calls waiting for a worker, 503 over it, 0 - no limit
 
     # API settings
     # --------------------------------------------------------------------------
     API: str = "/api"
     OPENAPI_URL: Optional[str] = f"{API}/openapi.json"
     BATCH_SIZE: int = env.int("BATCH_SIZE", 25)  # default limit of items
+    REQUEST_TIMEOUT: float = env.float("REQUEST_TIMEOUT", 0)  # seconds, deadline of requests, 0 disables
 
     # Postgres settings
     # --------------------------------------------------------------------------
@@ -54,6 +69,49 @@ class SettingsBase(PydanticSettings):
     )
     POSTGRES_POOL_MIN_SIZE: int = env.int("POSTGRES_POOL_MIN_SIZE", 5)
     POSTGRES_POOL_MAX_SIZE: int = env.int("POSTGRES_POOL_MAX_SIZE", 75)
+    POSTGRES_POOL_ACQUIRE_TIMEOUT: float = env.float(
+        "POSTGRES_POOL_ACQUIRE_TIMEOUT", 5
+    )  # seconds, 0 disables
+    POSTGRES_STATEMENT_CACHE_SIZE: int = env.int("POSTGRES_STATEMENT_CACHE_SIZE", 512)  # per connection
+    # comma separated, kept as str: pydantic parses list env vars as JSON
+    POSTGRES_REPLICA_DB_URLS: str = env.str("POSTGRES_REPLICA_DB_URLS", "")  # reads go to replicas
+    POSTGRES_REPLICA_MAX_LAG: float = env.float("POSTGRES_REPLICA_MAX_LAG", 5)  # seconds
+    POSTGRES_REPLICA_CHECK_PERIOD: float = env.float("POSTGRES_REPLICA_CHECK_PERIOD", 5)  # seconds
+    POSTGRES_REPLICA_HEDGE_DELAY: float = env.float("POSTGRES_REPLICA_HEDGE_DELAY", 0)  # seconds, 0 disables
+    POSTGRES_PRIMARY_STICKINESS: float = env.float("POSTGRES_PRIMARY_STICKINESS", 2)  # seconds after writes
+    POSTGRES_SHARD_DB_URLS: str = env.str("POSTGRES_SHARD_DB_URLS", "")  # comma separated, sharded tables
+    POSTGRES_SHARD_MIGRATING: bool = env.bool(
+        "POSTGRES_SHARD_MIGRATING", False
+    )  # lookups missing on the shard of a key fall back to all shards while rebalancing
+
+    # Repositories settings
+    # --------------------------------------------------------------------------
+    QUERY_CACHE_SIZE: int = env.int("QUERY_CACHE_SIZE", 512)  # count of cached query shapes
+    BULK_CHUNK_SIZE: int = env.int("BULK_CHUNK_SIZE", 1000)  # max rows per bulk statement
+    WRITE_CHUNK_SIZE: int = env.int("WRITE_CHUNK_SIZE", 1000)  # rows per chunk of batched updates and deletes
+    WRITE_CHUNK_PAUSE: float = env.float("WRITE_CHUNK_PAUSE", 0)  # seconds between chunks
+    IMPORT_BATCH_SIZE: int = env.int("IMPORT_BATCH_SIZE", 10000)  # rows per COPY of users import
+    ITER_PREFETCH_SIZE: int = env.int("ITER_PREFETCH_SIZE", 1000)  # rows per server-side cursor fetch
+    COUNT_STRATEGY: str = env.str("COUNT_STRATEGY", "auto")  # exact, estimate or auto
+    COUNT_EXACT_THRESHOLD: int = env.int("COUNT_EXACT_THRESHOLD", 10000)  # auto strategy counts exactly below
+    COUNT_CACHE_SIZE: int = env.int("COUNT_CACHE_SIZE", 1024)
+    COUNT_CACHE_TTL: float = env.float("COUNT_CACHE_TTL", 30)  # seconds
+    LIST_COUNT_MODE: str = env.str("LIST_COUNT_MODE", "concurrent")  # concurrent or window
+    RESULT_CACHE_BACKEND: str = env.str("RESULT_CACHE_BACKEND", "local")  # local or redis
+    RESULT_CACHE_SIZE: int = env.int("RESULT_CACHE_SIZE", 4096)  # entries of the local backend
+    RESULT_CACHE_TTL: float = env.float("RESULT_CACHE_TTL", 0)  # seconds, 0 disables
+    REDIS_URL: str = env.str("REDIS_URL", "redis://127.0.0.1:6379/0")
+    LOADER_WINDOW: float = env.float(
+        "LOADER_WINDOW", 0
+    )  # seconds to collect batched lookups, 0 - one loop tick
+    LOADER_MAX_BATCH_SIZE: int = env.int("LOADER_MAX_BATCH_SIZE", 1000)
+    SLOW_QUERY_THRESHOLD: float = env.float("SLOW_QUERY_THRESHOLD", 0.5)  # seconds
+    SLOW_QUERY_EXPLAIN_RATE: float = env.float(
+        "SLOW_QUERY_EXPLAIN_RATE", 0
+    )  # share of slow reads, 0 disables
+    SLOW_QUERY_LOG_SIZE: int = env.int("SLOW_QUERY_LOG_SIZE", 100)  # last slow queries kept in memory
+    QUERY_SHAPES_SIZE: int = env.int("QUERY_SHAPES_SIZE", 1024)  # filter shapes observed by the index advisor
+    INDEX_ADVISOR_REPORT: bool = env.bool("INDEX_ADVISOR_REPORT", False)  # log suggested indexes on shutdown
 
 
 class SettingsLocal(SettingsBase):
@@ -61,7 +119,7 @@ class SettingsLocal(SettingsBase):
 
 
 class SettingsTest(SettingsBase):
-    pass
+    PASSWORD_HASH_ROUNDS: int = env.int("PASSWORD_HASH_ROUNDS", 4)  # the cheapest bcrypt cost
 
 
 class SettingsProd(SettingsBase):
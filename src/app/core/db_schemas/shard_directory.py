@@ -0,0 +1,14 @@
+from src.app.extensions.db import db
+
+
+class ShardDirectory(db.Model):
+    """Shards of entities by lookup keys other than the shard key, lives in the default database"""
+
+    __tablename__ = "shard_directory"
+
+    id = db.Column(db.BigInteger(), primary_key=True, autoincrement=True)
+    key_type = db.Column(db.String(64), nullable=False)  # <table>.<field>, e.g. users.email
+    key = db.Column(db.String(255), nullable=False)
+    shard = db.Column(db.SmallInteger(), nullable=False)
+
+    _key_idx = db.Index("ix_shard_directory_key_type_key", "key_type", "key", unique=True)
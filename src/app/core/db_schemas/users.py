@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy.dialects.postgresql import UUID, JSON
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy import func
 from src.app.extensions.db import db
 from src.app.core.utils.common import generate_str
@@ -9,9 +9,9 @@ class User(db.Model):
     __tablename__ = "users"
 
     id = db.Column(db.BigInteger(), primary_key=True, autoincrement=True)
-    uuid = db.Column(UUID, primary_key=True, nullable=False, index=True, default=uuid.uuid4())
-    meta = db.Column(JSON, nullable=False, default=dict())
-    secret = db.Column(db.String(24), nullable=False, unique=True, default=generate_str())
+    uuid = db.Column(UUID, primary_key=True, nullable=False, index=True, default=uuid.uuid4)
+    meta = db.Column(JSONB, nullable=False, default=dict())
+    secret = db.Column(db.String(24), nullable=False, unique=True, default=generate_str)
     created_at = db.Column(db.DateTime, nullable=False, default=func.now())
     updated_at = db.Column(
         db.DateTime,
@@ -29,3 +29,6 @@ class User(db.Model):
     middle_name = db.Column(db.String(64), nullable=True)
     last_name = db.Column(db.String(64), nullable=True)
     is_active = db.Column(db.Boolean, default=True)
+
+    # containment (meta @> ...) and key (meta ? ...) lookups
+    _meta_idx = db.Index("ix_users_meta", "meta", postgresql_using="gin")
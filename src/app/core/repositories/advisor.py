@@ -0,0 +1,177 @@
+import re
+from typing import Any, List, Optional, Tuple
+
+from loguru import logger
+
+from src.app.core.repositories.instrumentation import query_shapes
+from src.app.extensions.db import db
+
+EQUALITY_LOOKUPS = ("==", "in")
+RANGE_LOOKUPS = ("<", "<=", ">", ">=", "range")
+JSON_LOOKUPS = ("contains", "has_key")  # served by GIN indexes
+INDEXDEF_RE = re.compile(r" USING (\w+) \((.+?)\)(?: WHERE (.+))?$")
+INDEXES_QUERY = "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = :table"
+
+
+def _condition(repository: Any, item: tuple) -> tuple[Optional[int], Optional[str]]:
+    """
+    :return: tuple - index of the conditions list (equal, ranges, nulls, json) and the column or predicate
+    """
+    column, _, operator = item[0].partition(repository._ATR_SEPARATOR)
+    lookup = repository.COMPARE_OPERATORS_MAP.get(operator) if operator else "=="
+    if len(item) == 2 and lookup in ("==", "!=", "isnull"):
+        is_null = item[1] if lookup == "isnull" else lookup == "=="
+        return 2, f"{column} IS NULL" if is_null else f"{column} IS NOT NULL"
+    if lookup in EQUALITY_LOOKUPS:
+        return 0, column
+    if lookup in RANGE_LOOKUPS:
+        return 1, column
+    if lookup in JSON_LOOKUPS:
+        return 3, column
+    return None, None
+
+
+def _conditions(repository: Any, shape: tuple) -> tuple[list, list, list, list]:
+    """
+    :return: tuple - columns compared by equality, by range, IS NULL predicates and json columns,
+        conditions under OR groups and lookups not served by btree or GIN (ilike, !=) are skipped
+    """
+    conditions: tuple[list, list, list, list] = ([], [], [], [])
+    for item in shape:
+        if item[0] == "__and":
+            for sub_shape in item[1]:
+                for index, items in enumerate(_conditions(repository, sub_shape)):
+                    conditions[index].extend(value for value in items if value not in conditions[index])
+            continue
+        if item[0] in repository.GROUP_OPERATORS_MAP:
+            continue
+        position, value = _condition(repository, item)
+        if position is not None and value not in conditions[position]:
+            conditions[position].append(value)
+    return conditions
+
+
+def _btree_suggestion(
+    equal: list, ranges: list, nulls: list, order_by: Optional[tuple]
+) -> Optional[tuple[list, Optional[str]]]:
+    """
+    Equality columns go first, then one range column, or the ordering columns if there is no range.
+
+    :return: tuple - columns and partial index predicate, None if nothing to index
+    """
+    columns = list(equal)
+    if ranges:
+        columns.append(ranges[0])
+    else:
+        columns.extend(field.lstrip("-") for field in order_by or () if field.lstrip("-") not in columns)
+    if not columns:
+        # IS NULL conditions only, the columns are indexed themselves
+        return ([predicate.split(" ")[0] for predicate in nulls], None) if nulls else None
+    return columns, " AND ".join(nulls) or None
+
+
+def _parsed_indexes(rows: list) -> list[dict]:
+    indexes = []
+    for name, definition in rows:
+        match = INDEXDEF_RE.search(definition)
+        if match is None:
+            continue
+        using, columns, where = match.groups()
+        indexes.append(
+            {
+                "name": name,
+                "using": using,
+                "columns": [column.strip().split(" ")[0].strip('"') for column in columns.split(",")],
+                "where": where,
+            }
+        )
+    return indexes
+
+
+def _normalized_predicate(predicate: Optional[str]) -> Optional[str]:
+    return re.sub(r"[()\s]+", " ", predicate).strip().lower() if predicate else None
+
+
+def _btree_covers(index: dict, columns: list, equal_count: int, where: Optional[str]) -> bool:
+    index_columns = index["columns"]
+    if len(index_columns) < len(columns):
+        return False
+    # equality columns may go in any order, the rest of columns in the suggested one
+    if set(index_columns[:equal_count]) != set(columns[:equal_count]):
+        return False
+    if index_columns[equal_count : len(columns)] != columns[equal_count:]:  # noqa: E203
+        return False
+    # a full index serves the partial predicate too, a partial one only the same predicate
+    return index["where"] is None or _normalized_predicate(index["where"]) == _normalized_predicate(where)
+
+
+def _is_covered(indexes: list, using: str, columns: list, equal_count: int, where: Optional[str]) -> bool:
+    for index in indexes:
+        if index["using"] != using:
+            continue
+        if using == "gin" and columns[0] in index["columns"]:
+            return True
+        if using == "btree" and _btree_covers(index, columns, equal_count, where):
+            return True
+    return False
+
+
+def _statement(table: str, using: str, columns: list, where: Optional[str]) -> str:
+    name = f"ix_{table}_{'_'.join(columns)}{'_partial' if where else ''}"
+    using_sql = f" USING {using}" if using != "btree" else ""
+    where_sql = f" WHERE {where}" if where else ""
+    return f"CREATE INDEX CONCURRENTLY {name} ON {table}{using_sql} ({', '.join(columns)}){where_sql}"
+
+
+async def suggest_indexes(min_calls: int = 1) -> List[dict]:
+    """
+    Checks filter shapes and orderings observed by repositories against indexes of pg_indexes.
+
+    :param min_calls: int - shapes called less times are skipped
+    :return: list - missing indexes ranked by total time of the calls they would serve
+    """
+    indexes: dict = {}
+    suggestions: dict = {}
+    for (repository, shape, order_by), stats in query_shapes.items():
+        if stats["calls"] < min_calls:
+            continue
+        table = repository.MODEL.__tablename__
+        if table not in indexes:
+            indexes[table] = _parsed_indexes(await db.all(db.text(INDEXES_QUERY), table=table))
+        equal, ranges, nulls, json = _conditions(repository, shape)
+
+        # index type, columns, count of equality columns and partial index predicate
+        candidates: List[Tuple[str, list, int, Optional[str]]] = [
+            ("gin", [column], 0, None) for column in json
+        ]
+        btree = _btree_suggestion(equal, ranges, nulls, order_by)
+        if btree is not None:
+            candidates.append(("btree", btree[0], len(equal), btree[1]))
+        for using, columns, equal_count, where in candidates:
+            if _is_covered(indexes[table], using, columns, equal_count, where):
+                continue
+            key = (table, using, tuple(columns), where)
+            suggestion = suggestions.get(key)
+            if suggestion is None:
+                suggestion = suggestions[key] = {
+                    "table": table,
+                    "using": using,
+                    "columns": columns,
+                    "where": where,
+                    "calls": 0,
+                    "total_time": 0.0,
+                    "shapes": [],
+                    "statement": _statement(table, using, columns, where),
+                }
+            suggestion["calls"] += stats["calls"]
+            suggestion["total_time"] += stats["total_time"]
+            suggestion["shapes"].append({"filter": shape, "order_by": order_by})
+    return sorted(suggestions.values(), key=lambda item: item["total_time"], reverse=True)
+
+
+async def log_index_suggestions() -> None:
+    for suggestion in await suggest_indexes():
+        logger.warning(
+            f"Missing index, {suggestion['calls']} calls for {suggestion['total_time']:.3f}s: "
+            f"{suggestion['statement']}"
+        )
@@ -1,12 +1,51 @@
 # type: ignore
+import asyncio
+import base64
+import hashlib
+import inspect
+import json
+import random
+import time
+import uuid
 from abc import ABC
-from typing import List, Any, Optional
+from contextvars import ContextVar
+from copy import deepcopy
+from datetime import datetime
+from typing import List, Any, Optional, Callable, AsyncIterator, Awaitable
 
+from asyncpg.exceptions import QueryCanceledError
+from loguru import logger
+from sqlalchemy import and_, or_, tuple_, any_, bindparam, cast, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB, UUID, insert as pg_insert
 from sqlalchemy.engine.result import RowProxy
+from sqlalchemy.sql.elements import BindParameter
 from sqlalchemy.sql.selectable import Select
+from sqlalchemy.types import JSON, Text
 
 from src.app.config.settings import settings
+from src.app.core.repositories.instrumentation import instrumented, slow_query_log
+from src.app.core.repositories.sql import Explain
+from src.app.core.repositories.types import CountStrategy, ListCountMode
+from src.app.core.repositories.uow import UnitOfWork, current_uow
+from src.app.core.utils import deadline
+from src.app.core.utils.deadline import DeadlineExceeded
+from src.app.core.utils.loader import DataLoader
+from src.app.core.utils.lru import LRUCache
+from src.app.extensions.cache import MISSING, result_cache
 from src.app.extensions.db import db
+from src.app.extensions.replicas import replicas
+from src.app.extensions.shards import shards
+
+
+# reads of the context skip the result cache, see get_loader
+results_uncached: ContextVar[bool] = ContextVar("results_uncached", default=False)
+
+
+def _json_column(column: Any) -> Any:
+    """JSON columns are compared as JSONB, plain JSON has no containment operators"""
+    if isinstance(column.type, JSON) and not isinstance(column.type, JSONB):
+        return cast(column, JSONB)
+    return column
 
 
 class AbstractRepository(ABC):
@@ -21,6 +60,14 @@ class BaseAbstractRepository(AbstractRepository):
     ) -> Any:
         raise NotImplementedError
 
+    @classmethod
+    async def count_by_strategy(
+        cls,
+        filter_data: Optional[dict],
+        strategy: CountStrategy,
+    ) -> tuple[int, bool]:
+        raise NotImplementedError
+
     @classmethod
     async def exists(
         cls,
@@ -44,7 +91,22 @@ class BaseAbstractRepository(AbstractRepository):
         raise NotImplementedError
 
     @classmethod
-    async def get_first(cls, filter_data: Optional[dict]) -> Any:
+    async def get_list_keyset_partial(
+        cls,
+        fields: Optional[list],
+        filter_data: Optional[dict],
+        order_by: Optional[list],
+        limit: int,
+        cursor: Optional[str],
+    ) -> tuple[List[Any], Optional[str]]:
+        raise NotImplementedError
+
+    @classmethod
+    async def get_first(cls, filter_data: Optional[dict], for_update: bool) -> Any:
+        raise NotImplementedError
+
+    @classmethod
+    async def get_first_batched(cls, field: str, value: Any, fields: Optional[list]) -> Any:
         raise NotImplementedError
 
     @classmethod
@@ -54,21 +116,94 @@ class BaseAbstractRepository(AbstractRepository):
         order_data: Optional[list],
         limit: Optional[int],
         offset: Optional[int],
+        for_update: bool,
     ) -> List[Any]:
         raise NotImplementedError
 
+    @classmethod
+    async def get_list_keyset(
+        cls,
+        filter_data: Optional[dict],
+        order_by: Optional[list],
+        limit: int,
+        cursor: Optional[str],
+    ) -> tuple[List[Any], Optional[str]]:
+        raise NotImplementedError
+
+    @classmethod
+    async def get_list_with_count(
+        cls,
+        filter_data: Optional[dict],
+        order_by: Optional[list],
+        limit: Optional[int],
+        offset: Optional[int],
+        mode: ListCountMode,
+        fields: Optional[list],
+    ) -> tuple[List[Any], int]:
+        raise NotImplementedError
+
+    @classmethod
+    async def iter_list_partial(
+        cls,
+        fields: Optional[list],
+        filter_data: Optional[dict],
+        order_by: Optional[list],
+        prefetch: int,
+        as_batches: bool,
+    ) -> AsyncIterator[Any]:
+        raise NotImplementedError
+
+    @classmethod
+    async def iter_list(
+        cls,
+        filter_data: Optional[dict],
+        order_by: Optional[list],
+        prefetch: int,
+        as_batches: bool,
+    ) -> AsyncIterator[Any]:
+        raise NotImplementedError
+
     @classmethod
     async def create(cls, data: dict) -> Any:
         raise NotImplementedError
 
     @classmethod
-    async def update(cls, filter_data: dict, data: dict, return_updated=False) -> Any:
+    async def create_many(cls, rows: List[dict]) -> List[Any]:
+        raise NotImplementedError
+
+    @classmethod
+    async def upsert(cls, data: dict, conflict_fields: list) -> Any:
+        raise NotImplementedError
+
+    @classmethod
+    async def upsert_many(cls, rows: List[dict], conflict_fields: list) -> List[Any]:
+        raise NotImplementedError
+
+    @classmethod
+    async def copy_upsert(cls, rows: List[dict], conflict_fields: list) -> int:
+        raise NotImplementedError
+
+    @classmethod
+    async def update(
+        cls, filter_data: dict, data: dict, return_updated=False, merge_fields: Optional[list] = None
+    ) -> Any:
         raise NotImplementedError
 
     @classmethod
     async def update_by_obj(cls, obj: RowProxy, data: dict) -> Any:
         raise NotImplementedError
 
+    @classmethod
+    async def update_in_batches(
+        cls,
+        filter_data: dict,
+        data: dict,
+        chunk_size: int,
+        pause: float,
+        on_progress: Optional[Callable[[int, int], Any]],
+    ) -> int:
+        raise NotImplementedError
+
     @classmethod
     async def get_or_create(cls, filter_data: dict, data: dict) -> Any:
         raise NotImplementedError
@@ -77,9 +212,20 @@ class BaseAbstractRepository(AbstractRepository):
     async def delete(cls, filter_data: dict) -> bool:
         raise NotImplementedError
 
+    @classmethod
+    async def delete_in_batches(
+        cls,
+        filter_data: dict,
+        chunk_size: int,
+        pause: float,
+        on_progress: Optional[Callable[[int, int], Any]],
+    ) -> int:
+        raise NotImplementedError
+
 
 class BasePSQLRepository(BaseAbstractRepository):
     _ATR_SEPARATOR = "__"
+    _MAX_QUERY_PARAMS = 32767  # postgres limit of bind parameters per statement
     COMPARE_OPERATORS_MAP: dict = {
         "lt": "<",
         "lte": "<=",
@@ -87,18 +233,57 @@ class BasePSQLRepository(BaseAbstractRepository):
         "gte": ">=",
         "ne": "!=",
         "e": "==",
+        "in": "in",
+        "isnull": "isnull",
+        "ilike": "ilike",
+        "range": "range",
+        "contains": "contains",
+        "has_key": "has_key",
     }
     LOOKUP_MAP = {
-        "<": lambda q, k, v: q.where(k < v),
-        "<=": lambda q, k, v: q.where(k <= v),
-        ">": lambda q, k, v: q.where(k > v),
-        ">=": lambda q, k, v: q.where(k >= v),
-        "!=": lambda q, k, v: q.where(k != v),
-        "==": lambda q, k, v: q.where(k == v),
+        "<": lambda k, v: k < v,
+        "<=": lambda k, v: k <= v,
+        ">": lambda k, v: k > v,
+        ">=": lambda k, v: k >= v,
+        "!=": lambda k, v: k != v,
+        "==": lambda k, v: k == v,
+        # one array parameter whatever the number of values, so the SQL text stays the same
+        "in": lambda k, v: k == any_(v if isinstance(v, BindParameter) else list(v)),
+        "isnull": lambda k, v: k.is_(None) if v else k.isnot(None),
+        "ilike": lambda k, v: k.ilike(v),
+        "range": lambda k, v: k.between(v[0], v[1]),
+        "contains": lambda k, v: _json_column(k).contains(v),
+        # the key is text, an untyped parameter would be serialized as json
+        "has_key": lambda k, v: _json_column(k).has_key(type_coerce(v, Text)),  # noqa: W601
+    }
+    # lookups which values change the SQL text, such values are part of the filter shape
+    STRUCTURAL_LOOKUPS: tuple = ("isnull",)
+    # lookups which values are pairs of bind parameters
+    PAIR_LOOKUPS: tuple = ("range",)
+    # json types of cursor values by python types of columns, datetimes are in iso format
+    CURSOR_VALUE_TYPES: dict = {
+        int: int,
+        float: (int, float),
+        str: str,
+        bool: bool,
+        datetime: str,
+    }
+    # {"__or": [{"id__lt": 10}, {"email__ilike": "%@example.com"}]}, groups may be nested
+    GROUP_OPERATORS_MAP: dict = {
+        "__or": or_,
+        "__and": and_,
     }
     MODEL: db = None
     FIELDS_TO_SELECT: Optional[list] = []
     FIELDS_ORDER_BY: Optional[list] = ["-id"]
+    # shared by all repositories, keys are prefixed by repository class
+    QUERY_CACHE: LRUCache = LRUCache(maxsize=settings.QUERY_CACHE_SIZE)
+    COMPILED_CACHE: LRUCache = LRUCache(maxsize=settings.QUERY_CACHE_SIZE)
+    COUNT_CACHE: LRUCache = LRUCache(maxsize=settings.COUNT_CACHE_SIZE, ttl=settings.COUNT_CACHE_TTL)
+    __explain_task: Optional[asyncio.Task] = None  # EXPLAIN of a slow query in progress
+    LOADERS: dict = {}  # shared by all repositories, see get_loader
+    # seconds to cache results of reads, see _cached_result, 0 disables
+    RESULT_CACHE_TTL: float = 0
 
     @classmethod
     def __parsed_filter_key(cls, key: str) -> tuple[str, str]:
@@ -116,7 +301,7 @@ class BasePSQLRepository(BaseAbstractRepository):
         raise ValueError(f"Not supported format of {key}")
 
     @classmethod
-    def __apply_condition(cls, query: Select, key: str, value: Any) -> Select:
+    def __condition(cls, key: str, value: Any) -> Any:
         parsed_key, parsed_lookup = cls.__parsed_filter_key(key)
         column = getattr(cls.MODEL, parsed_key, None)
         if column is None:
@@ -124,16 +309,258 @@ class BasePSQLRepository(BaseAbstractRepository):
         func_ = cls.LOOKUP_MAP.get(parsed_lookup)
         if not func_:
             raise ValueError(f"Not supported lookup {parsed_lookup}")
-        return func_(query, column, value)
+        return func_(column, value)
+
+    @classmethod
+    def __group_items(cls, key: str, value: Any) -> list:
+        if not isinstance(value, (list, tuple)) or not all(isinstance(item, dict) for item in value):
+            raise ValueError(f"Not supported format of {key}, list of filter dicts expected")
+        return list(value)
+
+    @classmethod
+    def __placeholder(cls, key: str, value: Any, name: str) -> Any:
+        lookup = cls.__parsed_filter_key(key)[1]
+        if value is None or lookup in cls.STRUCTURAL_LOOKUPS:
+            return value
+        if lookup in cls.PAIR_LOOKUPS:
+            return bindparam(f"{name}_0"), bindparam(f"{name}_1")
+        return bindparam(name)
+
+    @classmethod
+    def __conditions(cls, filter_data: dict, shaped: bool = False, prefix: str = "filter") -> list:
+        conditions = []
+        for index, (key, value) in enumerate(filter_data.items()):
+            name = f"{prefix}_{index}"
+            group = cls.GROUP_OPERATORS_MAP.get(key)
+            if group is not None:
+                items = cls.__group_items(key, value)
+                conditions.append(
+                    group(
+                        *[
+                            and_(*cls.__conditions(item, shaped, f"{name}_{i}"))
+                            for i, item in enumerate(items)
+                        ]
+                    )
+                )
+                continue
+            conditions.append(cls.__condition(key, cls.__placeholder(key, value, name) if shaped else value))
+        return conditions
 
     @classmethod
     def get_query_filtered(cls, query: Select, filter_data: Optional[dict] = None) -> Select:
         if not filter_data:
             filter_data = {}
-        for k, v in filter_data.items():
-            query = cls.__apply_condition(query, k, v)
+        conditions = cls.__conditions(filter_data)
+        return query.where(and_(*conditions)) if conditions else query
+
+    @classmethod
+    def get_filter_shape(cls, filter_data: Optional[dict] = None) -> tuple:
+        """
+        :param filter_data: dict - filter rows data
+        :return: tuple - filter keys with lookups, queries of the same shape differ by parameters only
+        """
+        if not filter_data:
+            filter_data = {}
+        shape = []
+        for key, value in filter_data.items():
+            if key in cls.GROUP_OPERATORS_MAP:
+                shape.append(
+                    (key, tuple(cls.get_filter_shape(item) for item in cls.__group_items(key, value)))
+                )
+            elif value is None or cls.__parsed_filter_key(key)[1] in cls.STRUCTURAL_LOOKUPS:
+                shape.append((key, value))
+            else:
+                shape.append((key,))
+        return tuple(shape)
+
+    @classmethod
+    def get_filter_params(cls, filter_data: Optional[dict] = None, prefix: str = "filter") -> dict:
+        """
+        :param filter_data: dict - filter rows data
+        :param prefix: str - prefix of bind parameters names
+        :return: dict - values of bind parameters of get_query_filtered_shaped
+        """
+        if not filter_data:
+            filter_data = {}
+        params = {}
+        for index, (key, value) in enumerate(filter_data.items()):
+            name = f"{prefix}_{index}"
+            if key in cls.GROUP_OPERATORS_MAP:
+                for i, item in enumerate(cls.__group_items(key, value)):
+                    params.update(cls.get_filter_params(item, f"{name}_{i}"))
+                continue
+            lookup = cls.__parsed_filter_key(key)[1]
+            if value is None or lookup in cls.STRUCTURAL_LOOKUPS:
+                continue
+            if lookup in cls.PAIR_LOOKUPS:
+                params[f"{name}_0"], params[f"{name}_1"] = value
+            elif lookup == "in":
+                params[name] = list(value)
+            else:
+                params[name] = value
+        return params
+
+    @classmethod
+    def get_query_filtered_shaped(cls, query: Select, filter_data: Optional[dict] = None) -> Select:
+        """
+        Same as get_query_filtered, but filter values are replaced by bind parameters.
+
+        :param query: Select - query to filter
+        :param filter_data: dict - filter rows data, only keys, None and structural values are used
+        :return: Select
+        """
+        if not filter_data:
+            filter_data = {}
+        conditions = cls.__conditions(filter_data, shaped=True)
+        return query.where(and_(*conditions)) if conditions else query
+
+    @classmethod
+    def get_query_cached(cls, key: tuple, build: Callable[[], Any]) -> Any:
+        """
+        :param key: tuple - shape of the query, see get_filter_shape
+        :param build: callable - builds query of the shape on cache miss
+        :return: query, the same object for the same shape
+        """
+        key = (cls,) + key
+        query = cls.QUERY_CACHE.get(key)
+        if query is None:
+            query = build()
+            cls.QUERY_CACHE[key] = query
         return query
 
+    @classmethod
+    def query_cache_info(cls) -> dict:
+        """
+        :return: dict - hits, misses, evictions and size of queries and compiled SQL caches
+        """
+        return {"queries": cls.QUERY_CACHE.info(), "compiled": cls.COMPILED_CACHE.info()}
+
+    @classmethod
+    def in_transaction(cls) -> bool:
+        """
+        :return: bool - flag the current context has a connection with started transaction
+        """
+        conn = db.bind.current_connection
+        raw_conn = conn.raw_connection if conn is not None else None
+        return raw_conn is not None and raw_conn.is_in_transaction()
+
+    @classmethod
+    def __normalized(cls, value: Any) -> Any:
+        if isinstance(value, dict):
+            return tuple(
+                sorted(((key, cls.__normalized(item)) for key, item in value.items()), key=lambda i: i[0])
+            )
+        if isinstance(value, (list, tuple)):
+            return tuple(cls.__normalized(item) for item in value)
+        return value
+
+    @classmethod
+    async def _cached_result(cls, method: str, key_data: tuple, load: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns cached result of the read if RESULT_CACHE_TTL is set, reads in a transaction are not cached.
+
+        :param method: str - read method name
+        :param key_data: tuple - arguments of the read, filter keys order doesn't matter
+        :param load: callable - runs the read
+        :return: result of the read
+        """
+        if not cls.RESULT_CACHE_TTL or cls.in_transaction() or results_uncached.get():
+            return await load()
+        namespace = cls.MODEL.__tablename__
+        shard = shards.current()
+        key = f"{method}:{hashlib.sha1(repr(cls.__normalized(key_data)).encode()).hexdigest()}"
+        if shard is not None:
+            key = f"{key}:{shard.index}"
+        generation, value = await result_cache.lookup(namespace, key)
+        if value is MISSING:
+            value = await load()
+            await result_cache.store(namespace, key, generation, value, cls.RESULT_CACHE_TTL)
+        return value
+
+    @classmethod
+    async def _invalidate_results(cls) -> None:
+        """Cached results of the model are not returned after a write"""
+        if cls.RESULT_CACHE_TTL:
+            await result_cache.invalidate(cls.MODEL.__tablename__)
+            uow = current_uow.get()
+            if uow is not None:
+                uow.mark_written(cls)
+
+    @classmethod
+    async def _execute(
+        cls,
+        method: str,
+        query: Any,
+        params: Optional[dict] = None,
+        reuse: bool = True,
+        read_only: bool = False,
+    ) -> Any:
+        """
+        Runs the query with compiled SQL cache, so SQL text of cached queries is reused
+        and asyncpg prepared statements cache is hit.
+
+        :param method: str - gino connection method to use (all, first, scalar, status)
+        :param query: query to execute
+        :param params: dict - values of bind parameters
+        :param reuse: bool - use connection of the context if any, a separate one is acquired otherwise
+        :param read_only: bool - query may run on a replica, unless the context is in a transaction
+        :return: result of the method
+        """
+
+        in_transaction = cls.in_transaction()
+        started_at = time.perf_counter()
+        result = await cls.__run(method, query, params, reuse, read_only and not in_transaction)
+        duration = time.perf_counter() - started_at
+        if duration >= settings.SLOW_QUERY_THRESHOLD:
+            cls.__log_slow_query(query, params, duration, explain=read_only and not in_transaction)
+        return result
+
+    @classmethod
+    async def __run(
+        cls, method: str, query: Any, params: Optional[dict], reuse: bool, on_replica: bool
+    ) -> Any:
+        async def run(bind: Any) -> Any:
+            async with bind.acquire(reuse=reuse, reusable=reuse) as conn:
+                # asyncpg cancels the query on the server when the deadline passes
+                timeout = deadline.remaining()
+                conn = conn.execution_options(compiled_cache=cls.COMPILED_CACHE, timeout=timeout)
+                try:
+                    return await getattr(conn, method)(query, **(params or {}))
+                except (asyncio.TimeoutError, QueryCanceledError) as e:
+                    if timeout is None:
+                        raise
+                    raise DeadlineExceeded() from e
+
+        # replicas are of the default database, not of shards
+        if on_replica and replicas.is_enabled and shards.current() is None:
+            return await replicas.execute(run, primary=db.bind)
+        return await run(db.bind)
+
+    @classmethod
+    def __log_slow_query(cls, query: Any, params: Optional[dict], duration: float, explain: bool) -> None:
+        entry = slow_query_log.record(str(query.compile(dialect=db.bind.dialect)), duration)
+        # EXPLAIN ANALYZE runs the query again, only a sample of slow reads is explained, one at a time
+        if (
+            not explain
+            or BasePSQLRepository.__explain_task is not None
+            or random.random() >= settings.SLOW_QUERY_EXPLAIN_RATE
+        ):
+            return
+        BasePSQLRepository.__explain_task = asyncio.create_task(
+            cls.__explain_slow_query(entry, query, params)
+        )
+
+    @classmethod
+    async def __explain_slow_query(cls, entry: dict, query: Any, params: Optional[dict]) -> None:
+        try:
+            explain = Explain(query, analyze=True, buffers=True)
+            plan = await cls.__run("scalar", explain, params, reuse=False, on_replica=True)
+            slow_query_log.add_plan(entry, json.loads(plan) if isinstance(plan, str) else plan)
+        except Exception as e:  # noqa
+            logger.warning(f"Slow query plan is not captured: {e!r}")
+        finally:
+            BasePSQLRepository.__explain_task = None
+
     @classmethod
     def ordering_fields(cls, fields_to_order: List[str]) -> list:
         prepared_fields: list = []
@@ -153,6 +580,186 @@ class BasePSQLRepository(BaseAbstractRepository):
         return prepared_fields
 
     @classmethod
+    def keyset_ordering(cls, fields_to_order: List[str]) -> List[tuple]:
+        """
+        :param fields_to_order: list[str] - ordering fields, "-" prefix means desc
+        :return: list[tuple[Column, bool]] - columns with desc flag, "id" is added as a tie-breaker
+        """
+        ordering: list = []
+        for item in fields_to_order:
+            is_desc = item.startswith("-")
+            field = getattr(cls.MODEL, item[1:] if is_desc else item, None)
+            if field is None:
+                raise ValueError(f"Not supported field {item} to ordering")
+            ordering.append((field, is_desc))
+        if not any(field.key == "id" for field, _ in ordering):
+            ordering.append((cls.MODEL.id, ordering[-1][1] if ordering else True))
+        return ordering
+
+    @classmethod
+    def cursor_ordering(cls, order_by: Optional[list] = None) -> List[tuple]:
+        """
+        :param order_by: list - ordering fields of get_list_keyset
+        :return: list[tuple[Column, bool]] - ordering its cursors are made of, see decode_cursor
+        """
+        return cls.keyset_ordering(order_by or cls.FIELDS_ORDER_BY)
+
+    @classmethod
+    def encode_cursor(cls, row: Any, ordering: List[tuple]) -> str:
+        """
+        :param row: row (model or RowProxy) the next page starts after
+        :param ordering: list[tuple[Column, bool]] - see keyset_ordering
+        :return: str - opaque cursor
+        """
+        values = []
+        for field, _ in ordering:
+            value = getattr(row, field.key)
+            values.append(value.isoformat() if isinstance(value, datetime) else value)
+        raw = json.dumps(values, default=str, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode_cursor(cls, cursor: str, ordering: List[tuple]) -> list:
+        """
+        :param cursor: str - opaque cursor made by encode_cursor
+        :param ordering: list[tuple[Column, bool]] - see keyset_ordering
+        :return: list - values of ordering fields
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(raw)
+        except ValueError:
+            raise ValueError(f"Not supported format of cursor {cursor}")
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError(f"Not supported format of cursor {cursor}")
+
+        try:
+            return [cls.__cursor_value(field, value) for (field, _), value in zip(ordering, values)]
+        except (TypeError, ValueError):
+            raise ValueError(f"Not supported format of cursor {cursor}")
+
+    @classmethod
+    def __cursor_value(cls, field: Any, value: Any) -> Any:
+        # values of other types than of the column fail in the database, not as an invalid cursor
+        if value is None:
+            return None
+        if isinstance(field.type, UUID):
+            return str(uuid.UUID(str(value)))
+        try:
+            python_type = field.type.python_type
+        except NotImplementedError:
+            return value
+        value_types = cls.CURSOR_VALUE_TYPES.get(python_type)
+        if value_types is None:
+            return value
+        # bool is an int subclass
+        if not isinstance(value, value_types) or isinstance(value, bool) != (python_type is bool):
+            raise TypeError(f"Not supported value {value!r} of {field.key}")
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        return value
+
+    @classmethod
+    def get_query_keyset(cls, query: Select, ordering: List[tuple], values: Optional[list] = None) -> Select:
+        """
+        :param query: Select - query to apply seek condition and ordering to
+        :param ordering: list[tuple[Column, bool]] - see keyset_ordering
+        :param values: list - values (or bind parameters) of the last row of the previous page
+        :return: Select
+        """
+        if values:
+            directions = {is_desc for _, is_desc in ordering}
+            if len(directions) == 1:
+                # row value comparison is able to use a composite index directly
+                columns = tuple_(*[field for field, _ in ordering])
+                condition = columns < tuple_(*values) if directions.pop() else columns > tuple_(*values)
+            else:
+                conditions = []
+                for index, (field, is_desc) in enumerate(ordering):
+                    equals = [f == v for (f, _), v in zip(ordering[:index], values[:index])]
+                    compare = field < values[index] if is_desc else field > values[index]
+                    conditions.append(and_(*equals, compare))
+                condition = or_(*conditions)
+            query = query.where(condition)
+        return query.order_by(*[field.desc() if is_desc else field.asc() for field, is_desc in ordering])
+
+    @classmethod
+    def __keyset_params(cls, ordering: List[tuple], cursor: Optional[str]) -> tuple[Optional[list], dict]:
+        if not cursor:
+            return None, {}
+        values = cls.decode_cursor(cursor, ordering)
+        placeholders = [
+            bindparam(f"cursor_{index}", type_=field.type) for index, (field, _) in enumerate(ordering)
+        ]
+        return placeholders, {f"cursor_{index}": value for index, value in enumerate(values)}
+
+    @classmethod
+    def __count_query(cls, filter_data: dict) -> tuple[Any, dict]:
+        q = cls.get_query_cached(
+            ("count", cls.get_filter_shape(filter_data)),
+            lambda: cls.get_query_filtered_shaped(db.func.count(cls.MODEL.id).select(), filter_data),
+        )
+        return q, cls.get_filter_params(filter_data)
+
+    @classmethod
+    def __list_query(
+        cls,
+        filter_data: dict,
+        order_by: list,
+        limit: Optional[int],
+        offset: Optional[int],
+        fields: Optional[list] = None,
+        for_update: bool = False,
+    ) -> tuple[Any, dict]:
+        order_by_fields = cls.ordering_fields(order_by)  # type: ignore
+        q = cls.get_query_cached(
+            ("get_list", tuple(fields or ()), cls.get_filter_shape(filter_data), tuple(order_by), for_update),
+            lambda: cls.__locked(
+                cls.get_query_filtered_shaped(
+                    cls.MODEL.select(*fields) if fields else cls.MODEL.query, filter_data
+                )
+                .order_by(*order_by_fields)
+                .offset(bindparam("offset"))
+                .limit(bindparam("limit")),
+                for_update,
+            ),
+        )
+        return q, {**cls.get_filter_params(filter_data), "offset": offset, "limit": limit}
+
+    @classmethod
+    def __check_for_update(cls, for_update: bool) -> None:
+        if for_update and not cls.in_transaction():
+            raise ValueError("Not supported for_update out of transaction, use UnitOfWork")
+
+    @classmethod
+    def __locked(cls, query: Select, for_update: bool) -> Select:
+        return query.with_for_update() if for_update else query
+
+    @classmethod
+    def __keyset_page(cls, rows: list, ordering: List[tuple], limit: int) -> tuple[list, Optional[str]]:
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, cls.encode_cursor(rows[-1], ordering)
+
+    @classmethod
+    async def __iterate(cls, query: Any, params: dict, prefetch: int, as_batches: bool) -> AsyncIterator[Any]:
+        # server-side cursors live inside a transaction only, the connection is held until iteration ends
+        async with db.transaction() as tx:
+            conn = tx.connection.execution_options(compiled_cache=cls.COMPILED_CACHE)
+            cursor = await conn.iterate(query, **params)
+            while True:
+                rows = await cursor.many(prefetch)
+                if not rows:
+                    break
+                if as_batches:
+                    yield rows
+                else:
+                    for row in rows:
+                        yield row
+
+    @classmethod
+    @instrumented
     async def count(cls, filter_data: Optional[dict] = None) -> int:
         """
         :param filter_data: dict - filter rows data
@@ -161,11 +768,82 @@ class BasePSQLRepository(BaseAbstractRepository):
         if not filter_data:
             filter_data = {}
 
-        q = db.func.count(cls.MODEL.id).select()  # type: ignore
-        q = cls.get_query_filtered(q, filter_data)
-        return await q.gino.scalar()
+        q, params = cls.__count_query(filter_data)
+        return await cls._cached_result(
+            "count", (filter_data,), lambda: cls._execute("scalar", q, params, read_only=True)
+        )
+
+    @classmethod
+    @instrumented
+    async def count_estimate(cls, filter_data: Optional[dict] = None) -> int:
+        """
+        :param filter_data: dict - filter rows data
+        :return: int - planner estimate of rows count
+        """
+        if not filter_data:
+            q = cls.get_query_cached(
+                ("reltuples",),
+                lambda: db.text(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)"
+                ),
+            )
+            estimate = await cls._execute(
+                "scalar", q, {"table_name": cls.MODEL.__tablename__}, read_only=True
+            )
+            # reltuples is -1 (0 before postgres 14) until the table is vacuumed or analyzed
+            if estimate and estimate > 0:
+                return estimate
+
+        q = cls.get_query_cached(
+            ("count_estimate", cls.get_filter_shape(filter_data)),
+            lambda: Explain(cls.get_query_filtered_shaped(cls.MODEL.select("id"), filter_data)),
+        )
+        plan = await cls._execute("scalar", q, cls.get_filter_params(filter_data), read_only=True)
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @classmethod
+    @instrumented
+    async def count_by_strategy(
+        cls,
+        filter_data: Optional[dict] = None,
+        strategy: CountStrategy = CountStrategy(settings.COUNT_STRATEGY),
+    ) -> tuple[int, bool]:
+        """
+        Estimated and auto counts are cached for COUNT_CACHE_TTL seconds.
+
+        :param filter_data: dict - filter rows data
+        :param strategy: CountStrategy - exact, estimate or auto
+        :return: tuple[int, bool] - count of rows and flag the count is approximate
+        """
+        if not filter_data:
+            filter_data = {}
+        if strategy == CountStrategy.EXACT:
+            return await cls.count(filter_data=filter_data), False
+
+        shard = shards.current()
+        key = (
+            cls,
+            strategy,
+            cls.get_filter_shape(filter_data),
+            repr(list(filter_data.values())),
+            shard.index if shard is not None else None,
+        )
+        result = cls.COUNT_CACHE.get(key)
+        if result is None:
+            estimate = await cls.count_estimate(filter_data=filter_data)
+            if strategy == CountStrategy.ESTIMATE:
+                result = estimate, True
+            elif estimate < settings.COUNT_EXACT_THRESHOLD:
+                result = await cls.count(filter_data=filter_data), False
+            else:
+                result = estimate, True
+            cls.COUNT_CACHE[key] = result
+        return result
 
     @classmethod
+    @instrumented
     async def exists(
         cls,
         filter_data: Optional[dict],
@@ -174,11 +852,18 @@ class BasePSQLRepository(BaseAbstractRepository):
         :param filter_data: dict - filter row data
         :return:
         """
-        q = db.func.exists(cls.MODEL.id).select()  # type: ignore
-        q = cls.get_query_filtered(q, filter_data)
-        return await q.gino.scalar()
+        q = cls.get_query_cached(
+            ("exists", cls.get_filter_shape(filter_data)),
+            lambda: db.exists(cls.get_query_filtered_shaped(cls.MODEL.select("id"), filter_data)).select(),
+        )
+        return await cls._cached_result(
+            "exists",
+            (filter_data,),
+            lambda: cls._execute("scalar", q, cls.get_filter_params(filter_data), read_only=True),
+        )
 
     @classmethod
+    @instrumented
     async def get_first_partial(
         cls,
         fields: Optional[list] = None,
@@ -195,13 +880,19 @@ class BasePSQLRepository(BaseAbstractRepository):
         if not filter_data:
             filter_data = {}
 
-        q = cls.MODEL.select(*fields)
-        q = cls.get_query_filtered(q, filter_data)
-
-        row = await q.gino.first()
+        q = cls.get_query_cached(
+            ("get_first_partial", tuple(fields), cls.get_filter_shape(filter_data)),
+            lambda: cls.get_query_filtered_shaped(cls.MODEL.select(*fields), filter_data),
+        )
+        row = await cls._cached_result(
+            "get_first_partial",
+            (fields, filter_data),
+            lambda: cls._execute("first", q, cls.get_filter_params(filter_data), read_only=True),
+        )
         return row
 
     @classmethod
+    @instrumented
     async def get_list_partial(
         cls,
         fields: Optional[list] = None,
@@ -224,110 +915,704 @@ class BasePSQLRepository(BaseAbstractRepository):
             filter_data = {}
         if not order_by:
             order_by = cls.FIELDS_ORDER_BY
-        order_by_fields = cls.ordering_fields(order_by)  # type: ignore
 
-        q = cls.MODEL.select(*fields)  # type: ignore
-        q = cls.get_query_filtered(q, filter_data).order_by(*order_by_fields)
-        return await q.offset(offset).limit(limit).gino.all()
+        q, params = cls.__list_query(filter_data, order_by, limit, offset, fields)
+        return await cls._cached_result(
+            "get_list_partial",
+            (fields, filter_data, order_by, limit, offset),
+            lambda: cls._execute("all", q, params, read_only=True),
+        )
+
+    @classmethod
+    @instrumented
+    async def get_list_keyset_partial(
+        cls,
+        fields: Optional[list] = None,
+        filter_data: Optional[dict] = None,
+        order_by: Optional[list] = None,
+        limit: int = settings.BATCH_SIZE,
+        cursor: Optional[str] = None,
+    ) -> tuple[List[RowProxy], Optional[str]]:
+        """
+        :param fields: list - fields to select from db, ordering fields are selected anyway
+        :param filter_data: dict - filter rows data
+        :param order_by:  list - ordering fields
+        :param limit: int - limit rows count to select
+        :param cursor: str - cursor of the previous page, first page if not set
+        :return: tuple[list, str] - rows and cursor of the next page, None for the last page
+        """
+        if not fields:
+            fields = cls.FIELDS_TO_SELECT
+        if not filter_data:
+            filter_data = {}
+        if not order_by:
+            order_by = cls.FIELDS_ORDER_BY
+        ordering = cls.keyset_ordering(order_by)
+        fields = list(fields) + [field.key for field, _ in ordering if field.key not in fields]
+        placeholders, cursor_params = cls.__keyset_params(ordering, cursor)
+
+        q = cls.get_query_cached(
+            (
+                "get_list_keyset_partial",
+                tuple(fields),
+                cls.get_filter_shape(filter_data),
+                tuple(order_by),
+                bool(cursor),
+            ),
+            lambda: cls.get_query_keyset(
+                cls.get_query_filtered_shaped(cls.MODEL.select(*fields), filter_data), ordering, placeholders
+            ).limit(bindparam("limit")),
+        )
+        params = {**cls.get_filter_params(filter_data), **cursor_params, "limit": limit + 1}
+        rows = await cls._execute("all", q, params, read_only=True)
+        return cls.__keyset_page(rows, ordering, limit)
 
     @classmethod
-    async def get_first(cls, filter_data: Optional[dict]) -> Optional[db.Model]:
+    @instrumented
+    async def get_first(cls, filter_data: Optional[dict], for_update: bool = False) -> Optional[db.Model]:
         """
         :param filter_data: dict - filter row data
+        :param for_update: bool - lock the row till the end of the transaction, see UnitOfWork
         :return: Model - row from database, if exists.
         """
 
         if not filter_data:
             filter_data = {}
+        cls.__check_for_update(for_update)
 
-        q = cls.MODEL.query
-        q = cls.get_query_filtered(q, filter_data)
-
-        row = await q.gino.first()
+        q = cls.get_query_cached(
+            ("get_first", cls.get_filter_shape(filter_data), for_update),
+            lambda: cls.__locked(cls.get_query_filtered_shaped(cls.MODEL.query, filter_data), for_update),
+        )
+        row = await cls._cached_result(
+            "get_first",
+            (filter_data,),
+            lambda: cls._execute("first", q, cls.get_filter_params(filter_data), read_only=True),
+        )
         return row
 
     @classmethod
+    def __loader_key(cls, column: Any, value: Any) -> Any:
+        # uuids come as strings from requests and as UUID objects from asyncpg
+        return str(uuid.UUID(str(value))) if isinstance(column.type, UUID) else value
+
+    @classmethod
+    def get_loader(cls, field: str, fields: Optional[list] = None) -> DataLoader:
+        """
+        :param field: str - field to look rows up by
+        :param fields: list - fields to select, all if not set
+        :return: DataLoader - shared loader of rows by the field values, None for missing rows
+
+        Batches skip the result cache, their values differ from batch to batch.
+        """
+        key = (cls, field, tuple(fields or ()))
+        loader = cls.LOADERS.get(key)
+        if loader is not None:
+            return loader
+        column = getattr(cls.MODEL, field, None)
+        if column is None:
+            raise ValueError(f"Not supported attr {field} for model {cls.MODEL}")
+
+        async def batch_load(values: list) -> list:
+            filter_data = {f"{field}{cls._ATR_SEPARATOR}in": values}
+            token = results_uncached.set(True)
+            try:
+                if fields:
+                    rows = await cls.get_list_partial(
+                        fields=fields if field in fields else [*fields, field],
+                        filter_data=filter_data,
+                        limit=None,
+                    )
+                else:
+                    rows = await cls.get_list(filter_data=filter_data, limit=None)
+            finally:
+                results_uncached.reset(token)
+            by_key = {cls.__loader_key(column, getattr(row, field)): row for row in rows}
+            return [by_key.get(value) for value in values]
+
+        loader = cls.LOADERS[key] = DataLoader(
+            batch_load, window=settings.LOADER_WINDOW, max_batch_size=settings.LOADER_MAX_BATCH_SIZE
+        )
+        return loader
+
+    @classmethod
+    @instrumented
+    async def get_first_batched(cls, field: str, value: Any, fields: Optional[list] = None) -> Any:
+        """
+        Same as get_first / get_first_partial by one field value, but lookups of concurrent callers are
+        resolved by one `field = ANY(...)` query and equal lookups in flight share one query.
+        Rows are shared by the callers. In a transaction, on a shard or after a write of the context it runs
+        get_first / get_first_partial, so own changes are seen.
+
+        :param field: str - field to look the row up by
+        :param value: any - value of the field
+        :param fields: list - fields to select, all if not set
+        :return: row, None if not exists
+        """
+        # loaders batch lookups of all contexts, so the ones pinned to a shard are not batched
+        if cls.in_transaction() or replicas.is_sticky() or shards.current() is not None:
+            if fields:
+                return await cls.get_first_partial(fields=fields, filter_data={field: value})
+            return await cls.get_first(filter_data={field: value})
+        loader = cls.get_loader(field, fields)
+        return await loader.load(cls.__loader_key(getattr(cls.MODEL, field), value))
+
+    @classmethod
+    @instrumented
     async def get_list(
         cls,
         filter_data: Optional[dict] = None,
         order_by: Optional[list] = None,
         limit: Optional[int] = settings.BATCH_SIZE,
         offset: Optional[int] = 0,
+        for_update: bool = False,
     ) -> List[db.Model]:
         """
         :param filter_data: dict - filter rows data
         :param order_by:  list - ordering fields
         :param limit: int - limit rows count to select
         :param offset: int - offset rows count to select
+        :param for_update: bool - lock the rows till the end of the transaction, see UnitOfWork
         :return: list
         """
         if not filter_data:
             filter_data = {}
         if not order_by:
             order_by = cls.FIELDS_ORDER_BY
+        cls.__check_for_update(for_update)
+
+        q, params = cls.__list_query(filter_data, order_by, limit, offset, for_update=for_update)
+        return await cls._cached_result(
+            "get_list",
+            (filter_data, order_by, limit, offset),
+            lambda: cls._execute("all", q, params, read_only=True),
+        )
+
+    @classmethod
+    @instrumented
+    async def get_list_with_count(
+        cls,
+        filter_data: Optional[dict] = None,
+        order_by: Optional[list] = None,
+        limit: Optional[int] = settings.BATCH_SIZE,
+        offset: Optional[int] = 0,
+        mode: ListCountMode = ListCountMode(settings.LIST_COUNT_MODE),
+        fields: Optional[list] = None,
+    ) -> tuple[List[Any], int]:
+        """
+        Page of rows with total count of filtered rows, without waiting for two queries one by one.
+
+        :param filter_data: dict - filter rows data
+        :param order_by:  list - ordering fields
+        :param limit: int - limit rows count to select
+        :param offset: int - offset rows count to select
+        :param mode: ListCountMode - count(*) OVER () in one query or two queries run concurrently
+        :param fields: list - fields to select, rows are RowProxy if set (with total_count in window mode)
+        :return: tuple[list, int] - rows and total count
+        """
+        if not filter_data:
+            filter_data = {}
+        if not order_by:
+            order_by = cls.FIELDS_ORDER_BY
+
+        if mode == ListCountMode.CONCURRENT:
+            list_q, list_params = cls.__list_query(filter_data, order_by, limit, offset, fields)
+            count_q, count_params = cls.__count_query(filter_data)
+            if cls.in_transaction():
+                # a separate connection doesn't see changes of the transaction
+                return await cls._execute("all", list_q, list_params, read_only=True), await cls._execute(
+                    "scalar", count_q, count_params, read_only=True
+                )
+            rows, total_count = await asyncio.gather(
+                cls._execute("all", list_q, list_params, reuse=False, read_only=True),
+                cls._execute("scalar", count_q, count_params, reuse=False, read_only=True),
+            )
+            return rows, total_count
+
         order_by_fields = cls.ordering_fields(order_by)  # type: ignore
+        total_count_column = db.func.count().over().label("total_count")
+        if fields:
+            # partial rows keep the total_count column
+            base_q = cls.MODEL.select(*fields).column(total_count_column)
+        else:
+            base_q = cls.MODEL.query.column(total_count_column).execution_options(
+                loader=(cls.MODEL, total_count_column)
+            )
+        q = cls.get_query_cached(
+            ("get_list_with_count", tuple(fields or ()), cls.get_filter_shape(filter_data), tuple(order_by)),
+            lambda: cls.get_query_filtered_shaped(base_q, filter_data)
+            .order_by(*order_by_fields)
+            .offset(bindparam("offset"))
+            .limit(bindparam("limit")),
+        )
+        params = {**cls.get_filter_params(filter_data), "offset": offset, "limit": limit}
+        rows = await cls._execute("all", q, params, read_only=True)
+        if not rows:
+            # window is empty when offset is out of rows
+            return [], await cls.count(filter_data=filter_data) if offset else 0
+        if fields:
+            return rows, rows[0]["total_count"]
+        return [row for row, _ in rows], rows[0][1]
+
+    @classmethod
+    @instrumented
+    async def get_list_keyset(
+        cls,
+        filter_data: Optional[dict] = None,
+        order_by: Optional[list] = None,
+        limit: int = settings.BATCH_SIZE,
+        cursor: Optional[str] = None,
+    ) -> tuple[List[db.Model], Optional[str]]:
+        """
+        Seek based pagination, cost of the page doesn't depend on its depth.
 
-        q = cls.MODEL.query  # type: ignore
-        q = cls.get_query_filtered(q, filter_data).order_by(*order_by_fields)
-        return await q.offset(offset).limit(limit).gino.all()
+        :param filter_data: dict - filter rows data
+        :param order_by:  list - ordering fields
+        :param limit: int - limit rows count to select
+        :param cursor: str - cursor of the previous page, first page if not set
+        :return: tuple[list, str] - rows and cursor of the next page, None for the last page
+        """
+        if not filter_data:
+            filter_data = {}
+        if not order_by:
+            order_by = cls.FIELDS_ORDER_BY
+        ordering = cls.keyset_ordering(order_by)
+        placeholders, cursor_params = cls.__keyset_params(ordering, cursor)
+
+        q = cls.get_query_cached(
+            ("get_list_keyset", cls.get_filter_shape(filter_data), tuple(order_by), bool(cursor)),
+            lambda: cls.get_query_keyset(
+                cls.get_query_filtered_shaped(cls.MODEL.query, filter_data), ordering, placeholders
+            ).limit(bindparam("limit")),
+        )
+        params = {**cls.get_filter_params(filter_data), **cursor_params, "limit": limit + 1}
+        rows = await cls._execute("all", q, params, read_only=True)
+        return cls.__keyset_page(rows, ordering, limit)
 
     @classmethod
+    @instrumented
+    async def iter_list_partial(
+        cls,
+        fields: Optional[list] = None,
+        filter_data: Optional[dict] = None,
+        order_by: Optional[list] = None,
+        prefetch: int = settings.ITER_PREFETCH_SIZE,
+        as_batches: bool = False,
+    ) -> AsyncIterator[Any]:
+        """
+        Streams rows through a server-side cursor, only prefetch rows are kept in memory.
+
+        :param fields: list - fields to select from db
+        :param filter_data: dict - filter rows data
+        :param order_by:  list - ordering fields
+        :param prefetch: int - rows count fetched from the cursor per round trip
+        :param as_batches: bool - yield lists of fetched rows instead of single rows
+        :return: async iterator of RowProxy or list[RowProxy]
+        """
+        if not fields:
+            fields = cls.FIELDS_TO_SELECT
+        if not filter_data:
+            filter_data = {}
+        if not order_by:
+            order_by = cls.FIELDS_ORDER_BY
+        order_by_fields = cls.ordering_fields(order_by)  # type: ignore
+
+        q = cls.get_query_cached(
+            ("iter_list_partial", tuple(fields), cls.get_filter_shape(filter_data), tuple(order_by)),
+            lambda: cls.get_query_filtered_shaped(cls.MODEL.select(*fields), filter_data).order_by(
+                *order_by_fields
+            ),
+        )
+        async for item in cls.__iterate(q, cls.get_filter_params(filter_data), prefetch, as_batches):
+            yield item
+
+    @classmethod
+    @instrumented
+    async def iter_list(
+        cls,
+        filter_data: Optional[dict] = None,
+        order_by: Optional[list] = None,
+        prefetch: int = settings.ITER_PREFETCH_SIZE,
+        as_batches: bool = False,
+    ) -> AsyncIterator[Any]:
+        """
+        Streams rows through a server-side cursor, only prefetch rows are kept in memory.
+
+        :param filter_data: dict - filter rows data
+        :param order_by:  list - ordering fields
+        :param prefetch: int - rows count fetched from the cursor per round trip
+        :param as_batches: bool - yield lists of fetched rows instead of single rows
+        :return: async iterator of Model or list[Model]
+        """
+        if not filter_data:
+            filter_data = {}
+        if not order_by:
+            order_by = cls.FIELDS_ORDER_BY
+        order_by_fields = cls.ordering_fields(order_by)  # type: ignore
+
+        q = cls.get_query_cached(
+            ("iter_list", cls.get_filter_shape(filter_data), tuple(order_by)),
+            lambda: cls.get_query_filtered_shaped(cls.MODEL.query, filter_data).order_by(*order_by_fields),
+        )
+        async for item in cls.__iterate(q, cls.get_filter_params(filter_data), prefetch, as_batches):
+            yield item
+
+    @classmethod
+    @instrumented
     async def create(cls, data: dict) -> db.Model:
         """
         :param data: dict - data to create new row
         :return: row
         """
-        return await cls.MODEL.create(**data)  # type: ignore
+        replicas.stick_to_primary()
+        row = await cls.MODEL.create(**data)  # type: ignore
+        await cls._invalidate_results()
+        return row
+
+    @classmethod
+    def __chunked(cls, rows: List[dict], chunk_size: int) -> List[List[dict]]:
+        if any(row.keys() != rows[0].keys() for row in rows):
+            raise ValueError("Not supported rows with different fields")
+        # every row may take a bind parameter per column, including defaults
+        chunk_size = max(1, min(chunk_size, cls._MAX_QUERY_PARAMS // len(cls.MODEL.__table__.columns)))
+        return [rows[i : i + chunk_size] for i in range(0, len(rows), chunk_size)]  # noqa: E203
+
+    @classmethod
+    def __merged_json(cls, column: Any, value: Any) -> Any:
+        merged = _json_column(column).op("||")(cast(value, JSONB))
+        return merged if isinstance(column.type, JSONB) else cast(merged, column.type)
+
+    @classmethod
+    def __upsert_query(
+        cls,
+        rows: List[dict],
+        conflict_fields: list,
+        update_fields: Optional[list],
+        merge_fields: Optional[list],
+    ) -> Any:
+        table = cls.MODEL.__table__
+        q = pg_insert(table).values(rows)
+        q = cls.__on_conflict(q, list(rows[0]), conflict_fields, update_fields, merge_fields)
+        return q.returning(*table.columns).execution_options(loader=cls.MODEL)
+
+    @classmethod
+    def __on_conflict(
+        cls,
+        q: Any,
+        fields: list,
+        conflict_fields: list,
+        update_fields: Optional[list],
+        merge_fields: Optional[list],
+    ) -> Any:
+        table = cls.MODEL.__table__
+        if update_fields is None:
+            update_fields = [field for field in fields if field not in conflict_fields]
+
+        set_ = {field: q.excluded[field] for field in update_fields}
+        for field in merge_fields or []:
+            if field in set_:
+                set_[field] = cls.__merged_json(table.c[field], q.excluded[field])
+        if not set_:
+            return q.on_conflict_do_nothing(index_elements=conflict_fields)
+        for column in table.columns:
+            if column.onupdate is not None and not column.onupdate.is_callable and column.name not in set_:
+                set_[column.name] = column.onupdate.arg
+        return q.on_conflict_do_update(index_elements=conflict_fields, set_=set_)
+
+    @classmethod
+    @instrumented
+    async def create_many(
+        cls, rows: List[dict], chunk_size: int = settings.BULK_CHUNK_SIZE
+    ) -> List[db.Model]:
+        """
+        Multi-row INSERT, one statement per chunk, all chunks are in one transaction.
+
+        :param rows: list[dict] - data to create new rows, all rows have the same fields
+        :param chunk_size: int - max rows count per statement
+        :return: list - created rows
+        """
+        created: list = []
+        if not rows:
+            return created
+        replicas.stick_to_primary()
+        async with db.transaction():
+            for chunk in cls.__chunked(rows, chunk_size):
+                q = pg_insert(cls.MODEL.__table__).values(chunk)
+                created.extend(
+                    await db.all(
+                        q.returning(*cls.MODEL.__table__.columns).execution_options(loader=cls.MODEL)
+                    )
+                )
+        await cls._invalidate_results()
+        return created
+
+    @classmethod
+    @instrumented
+    async def upsert_many(
+        cls,
+        rows: List[dict],
+        conflict_fields: list,
+        update_fields: Optional[list] = None,
+        merge_fields: Optional[list] = None,
+        chunk_size: int = settings.BULK_CHUNK_SIZE,
+    ) -> List[db.Model]:
+        """
+        Multi-row INSERT ... ON CONFLICT DO UPDATE ... RETURNING, one statement per chunk,
+        all chunks are in one transaction. Rows with the same not NULL conflict fields values are
+        deduplicated, the last one wins.
+
+        :param rows: list[dict] - data to create or update rows, all rows have the same fields
+        :param conflict_fields: list[str] - fields of unique index to detect existing rows
+        :param update_fields: list[str] - fields to update for existing rows, default all but conflict ones
+        :param merge_fields: list[str] - json fields merged with stored value instead of replacing it
+        :param chunk_size: int - max rows count per statement
+        :return: list - created or updated rows, rows are skipped if nothing to update
+        """
+        affected: list = []
+        if not rows:
+            return affected
+        # rows with a NULL conflict value never conflict, they are not deduplicated
+        rows = [row for row in rows if any(row[field] is None for field in conflict_fields)] + list(
+            {
+                tuple(row[field] for field in conflict_fields): row
+                for row in rows
+                if all(row[field] is not None for field in conflict_fields)
+            }.values()
+        )
+        replicas.stick_to_primary()
+        async with db.transaction():
+            for chunk in cls.__chunked(rows, chunk_size):
+                q = cls.__upsert_query(chunk, conflict_fields, update_fields, merge_fields)
+                affected.extend(await db.all(q))
+        await cls._invalidate_results()
+        return affected
+
+    @classmethod
+    def __with_defaults(cls, row: dict) -> dict:
+        """Python side defaults of columns missing in the row, generated per row"""
+        row = dict(row)
+        for column in cls.MODEL.__table__.columns:
+            if column.name in row or column.default is None:
+                continue
+            if column.default.is_callable:
+                row[column.name] = column.default.arg(None)
+            elif column.default.is_scalar:
+                row[column.name] = deepcopy(column.default.arg)
+        return row
+
+    @classmethod
+    def __copy_record(cls, columns: list, row: dict, order: int) -> tuple:
+        # no json codecs are set on connections, json is sent as text
+        return tuple(
+            json.dumps(row[column.name])
+            if row[column.name] is not None and isinstance(column.type, JSON)
+            else row[column.name]
+            for column in columns
+        ) + (order,)
+
+    @classmethod
+    @instrumented
+    async def copy_upsert(
+        cls,
+        rows: List[dict],
+        conflict_fields: list,
+        update_fields: Optional[list] = None,
+        merge_fields: Optional[list] = None,
+    ) -> int:
+        """
+        COPY of rows into a temporary staging table, then INSERT ... SELECT ... ON CONFLICT from it,
+        in one transaction. Much faster than INSERT for big batches. Rows with the same not NULL conflict
+        fields values are deduplicated, the last one wins.
+
+        :param rows: list[dict] - data to create or update rows, all rows have the same fields
+        :param conflict_fields: list[str] - fields of unique index to detect existing rows
+        :param update_fields: list[str] - fields to update for existing rows, default all but conflict ones,
+            existing rows are skipped if empty
+        :param merge_fields: list[str] - json fields merged with stored value instead of replacing it
+        :return: int - count of created and updated rows
+        """
+        if not rows:
+            return 0
+        if any(row.keys() != rows[0].keys() for row in rows):
+            raise ValueError("Not supported rows with different fields")
+        table = cls.MODEL.__table__
+        unknown = set(rows[0]) - set(table.columns.keys())
+        if unknown:
+            raise ValueError(f"Not supported fields {sorted(unknown)} for model {cls.MODEL}")
+
+        fields = list(rows[0])  # generated defaults are not updated for existing rows
+        rows = [cls.__with_defaults(row) for row in rows]
+        columns = [table.c[field] for field in rows[0]]
+        staging = db.Table(
+            f"{table.name}_staging",
+            db.MetaData(),
+            *[db.Column(column.name, column.type) for column in columns],
+            db.Column("import_order", db.BigInteger()),
+        )
+        # columns with SQL defaults, like now(), are filled by the INSERT
+        defaults = [
+            column
+            for column in table.columns
+            if column.name not in rows[0] and column.default is not None and column.default.is_clause_element
+        ]
+        # DISTINCT ON treats NULLs as equal, rows with a NULL conflict value are kept by their order
+        distinct = [staging.c[field] for field in conflict_fields] + [
+            db.case(
+                [(or_(*[staging.c[field].is_(None) for field in conflict_fields]), staging.c.import_order)]
+            )
+        ]
+        source = (
+            db.select(
+                [staging.c[column.name] for column in columns] + [column.default.arg for column in defaults]
+            )
+            .distinct(*distinct)
+            .order_by(*distinct, staging.c.import_order.desc())
+        )
+        q = pg_insert(table).from_select([column.name for column in columns + defaults], source)
+        q = cls.__on_conflict(q, fields, conflict_fields, update_fields, merge_fields)
+
+        replicas.stick_to_primary()
+        async with db.transaction() as tx:
+            conn = tx.connection
+            await conn.status(
+                f"CREATE TEMP TABLE {staging.name} ON COMMIT DROP AS "
+                f"SELECT {', '.join(column.name for column in columns)}, 0::bigint AS import_order "
+                f"FROM {table.name} WITH NO DATA"
+            )
+            await conn.raw_connection.copy_records_to_table(
+                staging.name,
+                records=[cls.__copy_record(columns, row, order) for order, row in enumerate(rows)],
+                columns=[column.name for column in columns] + ["import_order"],
+            )
+            status = await conn.status(q)
+        await cls._invalidate_results()
+        return int(status[0].split(" ")[-1])
+
+    @classmethod
+    @instrumented
+    async def upsert(
+        cls,
+        data: dict,
+        conflict_fields: list,
+        update_fields: Optional[list] = None,
+        merge_fields: Optional[list] = None,
+    ) -> Optional[db.Model]:
+        """
+        Single statement INSERT ... ON CONFLICT DO UPDATE ... RETURNING.
+
+        :param data: dict - data to create or update row
+        :param conflict_fields: list[str] - fields of unique index to detect existing row
+        :param update_fields: list[str] - fields to update for existing row, default all but conflict ones
+        :param merge_fields: list[str] - json fields merged with stored value instead of replacing it
+        :return: row, None if nothing to update
+        """
+        q = cls.__upsert_query([data], conflict_fields, update_fields, merge_fields)
+        replicas.stick_to_primary()
+        row = await db.first(q)
+        await cls._invalidate_results()
+        return row
 
     @classmethod
-    async def update(cls, filter_data: dict, data: dict, return_updated=True) -> Optional[db.Model]:
+    @instrumented
+    async def update(
+        cls,
+        filter_data: dict,
+        data: dict,
+        return_updated=True,
+        merge_fields: Optional[list] = None,
+    ) -> Optional[db.Model]:
         """
         :param filter_data: dict - data to update row
         :param data: dict - data to update row
 
         :param return_updated: bool - flag to mark is row updated require to return
+        :param merge_fields: list[str] - json fields merged with stored value in database, without reading it
         :return: row
         """
-        q = cls.MODEL.update.values(**data)
+        values = dict(data)
+        for field in merge_fields or []:
+            if field in values:
+                values[field] = cls.__merged_json(getattr(cls.MODEL, field), values[field])
+        q = cls.MODEL.update.values(**values)
         q = cls.get_query_filtered(q, filter_data=filter_data)
+        replicas.stick_to_primary()
 
         if return_updated:
-            return (
+            result = (
                 await q.returning(*[getattr(cls.MODEL, item) for item in cls.FIELDS_TO_SELECT])
                 .gino.model(cls.MODEL)
                 .first()
             )
+        else:
+            result = await q.gino.status()
+        await cls._invalidate_results()
+        return result
 
-        return await q.gino.model(cls.MODEL).apply()
+    @classmethod
+    @instrumented
+    async def update_in_batches(
+        cls,
+        filter_data: dict,
+        data: dict,
+        chunk_size: int = settings.WRITE_CHUNK_SIZE,
+        pause: float = settings.WRITE_CHUNK_PAUSE,
+        on_progress: Optional[Callable[[int, int], Any]] = None,
+    ) -> int:
+        """
+        Same as update, but rows are updated in chunks ordered by id, one statement and short locks per chunk.
+        Out of a transaction every chunk is committed on its own, so a failure keeps updated chunks.
+
+        :param filter_data: dict - filter rows data
+        :param data: dict - data to update rows
+        :param chunk_size: int - max rows updated by one statement
+        :param pause: float - seconds to sleep between chunks
+        :param on_progress: callable - called with rows count of the chunk and the total after each chunk
+        :return: int - count of updated rows
+        """
+        return await cls.__in_batches(
+            lambda ids: cls.MODEL.update.values(**data).where(cls.MODEL.id == any_(ids)),
+            filter_data,
+            chunk_size,
+            pause,
+            on_progress,
+        )
 
     @classmethod
+    @instrumented
     async def update_by_obj(cls, obj: db.Model, data: dict) -> db.Model:
         """
         :param obj: row obj to update
         :param data: dict - data to update row
         :return: row
         """
-        return (
+        replicas.stick_to_primary()
+        row = (
             await cls.MODEL.update.values(**data)
             .where(getattr(cls.MODEL, "id") == obj.id)
             .returning(*[getattr(cls.MODEL, item) for item in cls.FIELDS_TO_SELECT])
             .gino.model(cls.MODEL)
             .first()
         )
+        await cls._invalidate_results()
+        return row
 
     @classmethod
+    @instrumented
     async def get_or_create(cls, filter_data: dict, data: dict) -> db.Model:
         """
         :param filter_data: dict - filter row(s) data
         :param data: dict - data to create new row
         :return: row
         """
-        row = await cls.get_first(filter_data=filter_data)
-        if not row:
-            row = await cls.create(data)
+        replicas.stick_to_primary()  # the row is looked up on the primary, it may be just created
+        async with UnitOfWork():
+            row = await cls.get_first(filter_data=filter_data, for_update=True)
+            if not row:
+                row = await cls.create(data)
         return row
 
     @classmethod
+    @instrumented
     async def update_or_create(cls, field: str, value: Any, data: dict) -> db.Model:
         """
         :param data: dict - data to update row
@@ -336,12 +1621,14 @@ class BasePSQLRepository(BaseAbstractRepository):
         :return: row
         """
 
-        row = await cls.update(filter_data={field: value}, data=data)
-        if not row:
-            row = await cls.create(data)
+        async with UnitOfWork():
+            row = await cls.update(filter_data={field: value}, data=data)
+            if not row:
+                row = await cls.create(data)
         return row
 
     @classmethod
+    @instrumented
     async def delete(cls, filter_data: dict) -> bool:
         """
         :param filter_data: dict - filter row(s) data
@@ -349,7 +1636,86 @@ class BasePSQLRepository(BaseAbstractRepository):
         """
         q = cls.MODEL.delete  # type: ignore
         q = cls.get_query_filtered(q, filter_data)
+        replicas.stick_to_primary()
         status = await q.gino.status()
+        await cls._invalidate_results()
         status_str_split = status[0].split(" ")
         count_str = status_str_split[1]
         return int(count_str) > 0
+
+    @classmethod
+    @instrumented
+    async def delete_in_batches(
+        cls,
+        filter_data: dict,
+        chunk_size: int = settings.WRITE_CHUNK_SIZE,
+        pause: float = settings.WRITE_CHUNK_PAUSE,
+        on_progress: Optional[Callable[[int, int], Any]] = None,
+    ) -> int:
+        """
+        Same as delete, but rows are deleted in chunks ordered by id, one statement and short locks per chunk.
+        Out of a transaction every chunk is committed on its own, so a failure keeps deleted chunks.
+
+        :param filter_data: dict - filter rows data
+        :param chunk_size: int - max rows deleted by one statement
+        :param pause: float - seconds to sleep between chunks
+        :param on_progress: callable - called with rows count of the chunk and the total after each chunk
+        :return: int - count of deleted rows
+        """
+        return await cls.__in_batches(
+            lambda ids: cls.MODEL.delete.where(cls.MODEL.id == any_(ids)),  # type: ignore
+            filter_data,
+            chunk_size,
+            pause,
+            on_progress,
+        )
+
+    @classmethod
+    async def __chunk_ids(cls, filter_data: dict, last_id: Any, chunk_size: int) -> list:
+        if last_id is not None:
+            key_filter = {f"id{cls._ATR_SEPARATOR}gt": last_id}
+            filter_data = {"__and": [filter_data, key_filter]} if filter_data else key_filter
+        q = cls.get_query_cached(
+            ("chunk_ids", cls.get_filter_shape(filter_data)),
+            lambda: cls.get_query_filtered_shaped(cls.MODEL.select("id"), filter_data)
+            .order_by(cls.MODEL.id)
+            .limit(bindparam("limit")),
+        )
+        # ids are selected on the primary, replicas may not have rows of the previous chunks changed yet
+        rows = await cls._execute("all", q, {**cls.get_filter_params(filter_data), "limit": chunk_size})
+        return [row[0] for row in rows]
+
+    @classmethod
+    async def __in_batches(
+        cls,
+        statement: Callable[[list], Any],
+        filter_data: dict,
+        chunk_size: int,
+        pause: float,
+        on_progress: Optional[Callable[[int, int], Any]],
+    ) -> int:
+        if chunk_size < 1:
+            raise ValueError("Not supported chunk_size less than 1")
+        replicas.stick_to_primary()
+        total, last_id = 0, None
+        while True:
+            ids = await cls.__chunk_ids(filter_data, last_id, chunk_size)
+            if not ids:
+                break
+            # filter is checked again, rows could be changed after their ids were selected
+            q = cls.get_query_filtered(statement(ids), filter_data)
+            status = await q.gino.status()
+            await cls._invalidate_results()
+            affected = int(status[0].split(" ")[-1])
+            total += affected
+            logger.debug(f"{cls.__name__}: {status[0]} of chunk up to id {ids[-1]}, {total} rows in total")
+            if on_progress is not None:
+                progress = on_progress(affected, total)
+                if inspect.isawaitable(progress):
+                    await progress
+            if len(ids) < chunk_size:
+                break
+            last_id = ids[-1]
+            if pause > 0:
+                await asyncio.sleep(pause)
+        return total
@@ -0,0 +1,136 @@
+import functools
+import inspect
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from loguru import logger
+
+from src.app.config.settings import settings
+from src.app.core.utils.lru import LRUCache
+from src.app.core.utils.metrics import ROWS_BUCKETS, metrics
+
+# repository, method and filter shape of the repository call in progress, tags slow queries
+current_call: ContextVar[Optional[dict]] = ContextVar("current_call", default=None)
+
+
+def rows_count(result: Any) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        result = result[0]  # page with a cursor or a total count
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def _call_shape(cls: Any, signature: inspect.Signature, args: tuple, kwargs: dict) -> tuple:
+    """
+    :return: tuple - filter shape and ordering of the call, ordering is None for methods without it
+    """
+    try:
+        arguments = signature.bind_partial(cls, *args, **kwargs).arguments
+        shape = cls.get_filter_shape(arguments.get("filter_data"))
+    except (TypeError, ValueError):
+        return None, None
+    if "order_by" not in signature.parameters:
+        return shape, None
+    return shape, tuple(arguments.get("order_by") or cls.FIELDS_ORDER_BY or ())
+
+
+def _observe(
+    cls: Any, method: str, shape: Optional[tuple], order_by: Optional[tuple], started_at: float, rows: int
+) -> None:
+    duration = time.perf_counter() - started_at
+    labels = {"repository": cls.__name__, "method": method, "shape": repr(shape)}
+    metrics.histogram("repository_call_seconds", **labels).observe(duration)
+    metrics.histogram("repository_call_rows", buckets=ROWS_BUCKETS, **labels).observe(rows)
+    if shape is not None:
+        query_shapes.record(cls, shape, order_by, duration)
+
+
+def instrumented(func: Callable) -> Callable:
+    """
+    Times repository classmethods, latency and rows histograms are tagged with repository class,
+    method and filter shape. Async generators are timed until exhausted.
+    """
+    method, signature = func.__name__, inspect.signature(func)
+
+    if inspect.isasyncgenfunction(func):
+
+        @functools.wraps(func)
+        async def generator_wrapper(cls: Any, *args: Any, **kwargs: Any) -> Any:
+            # current_call is not set, it would leak to the consumer between items
+            shape, order_by = _call_shape(cls, signature, args, kwargs)
+            started_at, rows = time.perf_counter(), 0
+            try:
+                async for item in func(cls, *args, **kwargs):
+                    rows += len(item) if isinstance(item, list) else 1
+                    yield item
+            finally:
+                _observe(cls, method, shape, order_by, started_at, rows)
+
+        return generator_wrapper
+
+    @functools.wraps(func)
+    async def wrapper(cls: Any, *args: Any, **kwargs: Any) -> Any:
+        shape, order_by = _call_shape(cls, signature, args, kwargs)
+        token = current_call.set({"repository": cls.__name__, "method": method, "shape": shape})
+        started_at, result = time.perf_counter(), None
+        try:
+            result = await func(cls, *args, **kwargs)
+            return result
+        finally:
+            current_call.reset(token)
+            _observe(cls, method, shape, order_by, started_at, rows_count(result))
+
+    return wrapper
+
+
+class SlowQueryLog:
+    """Last slow queries, plans are added to entries when captured"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.entries: deque = deque(maxlen=maxsize)
+
+    def record(self, sql: str, duration: float) -> dict:
+        entry = {**(current_call.get() or {}), "sql": sql, "duration": duration, "plan": None}
+        self.entries.append(entry)
+        logger.warning(
+            f"Slow query {duration:.3f}s {entry.get('repository')}.{entry.get('method')} "
+            f"shape={entry.get('shape')!r}: {sql}"
+        )
+        return entry
+
+    def add_plan(self, entry: dict, plan: Any) -> None:
+        entry["plan"] = plan
+        logger.warning(f"Slow query plan {entry.get('repository')}.{entry.get('method')}: {plan}")
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class QueryShapes:
+    """Calls count and total time per repository, filter shape and ordering, see advisor.suggest_indexes"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.entries = LRUCache(maxsize=maxsize)
+
+    def record(self, repository: Any, shape: tuple, order_by: Optional[tuple], duration: float) -> None:
+        key = (repository, shape, order_by)
+        stats = self.entries.get(key)
+        if stats is None:
+            stats = self.entries[key] = {"calls": 0, "total_time": 0.0}
+        stats["calls"] += 1
+        stats["total_time"] += duration
+
+    def items(self) -> list:
+        return self.entries.items()
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+slow_query_log = SlowQueryLog(maxsize=settings.SLOW_QUERY_LOG_SIZE)
+query_shapes = QueryShapes(maxsize=settings.QUERY_SHAPES_SIZE)
@@ -0,0 +1,8 @@
+from src.app.core.db_schemas.shard_directory import ShardDirectory
+from src.app.core.repositories.base import BasePSQLRepository  # type: ignore
+
+
+class ShardDirectoryRepository(BasePSQLRepository):
+    MODEL = ShardDirectory
+    FIELDS_TO_SELECT = ["key_type", "key", "shard"]
+    FIELDS_ORDER_BY = ["key_type", "key"]
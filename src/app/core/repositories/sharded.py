@@ -0,0 +1,955 @@
+import asyncio
+import functools
+import heapq
+import inspect
+import itertools
+import uuid
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import UUID
+
+from src.app.config.settings import settings
+from src.app.core.repositories.base import BasePSQLRepository  # type: ignore
+from src.app.core.repositories.shard_directory import ShardDirectoryRepository
+from src.app.core.repositories.types import ListCountMode
+from src.app.core.repositories.uow import UnitOfWork
+from src.app.extensions.shards import Shard, shards
+
+
+class _Descending:
+    """Reverses the order of the wrapped value, for merges of descending orderings"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and self.value == other.value
+
+
+class ShardedPSQLRepository(BasePSQLRepository):
+    """
+    Repository of a table split across shards, see extensions.shards. Rows live on the shard of their
+    SHARD_KEY value. Shards of DIRECTORY_KEYS values are kept in the shard directory of the default
+    database, so lookups by them hit one shard too and the keys stay unique across shards.
+
+    Reads and writes by a filter run on the shard of the filter if it has the shard key or a directory
+    key equal to a value, and on all shards otherwise, lists of shards are merged in order. Created rows
+    go to the shard of their shard key, upserts are supported on the shard key or a directory key only,
+    neither is updated by them. Batched writes run shard by shard. In a shard set by the context,
+    see shards.using, all methods run on it as of BasePSQLRepository. Without shards it works as
+    BasePSQLRepository.
+
+    Ids are generated by each shard, so they are unique per shard only, SHARD_KEY identifies rows
+    and breaks ties of keyset orderings.
+    """
+
+    SHARD_KEY = "uuid"
+    DIRECTORY_KEYS: List[str] = []
+
+    @classmethod
+    def _parent(cls) -> Any:
+        # methods of BasePSQLRepository, the module is not type checked
+        return super()
+
+    @staticmethod
+    def _current_shard() -> Shard:
+        shard = shards.current()
+        if shard is None:
+            raise ValueError("Not supported out of a shard, see shards.using")
+        return shard
+
+    @classmethod
+    def is_routed(cls) -> bool:
+        """
+        :return: bool - flag calls are routed to shards, they are not if a shard is set by the context
+        """
+        return shards.is_enabled and shards.current() is None
+
+    @classmethod
+    def shard_of(cls, value: Any) -> Shard:
+        """
+        :param value: Any - value of the shard key
+        :return: Shard - shard of the row
+        """
+        column = getattr(cls.MODEL, cls.SHARD_KEY)
+        return shards.shard_for(str(uuid.UUID(str(value))) if isinstance(column.type, UUID) else value)
+
+    @classmethod
+    def _new_shard_key(cls) -> Any:
+        return cls.MODEL.__table__.c[cls.SHARD_KEY].default.arg(None)
+
+    @classmethod
+    def _with_shard_key(cls, row: dict) -> dict:
+        if row.get(cls.SHARD_KEY) is not None:
+            return row
+        return {**row, cls.SHARD_KEY: cls._new_shard_key()}
+
+    @classmethod
+    def _key_type(cls, field: str) -> str:
+        return f"{cls.MODEL.__tablename__}.{field}"
+
+    @classmethod
+    def _equal_value(cls, filter_data: Optional[dict], field: str) -> Any:
+        # top level equality only, None is an IS NULL lookup
+        for key in (field, f"{field}{cls._ATR_SEPARATOR}e"):
+            if key in (filter_data or {}):
+                return filter_data[key]  # type: ignore
+        return None
+
+    @classmethod
+    async def shard_of_filter(cls, filter_data: Optional[dict]) -> Optional[Shard]:
+        """
+        :param filter_data: dict - filter rows data
+        :return: Shard - the only shard with rows of the filter, None if rows may be on any shard
+        """
+        value = cls._equal_value(filter_data, cls.SHARD_KEY)
+        if value is not None:
+            return cls.shard_of(value)
+        for field in cls.DIRECTORY_KEYS:
+            value = cls._equal_value(filter_data, field)
+            if value is None:
+                continue
+            # rows created before the directory was filled are found on all shards
+            entry = await shards.run_on(
+                None,
+                lambda: ShardDirectoryRepository.get_first(
+                    filter_data={"key_type": cls._key_type(field), "key": str(value)}
+                ),
+            )
+            if entry is not None:
+                return shards.shards[entry.shard]
+        return None
+
+    @classmethod
+    async def _run_on_shards(
+        cls,
+        filter_data: Optional[dict],
+        func: Callable[[], Awaitable[Any]],
+        found: Callable[[Any], bool] = bool,
+    ) -> list:
+        """
+        :param found: callable - flag the result of the shard of the filter has rows
+        :return: list - results of func on the shard of the filter or on all shards
+        """
+        shard = await cls.shard_of_filter(filter_data)
+        if shard is None:
+            return await shards.run_on_each(func)
+        result = await shards.run_on(shard, func)
+        # while rebalancing, rows may still be on their previous shard
+        if found(result) or not settings.POSTGRES_SHARD_MIGRATING:
+            return [result]
+        return await shards.run_on_each(func)
+
+    @classmethod
+    async def _target_shards(cls, filter_data: Optional[dict]) -> List[Shard]:
+        shard = await cls.shard_of_filter(filter_data)
+        if shard is None or settings.POSTGRES_SHARD_MIGRATING:
+            return list(shards.shards)
+        return [shard]
+
+    @classmethod
+    def _order_key(cls, order_by: List[str]) -> Callable[[Any], tuple]:
+        # same order as of postgres, NULLs are last for ascending and first for descending order
+        def key(row: Any) -> tuple:
+            values = []
+            for field in order_by:
+                value = getattr(row, field.lstrip("-"))
+                value = (value is None, value)
+                values.append(_Descending(value) if field.startswith("-") else value)
+            return tuple(values)
+
+        return key
+
+    @classmethod
+    def _with_ordering_fields(cls, fields: Optional[list], order_by: List[str]) -> Optional[list]:
+        # ordering fields are needed to merge rows of shards
+        if not fields:
+            return fields
+        return [*fields, *[field.lstrip("-") for field in order_by if field.lstrip("-") not in fields]]
+
+    @classmethod
+    def _merged_page(cls, results: List[list], order_by: List[str], offset: int, end: Optional[int]) -> list:
+        merged = heapq.merge(*results, key=cls._order_key(order_by))
+        return list(itertools.islice(merged, offset, end))
+
+    @classmethod
+    async def _list_on_shards(
+        cls,
+        filter_data: Optional[dict],
+        order_by: Optional[list],
+        limit: Optional[int],
+        offset: Optional[int],
+        load: Callable[[Optional[int], int], Awaitable[list]],
+    ) -> list:
+        start = offset or 0
+        shard = await cls.shard_of_filter(filter_data)
+        if shard is not None:
+            rows = await shards.run_on(shard, lambda: load(limit, start))
+            if rows or not settings.POSTGRES_SHARD_MIGRATING:
+                return rows
+        # every shard returns rows up to the end of the page, the page is cut from the merged rows
+        end = None if limit is None else start + limit
+        results = await shards.run_on_each(lambda: load(end, 0))
+        return cls._merged_page(results, order_by or cls.FIELDS_ORDER_BY, start, end)
+
+    @classmethod
+    async def get_first(cls, filter_data: Optional[dict] = None, for_update: bool = False) -> Any:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.get_first(filter_data=filter_data, for_update=for_update)
+        results = await cls._run_on_shards(
+            filter_data, lambda: parent.get_first(filter_data=filter_data, for_update=for_update)
+        )
+        return next((row for row in results if row is not None), None)
+
+    @classmethod
+    async def get_first_partial(
+        cls, fields: Optional[list] = None, filter_data: Optional[dict] = None
+    ) -> Any:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.get_first_partial(fields=fields, filter_data=filter_data)
+        results = await cls._run_on_shards(
+            filter_data, lambda: parent.get_first_partial(fields=fields, filter_data=filter_data)
+        )
+        return next((row for row in results if row is not None), None)
+
+    @classmethod
+    async def get_list(
+        cls,
+        filter_data: Optional[dict] = None,
+        order_by: Optional[list] = None,
+        limit: Optional[int] = settings.BATCH_SIZE,
+        offset: Optional[int] = 0,
+        for_update: bool = False,
+    ) -> list:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.get_list(
+                filter_data=filter_data, order_by=order_by, limit=limit, offset=offset, for_update=for_update
+            )
+        return await cls._list_on_shards(
+            filter_data,
+            order_by,
+            limit,
+            offset,
+            lambda limit_, offset_: parent.get_list(
+                filter_data=filter_data,
+                order_by=order_by,
+                limit=limit_,
+                offset=offset_,
+                for_update=for_update,
+            ),
+        )
+
+    @classmethod
+    async def get_list_partial(
+        cls,
+        fields: Optional[list] = None,
+        filter_data: Optional[dict] = None,
+        order_by: Optional[list] = None,
+        limit: Optional[int] = settings.BATCH_SIZE,
+        offset: Optional[int] = 0,
+    ) -> list:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.get_list_partial(
+                fields=fields, filter_data=filter_data, order_by=order_by, limit=limit, offset=offset
+            )
+        order_by = order_by or cls.FIELDS_ORDER_BY
+        fields = cls._with_ordering_fields(fields, order_by)
+        return await cls._list_on_shards(
+            filter_data,
+            order_by,
+            limit,
+            offset,
+            lambda limit_, offset_: parent.get_list_partial(
+                fields=fields,
+                filter_data=filter_data,
+                order_by=order_by,
+                limit=limit_,
+                offset=offset_,
+            ),
+        )
+
+    @classmethod
+    async def count(cls, filter_data: Optional[dict] = None) -> int:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.count(filter_data=filter_data)
+        return sum(await cls._run_on_shards(filter_data, lambda: parent.count(filter_data=filter_data)))
+
+    @classmethod
+    async def count_estimate(cls, filter_data: Optional[dict] = None) -> int:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.count_estimate(filter_data=filter_data)
+        return sum(
+            await cls._run_on_shards(filter_data, lambda: parent.count_estimate(filter_data=filter_data))
+        )
+
+    @classmethod
+    async def exists(cls, filter_data: Optional[dict]) -> bool:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.exists(filter_data=filter_data)
+        return any(await cls._run_on_shards(filter_data, lambda: parent.exists(filter_data=filter_data)))
+
+    @classmethod
+    def _keyset_order_by(cls, order_by: List[str]) -> List[str]:
+        """
+        :return: list[str] - ordering fields with "id" and SHARD_KEY tie-breakers, ids are unique per shard
+        """
+        order_by = [
+            f"-{field.key}" if is_desc else field.key for field, is_desc in cls.keyset_ordering(order_by)
+        ]
+        if all(field.lstrip("-") != cls.SHARD_KEY for field in order_by):
+            order_by.append(f"-{cls.SHARD_KEY}" if order_by[-1].startswith("-") else cls.SHARD_KEY)
+        return order_by
+
+    @classmethod
+    def cursor_ordering(cls, order_by: Optional[list] = None) -> List[tuple]:
+        if not cls.is_routed():
+            return cls._parent().cursor_ordering(order_by)
+        return cls.keyset_ordering(cls._keyset_order_by(order_by or cls.FIELDS_ORDER_BY))
+
+    @classmethod
+    async def _keyset_on_shards(
+        cls, filter_data: Optional[dict], order_by: list, limit: int, load: Callable[[], Awaitable[tuple]]
+    ) -> Tuple[list, Optional[str]]:
+        ordering = cls.keyset_ordering(order_by)
+        results = await cls._run_on_shards(filter_data, load, found=lambda result: bool(result[0]))
+        # every shard returns its first rows after the cursor, the page is the first of the merged ones
+        merged = cls._merged_page([rows for rows, _ in results], order_by, 0, None)
+        rows = merged[:limit]
+        if len(merged) > limit or any(next_cursor for _, next_cursor in results):
+            return rows, cls.encode_cursor(rows[-1], ordering)
+        return rows, None
+
+    @classmethod
+    async def get_list_keyset_partial(
+        cls,
+        fields: Optional[list] = None,
+        filter_data: Optional[dict] = None,
+        order_by: Optional[list] = None,
+        limit: int = settings.BATCH_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[list, Optional[str]]:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.get_list_keyset_partial(
+                fields=fields, filter_data=filter_data, order_by=order_by, limit=limit, cursor=cursor
+            )
+        order_by = cls._keyset_order_by(order_by or cls.FIELDS_ORDER_BY)
+        return await cls._keyset_on_shards(
+            filter_data,
+            order_by,
+            limit,
+            lambda: parent.get_list_keyset_partial(
+                fields=fields, filter_data=filter_data, order_by=order_by, limit=limit, cursor=cursor
+            ),
+        )
+
+    @classmethod
+    async def get_list_keyset(
+        cls,
+        filter_data: Optional[dict] = None,
+        order_by: Optional[list] = None,
+        limit: int = settings.BATCH_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[list, Optional[str]]:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.get_list_keyset(
+                filter_data=filter_data, order_by=order_by, limit=limit, cursor=cursor
+            )
+        order_by = cls._keyset_order_by(order_by or cls.FIELDS_ORDER_BY)
+        return await cls._keyset_on_shards(
+            filter_data,
+            order_by,
+            limit,
+            lambda: parent.get_list_keyset(
+                filter_data=filter_data, order_by=order_by, limit=limit, cursor=cursor
+            ),
+        )
+
+    @classmethod
+    async def get_list_with_count(
+        cls,
+        filter_data: Optional[dict] = None,
+        order_by: Optional[list] = None,
+        limit: Optional[int] = settings.BATCH_SIZE,
+        offset: Optional[int] = 0,
+        mode: ListCountMode = ListCountMode(settings.LIST_COUNT_MODE),
+        fields: Optional[list] = None,
+    ) -> Tuple[list, int]:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.get_list_with_count(filter_data, order_by, limit, offset, mode, fields)
+        order_by = order_by or cls.FIELDS_ORDER_BY
+        fields = cls._with_ordering_fields(fields, order_by)
+        start = offset or 0
+        end = None if limit is None else start + limit
+        shard = await cls.shard_of_filter(filter_data)
+        if shard is not None:
+            rows, total_count = await shards.run_on(
+                shard, lambda: parent.get_list_with_count(filter_data, order_by, limit, start, mode, fields)
+            )
+            if total_count or not settings.POSTGRES_SHARD_MIGRATING:
+                return rows, total_count
+        results = await shards.run_on_each(
+            lambda: parent.get_list_with_count(filter_data, order_by, end, 0, mode, fields)
+        )
+        rows = cls._merged_page([rows_ for rows_, _ in results], order_by, start, end)
+        return rows, sum(total_count for _, total_count in results)
+
+    @staticmethod
+    async def _iter_on(shard: Shard, iterator: AsyncGenerator[Any, None]) -> AsyncGenerator[Any, None]:
+        # the shard is set only while the iterator runs, rows are handled by the caller out of it
+        try:
+            while True:
+                with shards.using(shard):
+                    try:
+                        item = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        return
+                yield item
+        finally:
+            with shards.using(shard):
+                await iterator.aclose()
+
+    @classmethod
+    async def _merged(
+        cls, iterators: List[AsyncGenerator[Any, None]], order_by: List[str]
+    ) -> AsyncGenerator[Any, None]:
+        key = cls._order_key(order_by)
+        heads: list = []
+
+        async def push(index: int) -> None:
+            try:
+                row = await iterators[index].__anext__()
+            except StopAsyncIteration:
+                return
+            heapq.heappush(heads, (key(row), index, row))
+
+        try:
+            for index in range(len(iterators)):
+                await push(index)
+            while heads:
+                _, index, row = heapq.heappop(heads)
+                yield row
+                await push(index)
+        finally:
+            for iterator in iterators:
+                await iterator.aclose()
+
+    @classmethod
+    async def _iter_on_shards(
+        cls,
+        filter_data: Optional[dict],
+        order_by: List[str],
+        prefetch: int,
+        as_batches: bool,
+        iterate: Callable[[], AsyncGenerator[Any, None]],
+    ) -> AsyncIterator[Any]:
+        """
+        :param iterate: callable - iterator of single rows of a shard
+        :return: async iterator of rows of shards merged in order, or of lists of up to prefetch rows
+        """
+        rows = cls._merged(
+            [cls._iter_on(shard, iterate()) for shard in await cls._target_shards(filter_data)], order_by
+        )
+        batch: list = []
+        try:
+            async for row in rows:
+                if not as_batches:
+                    yield row
+                    continue
+                batch.append(row)
+                if len(batch) >= prefetch:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            await rows.aclose()
+
+    @classmethod
+    async def iter_list_partial(
+        cls,
+        fields: Optional[list] = None,
+        filter_data: Optional[dict] = None,
+        order_by: Optional[list] = None,
+        prefetch: int = settings.ITER_PREFETCH_SIZE,
+        as_batches: bool = False,
+    ) -> AsyncIterator[Any]:
+        parent = cls._parent()
+        if not cls.is_routed():
+            async for item in parent.iter_list_partial(fields, filter_data, order_by, prefetch, as_batches):
+                yield item
+            return
+        order_by = order_by or cls.FIELDS_ORDER_BY
+        fields = cls._with_ordering_fields(fields, order_by)
+        async for item in cls._iter_on_shards(
+            filter_data,
+            order_by,
+            prefetch,
+            as_batches,
+            lambda: parent.iter_list_partial(fields, filter_data, order_by, prefetch),
+        ):
+            yield item
+
+    @classmethod
+    async def iter_list(
+        cls,
+        filter_data: Optional[dict] = None,
+        order_by: Optional[list] = None,
+        prefetch: int = settings.ITER_PREFETCH_SIZE,
+        as_batches: bool = False,
+    ) -> AsyncIterator[Any]:
+        parent = cls._parent()
+        if not cls.is_routed():
+            async for item in parent.iter_list(filter_data, order_by, prefetch, as_batches):
+                yield item
+            return
+        order_by = order_by or cls.FIELDS_ORDER_BY
+        async for item in cls._iter_on_shards(
+            filter_data,
+            order_by,
+            prefetch,
+            as_batches,
+            lambda: parent.iter_list(filter_data, order_by, prefetch),
+        ):
+            yield item
+
+    @classmethod
+    def _directory_entries(
+        cls, values: List[dict], shard: Shard, fields: Optional[list] = None
+    ) -> List[dict]:
+        """
+        :param values: list[dict] - values of rows fields
+        :return: list[dict] - directory rows of not None directory keys values
+        """
+        return [
+            {"key_type": cls._key_type(field), "key": str(item[field]), "shard": shard.index}
+            for item in values
+            for field in fields or cls.DIRECTORY_KEYS
+            if item.get(field) is not None
+        ]
+
+    @classmethod
+    async def _directory_add(cls, entries: List[dict]) -> None:
+        # a plain insert, a key used by a row of any shard raises unique violation
+        if entries:
+            await shards.run_on(None, lambda: ShardDirectoryRepository.create_many(entries))
+
+    @classmethod
+    async def _directory_remove(cls, entries: List[dict]) -> None:
+        entries = sorted(entries, key=lambda entry: entry["key_type"])
+        for key_type, group in itertools.groupby(entries, key=lambda entry: entry["key_type"]):
+            keys = [entry["key"] for entry in group]
+            await shards.run_on(
+                None,
+                lambda: ShardDirectoryRepository.delete(filter_data={"key_type": key_type, "key__in": keys}),
+            )
+
+    @classmethod
+    async def create(cls, data: dict) -> Any:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.create(data)
+        data = cls._with_shard_key(data)
+        shard = cls.shard_of(data[cls.SHARD_KEY])
+        entries = cls._directory_entries([data], shard)
+        await cls._directory_add(entries)
+        try:
+            return await shards.run_on(shard, lambda: parent.create(data))
+        except Exception:
+            await cls._directory_remove(entries)
+            raise
+
+    @classmethod
+    async def update(
+        cls,
+        filter_data: dict,
+        data: dict,
+        return_updated: bool = True,
+        merge_fields: Optional[list] = None,
+    ) -> Any:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.update(filter_data, data, return_updated, merge_fields)
+        changed = [field for field in cls.DIRECTORY_KEYS if field in data]
+
+        async def update_on_shard() -> Any:
+            if not changed:
+                return await parent.update(filter_data, data, return_updated, merge_fields)
+            shard = cls._current_shard()
+            rows = await parent.get_list_partial(fields=changed, filter_data=filter_data, limit=None)
+            if not rows:
+                return None
+            old = cls._directory_entries([dict(row) for row in rows], shard, changed)
+            new = cls._directory_entries([data], shard, changed)
+            added = [entry for entry in new if entry not in old]
+            await cls._directory_add(added)
+            try:
+                result = await parent.update(filter_data, data, return_updated, merge_fields)
+            except Exception:
+                await cls._directory_remove(added)
+                raise
+            await cls._directory_remove([entry for entry in old if entry not in new])
+            return result
+
+        results = await cls._run_on_shards(filter_data, update_on_shard)
+        return next((result for result in results if result is not None), None)
+
+    @classmethod
+    async def delete(cls, filter_data: dict) -> bool:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.delete(filter_data)
+
+        async def delete_on_shard() -> bool:
+            rows = []
+            if cls.DIRECTORY_KEYS:
+                rows = await parent.get_list_partial(
+                    fields=cls.DIRECTORY_KEYS, filter_data=filter_data, limit=None
+                )
+            deleted = await parent.delete(filter_data)
+            await cls._directory_remove(
+                cls._directory_entries([dict(row) for row in rows], cls._current_shard())
+            )
+            return deleted
+
+        return any(await cls._run_on_shards(filter_data, delete_on_shard))
+
+    @classmethod
+    def _upsert_fields(cls, rows: List[dict], conflict_fields: list, update_fields: Optional[list]) -> list:
+        """
+        :return: list[str] - fields updated for existing rows, the shard key and directory keys are kept
+        """
+        if len(conflict_fields) != 1 or conflict_fields[0] not in (cls.SHARD_KEY, *cls.DIRECTORY_KEYS):
+            raise ValueError(f"Not supported conflict fields {conflict_fields} of sharded {cls.MODEL}")
+        if update_fields is None:
+            update_fields = [field for field in rows[0] if field not in (*conflict_fields, cls.SHARD_KEY)]
+        keys = {cls.SHARD_KEY, *cls.DIRECTORY_KEYS}.intersection(update_fields) - set(conflict_fields)
+        if keys:
+            raise ValueError(f"Not supported update of keys {sorted(keys)} of sharded {cls.MODEL}")
+        return update_fields
+
+    @classmethod
+    async def _shards_of_keys(cls, field: str, values: list) -> Dict[str, Shard]:
+        """
+        :param field: str - the shard key or a directory key
+        :param values: list - not None values of the field
+        :return: dict - shards of existing rows by str values of the field
+        """
+        if not values:
+            return {}
+        if field != cls.SHARD_KEY:
+            entries = await shards.run_on(
+                None,
+                lambda: ShardDirectoryRepository.get_list(
+                    filter_data={
+                        "key_type": cls._key_type(field),
+                        "key__in": [str(value) for value in values],
+                    },
+                    limit=None,
+                ),
+            )
+            return {entry.key: shards.shards[entry.shard] for entry in entries}
+        parent = cls._parent()
+        by_shard: Dict[Shard, list] = {}
+        for value in values:
+            by_shard.setdefault(cls.shard_of(value), []).append(value)
+        found: Dict[str, Shard] = {}
+        for shard, keys in by_shard.items():
+            rows = await shards.run_on(
+                shard,
+                lambda: parent.get_list_partial(
+                    fields=[field], filter_data={f"{field}{cls._ATR_SEPARATOR}in": keys}, limit=None
+                ),
+            )
+            found.update((str(row[field]), shard) for row in rows)
+        return found
+
+    @classmethod
+    async def _grouped_by_shard(
+        cls, rows: List[dict], field: str
+    ) -> Tuple[Dict[Shard, List[dict]], Dict[Shard, List[dict]]]:
+        """
+        Rows of the same not None field value are deduplicated, the last one wins.
+
+        :param rows: list[dict] - rows to create or update by the field, the shard key or a directory key
+        :return: tuple[dict, dict] - rows and directory entries of not existing rows by shard
+        """
+        rows = [cls._with_shard_key(row) for row in rows]
+        unique = {str(row[field]): row for row in rows if row[field] is not None}
+        rows = [row for row in rows if row[field] is None] + list(unique.values())
+        existing = await cls._shards_of_keys(field, [row[field] for row in unique.values()])
+        groups: Dict[Shard, List[dict]] = {}
+        entries: Dict[Shard, List[dict]] = {}
+        for row in rows:
+            shard = existing.get(str(row[field])) if row[field] is not None else None
+            if shard is None:
+                shard = cls.shard_of(row[cls.SHARD_KEY])
+                entries.setdefault(shard, []).extend(cls._directory_entries([row], shard))
+            groups.setdefault(shard, []).append(row)
+        return groups, entries
+
+    @classmethod
+    async def _write_on_shards(
+        cls,
+        groups: Dict[Shard, List[dict]],
+        entries: Dict[Shard, List[dict]],
+        write: Callable[[List[dict]], Awaitable[Any]],
+    ) -> list:
+        """
+        Directory entries are added before rows are written, entries of shards failed to write are removed.
+
+        :param groups: dict - rows by shard
+        :param entries: dict - directory entries of new rows by shard
+        :param write: callable - writes rows of a shard, called on each shard in parallel
+        :return: list - results of write of shards
+        """
+        await cls._directory_add([entry for shard_entries in entries.values() for entry in shard_entries])
+        results = await asyncio.gather(
+            *[shards.run_on(shard, functools.partial(write, rows)) for shard, rows in groups.items()],
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await cls._directory_remove(
+                [
+                    entry
+                    for shard, result in zip(groups, results)
+                    if isinstance(result, BaseException)
+                    for entry in entries.get(shard, [])
+                ]
+            )
+            raise errors[0]
+        return results
+
+    @classmethod
+    async def create_many(cls, rows: List[dict], chunk_size: int = settings.BULK_CHUNK_SIZE) -> list:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.create_many(rows, chunk_size)
+        groups: Dict[Shard, List[dict]] = {}
+        entries: Dict[Shard, List[dict]] = {}
+        for row in rows:
+            row = cls._with_shard_key(row)
+            shard = cls.shard_of(row[cls.SHARD_KEY])
+            groups.setdefault(shard, []).append(row)
+            entries.setdefault(shard, []).extend(cls._directory_entries([row], shard))
+        results = await cls._write_on_shards(
+            groups, entries, lambda rows_: parent.create_many(rows_, chunk_size)
+        )
+        return [row for created in results for row in created]
+
+    @classmethod
+    async def upsert(
+        cls,
+        data: dict,
+        conflict_fields: list,
+        update_fields: Optional[list] = None,
+        merge_fields: Optional[list] = None,
+    ) -> Any:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.upsert(data, conflict_fields, update_fields, merge_fields)
+        update_fields = cls._upsert_fields([data], conflict_fields, update_fields)
+        groups, entries = await cls._grouped_by_shard([data], conflict_fields[0])
+        results = await cls._write_on_shards(
+            groups, entries, lambda rows: parent.upsert(rows[0], conflict_fields, update_fields, merge_fields)
+        )
+        return results[0]
+
+    @classmethod
+    async def upsert_many(
+        cls,
+        rows: List[dict],
+        conflict_fields: list,
+        update_fields: Optional[list] = None,
+        merge_fields: Optional[list] = None,
+        chunk_size: int = settings.BULK_CHUNK_SIZE,
+    ) -> list:
+        parent = cls._parent()
+        if not cls.is_routed() or not rows:
+            return await parent.upsert_many(rows, conflict_fields, update_fields, merge_fields, chunk_size)
+        update_fields = cls._upsert_fields(rows, conflict_fields, update_fields)
+        groups, entries = await cls._grouped_by_shard(rows, conflict_fields[0])
+        results = await cls._write_on_shards(
+            groups,
+            entries,
+            lambda rows_: parent.upsert_many(rows_, conflict_fields, update_fields, merge_fields, chunk_size),
+        )
+        return [row for affected in results for row in affected]
+
+    @classmethod
+    async def copy_upsert(
+        cls,
+        rows: List[dict],
+        conflict_fields: list,
+        update_fields: Optional[list] = None,
+        merge_fields: Optional[list] = None,
+    ) -> int:
+        parent = cls._parent()
+        if not cls.is_routed() or not rows:
+            return await parent.copy_upsert(rows, conflict_fields, update_fields, merge_fields)
+        update_fields = cls._upsert_fields(rows, conflict_fields, update_fields)
+        groups, entries = await cls._grouped_by_shard(rows, conflict_fields[0])
+        results = await cls._write_on_shards(
+            groups,
+            entries,
+            lambda rows_: parent.copy_upsert(rows_, conflict_fields, update_fields, merge_fields),
+        )
+        return sum(results)
+
+    @classmethod
+    async def update_by_obj(cls, obj: Any, data: dict) -> Any:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.update_by_obj(obj, data)
+        # ids are unique per shard only
+        return await cls.update({cls.SHARD_KEY: getattr(obj, cls.SHARD_KEY)}, data)
+
+    @classmethod
+    async def get_or_create(cls, filter_data: dict, data: dict) -> Any:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.get_or_create(filter_data, data)
+        shard = await cls.shard_of_filter(filter_data)
+        if shard is None:
+            row = await cls.get_first(filter_data=filter_data)
+        else:
+
+            async def get_locked() -> Any:
+                async with UnitOfWork():
+                    return await parent.get_first(filter_data=filter_data, for_update=True)
+
+            row = await shards.run_on(shard, get_locked)
+        if row is None:
+            # the row goes to the shard of its own shard key
+            row = await cls.create(data)
+        return row
+
+    @classmethod
+    async def update_or_create(cls, field: str, value: Any, data: dict) -> Any:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.update_or_create(field, value, data)
+        row = await cls.update(filter_data={field: value}, data=data)
+        if not row:
+            row = await cls.create(data)
+        return row
+
+    @classmethod
+    async def _in_batches_on_shards(
+        cls,
+        filter_data: dict,
+        on_progress: Optional[Callable[[int, int], Any]],
+        run: Callable[[Callable[[int, int], Any]], Awaitable[int]],
+    ) -> int:
+        """
+        :param run: callable - runs the batched write on a shard with its progress callback
+        :return: int - count of affected rows of all shards, shards are written one by one
+        """
+        total = 0
+
+        def progress(affected: int, shard_total: int) -> Any:
+            return on_progress(affected, total + shard_total) if on_progress is not None else None
+
+        for shard in await cls._target_shards(filter_data):
+            total += await shards.run_on(shard, lambda: run(progress))
+        return total
+
+    @classmethod
+    async def update_in_batches(
+        cls,
+        filter_data: dict,
+        data: dict,
+        chunk_size: int = settings.WRITE_CHUNK_SIZE,
+        pause: float = settings.WRITE_CHUNK_PAUSE,
+        on_progress: Optional[Callable[[int, int], Any]] = None,
+    ) -> int:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.update_in_batches(filter_data, data, chunk_size, pause, on_progress)
+        keys = {cls.SHARD_KEY, *cls.DIRECTORY_KEYS}.intersection(data)
+        if keys:
+            raise ValueError(f"Not supported update of keys {sorted(keys)} of sharded {cls.MODEL} in batches")
+        return await cls._in_batches_on_shards(
+            filter_data,
+            on_progress,
+            lambda progress: parent.update_in_batches(filter_data, data, chunk_size, pause, progress),
+        )
+
+    @classmethod
+    async def _delete_chunks(
+        cls, filter_data: dict, chunk_size: int, pause: float, on_progress: Callable[[int, int], Any]
+    ) -> int:
+        """Deletes rows of the shard of the context in chunks and removes directory entries of deleted rows"""
+        parent = cls._parent()
+        shard = cls._current_shard()
+        total, last_id = 0, None
+        while True:
+            chunk_filter = filter_data
+            if last_id is not None:
+                key_filter = {f"id{cls._ATR_SEPARATOR}gt": last_id}
+                chunk_filter = {"__and": [filter_data, key_filter]} if filter_data else key_filter
+            rows = await parent.get_list_partial(
+                fields=["id", *cls.DIRECTORY_KEYS],
+                filter_data=chunk_filter,
+                order_by=["id"],
+                limit=chunk_size,
+            )
+            if not rows:
+                break
+            ids = [row["id"] for row in rows]
+            id_filter = {f"id{cls._ATR_SEPARATOR}in": ids}
+            affected = await parent.delete_in_batches(
+                {"__and": [filter_data, id_filter]} if filter_data else id_filter, chunk_size, 0
+            )
+            total += affected
+            if cls.DIRECTORY_KEYS:
+                # the filter is checked again by the delete, rows changed meanwhile are kept
+                kept = {
+                    row["id"]
+                    for row in await parent.get_list_partial(fields=["id"], filter_data=id_filter, limit=None)
+                }
+                deleted = [dict(row) for row in rows if row["id"] not in kept]
+                await cls._directory_remove(cls._directory_entries(deleted, shard))
+            progress = on_progress(affected, total)
+            if inspect.isawaitable(progress):
+                await progress
+            if len(ids) < chunk_size:
+                break
+            last_id = ids[-1]
+            if pause > 0:
+                await asyncio.sleep(pause)
+        return total
+
+    @classmethod
+    async def delete_in_batches(
+        cls,
+        filter_data: dict,
+        chunk_size: int = settings.WRITE_CHUNK_SIZE,
+        pause: float = settings.WRITE_CHUNK_PAUSE,
+        on_progress: Optional[Callable[[int, int], Any]] = None,
+    ) -> int:
+        parent = cls._parent()
+        if not cls.is_routed():
+            return await parent.delete_in_batches(filter_data, chunk_size, pause, on_progress)
+        if chunk_size < 1:
+            raise ValueError("Not supported chunk_size less than 1")
+        return await cls._in_batches_on_shards(
+            filter_data,
+            on_progress,
+            lambda progress: cls._delete_chunks(filter_data, chunk_size, pause, progress),
+        )
@@ -0,0 +1,23 @@
+from typing import Any
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of the query, bind parameters of the query are kept"""
+
+    def __init__(self, query: Any, analyze: bool = False, buffers: bool = False) -> None:
+        self.query = query
+        self.analyze = analyze
+        self.buffers = buffers
+
+
+@compiles(Explain, "postgresql")
+def visit_explain(element: Explain, compiler: Any, **kw: Any) -> str:
+    options = ["FORMAT JSON"]
+    if element.analyze:
+        options.append("ANALYZE")
+    if element.buffers:
+        options.append("BUFFERS")
+    return f"EXPLAIN ({', '.join(options)}) {compiler.process(element.query, **kw)}"
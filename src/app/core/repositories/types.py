@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class CountStrategy(str, Enum):
+    EXACT = "exact"
+    ESTIMATE = "estimate"  # planner estimate
+    AUTO = "auto"  # exact below COUNT_EXACT_THRESHOLD rows, estimate otherwise
+
+
+class ListCountMode(str, Enum):
+    WINDOW = "window"  # count(*) OVER () in the page query, one round trip
+    CONCURRENT = "concurrent"  # page and count queries at the same time on separate connections
@@ -0,0 +1,64 @@
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from asyncpg.exceptions import QueryCanceledError
+
+from src.app.core.utils import deadline
+from src.app.core.utils.deadline import DeadlineExceeded, current_deadline
+from src.app.extensions.db import db
+
+current_uow: ContextVar[Optional["UnitOfWork"]] = ContextVar("current_uow", default=None)
+
+
+class UnitOfWork:
+    """
+    One pinned connection and transaction for all repository calls inside, committed on exit
+    and rolled back on an exception. Nested units of work are savepoints.
+
+    async with UnitOfWork():
+        user = await UsersRepository.get_first(filter_data={"email": email}, for_update=True)
+        await UsersRepository.update_by_obj(user, data)
+    """
+
+    def __init__(self, isolation: str = "read_committed", readonly: bool = False) -> None:
+        self.isolation = isolation
+        self.readonly = readonly
+        self.transaction: Any = None
+        self._transaction_ctx: Any = None
+        self._token: Any = None
+        self._written: set = set()
+
+    async def __aenter__(self) -> "UnitOfWork":
+        timeout = deadline.remaining()
+        outer = current_uow.get()
+        self._transaction_ctx = db.transaction(isolation=self.isolation, readonly=self.readonly)
+        self.transaction = await self._transaction_ctx.__aenter__()
+        self._token = current_uow.set(self)
+        if timeout is not None and outer is None:
+            # statements of the transaction are cancelled by the server after the request deadline
+            await self.transaction.connection.status(
+                f"SET LOCAL statement_timeout = {max(1, int(timeout * 1000))}"
+            )
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> Any:
+        current_uow.reset(self._token)
+        result = await self._transaction_ctx.__aexit__(exc_type, exc, tb)
+        if isinstance(exc, QueryCanceledError) and current_deadline.get() is not None:
+            raise DeadlineExceeded() from exc
+        outer = current_uow.get()
+        if outer is not None:
+            # results are invalidated when the outer transaction is committed
+            outer._written.update(self._written)
+        elif exc_type is None:
+            # results cached by concurrent reads before the commit are dropped too
+            for repository in self._written:
+                await repository._invalidate_results()
+        return result
+
+    def mark_written(self, repository: Any) -> None:
+        self._written.add(repository)
+
+    def rollback(self) -> None:
+        """Rolls the transaction back and leaves the context"""
+        self.transaction.raise_rollback()
@@ -1,8 +1,9 @@
+from src.app.config.settings import settings
 from src.app.core.db_schemas.users import User
-from src.app.core.repositories.base import BasePSQLRepository  # type: ignore
+from src.app.core.repositories.sharded import ShardedPSQLRepository
 
 
-class UsersRepository(BasePSQLRepository):
+class UsersRepository(ShardedPSQLRepository):
     MODEL = User
     FIELDS_TO_SELECT = [
         "id",
@@ -23,3 +24,6 @@ class UsersRepository(BasePSQLRepository):
         "is_active",
     ]
     FIELDS_ORDER_BY = ["-id"]
+    SHARD_KEY = "uuid"
+    DIRECTORY_KEYS = ["email"]
+    RESULT_CACHE_TTL = settings.RESULT_CACHE_TTL
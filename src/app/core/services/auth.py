@@ -1,19 +1,38 @@
+import secrets
+from typing import Optional
+
 from fastapi import HTTPException, status
-from passlib.context import CryptContext
 
 from src.app.core.services.base import Service
+from src.app.extensions.hashing import hashing_pool, needs_rehash, pwd_context
 
 
 class AuthService(Service):
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = pwd_context
     auth_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return self.pwd_context.verify(plain_password, hashed_password)
+    _dummy_hash: Optional[str] = None
+
+    async def verify_password(self, plain_password: str, hashed_password: Optional[str]) -> bool:
+        # bcrypt takes CPU for hundreds of milliseconds, it runs in the hashing pool off the event loop.
+        # Without a hash a dummy one is checked, so missing users take the same time
+        return await hashing_pool.verify(plain_password, hashed_password or await self.__get_dummy_hash())
 
     async def get_password_hashed(self, password: str) -> str:
-        return self.pwd_context.hash(password)
+        return await hashing_pool.hash(password)
+
+    @staticmethod
+    def needs_rehash(hashed_password: Optional[str]) -> bool:
+        """
+        :return: bool - flag the hash is not of the current scheme and cost, see PASSWORD_HASH_ROUNDS
+        """
+        return needs_rehash(hashed_password)
+
+    async def __get_dummy_hash(self) -> str:
+        if AuthService._dummy_hash is None:
+            AuthService._dummy_hash = await self.get_password_hashed(secrets.token_urlsafe())
+        return AuthService._dummy_hash
@@ -1,14 +1,19 @@
+import functools
+import hashlib
+import time
 from loguru import logger
 from datetime import datetime, timedelta
 from typing import Optional, Dict
 
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer
-from jose import jwt
 
 from src.app.config.settings import settings
 from src.app.core.services.base import Service
 from src.app.core.utils.common import generate_str
+from src.app.core.utils.lru import LRUCache
+from src.app.core.utils.metrics import metrics
+from src.app.extensions.jwt_codec import BaseJWTCodec, jwt_codec
 
 token_auth_scheme = HTTPBearer()
 
@@ -18,16 +23,19 @@ class JWTService(Service):
     ACCESS_TOKEN_EXPIRES_MINUTES = settings.ACCESS_TOKEN_EXPIRES_MINUTES
     REFRESH_TOKEN_EXPIRES_DAYS = settings.REFRESH_TOKEN_EXPIRES_DAYS
     ALGORITHM = settings.ALGORITHM
+    CODEC: BaseJWTCodec = jwt_codec  # see JWT_CODEC
     exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # verified access tokens payloads by token digest, kept till the tokens expire
+    TOKEN_CACHE: LRUCache = LRUCache(maxsize=settings.ACCESS_TOKEN_CACHE_SIZE)
 
     @classmethod
     def _decode(cls, token: str) -> Optional[dict]:
         try:
-            payload = jwt.decode(token=token, key=cls.SECRET, algorithms=[settings.ALGORITHM])
+            payload = cls.CODEC.decode(token)
             return payload
         except Exception as e:  # noqa
             logger.info(e)
@@ -38,7 +46,7 @@ class JWTService(Service):
         user_data = data.copy()
         expire = datetime.utcnow() + timedelta(minutes=cls.ACCESS_TOKEN_EXPIRES_MINUTES)
         payload = {"user": user_data, "exp": expire}
-        encoded_jwt = jwt.encode(payload, cls.SECRET, algorithm=cls.ALGORITHM)
+        encoded_jwt = cls.CODEC.encode(payload)
         return encoded_jwt
 
     @classmethod
@@ -46,7 +54,7 @@ class JWTService(Service):
         user_data = data.copy()
         expire = datetime.utcnow() + timedelta(days=cls.REFRESH_TOKEN_EXPIRES_DAYS)
         payload = {"user": user_data, "exp": expire}
-        encoded_jwt = jwt.encode(payload, cls.SECRET, algorithm=cls.ALGORITHM)
+        encoded_jwt = cls.CODEC.encode(payload)
         return encoded_jwt
 
     @classmethod
@@ -70,13 +78,40 @@ class JWTService(Service):
             "refresh": refresh_token,
         }
 
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @classmethod
+    def _decode_access(cls, token: str) -> Optional[dict]:
+        """
+        Decodes the token once per its life, next calls get the cached payload.
+        :return: dict - payload of the verified token, None otherwise
+        """
+        digest = cls._digest(token)
+        payload = cls.TOKEN_CACHE.get(digest)
+        if payload is None:
+            payload = cls._decode(token)
+            ttl = payload.get("exp", 0) - time.time() if payload else 0
+            if ttl > 0:
+                cls.TOKEN_CACHE.set(digest, payload, ttl=ttl)
+        return payload
+
+    @classmethod
+    def token_cache_info(cls) -> dict:
+        return cls.TOKEN_CACHE.info()
+
+    @classmethod
+    def _token_cache_state(cls, state: str) -> int:
+        return cls.TOKEN_CACHE.info()[state]
+
     @classmethod
     def verify_access_token(cls, token: str) -> dict:
-        payload = cls._decode(token)
+        payload = cls._decode_access(token)
         if payload:
             user_data = payload.get("user", {})
             expire = payload.get("exp", None)  # noqa: F841
-            return user_data
+            return dict(user_data)  # the payload is shared by requests of the token
         # TODO verify via redis
         raise cls.exception
 
@@ -97,3 +132,9 @@ class JWTService(Service):
     @classmethod
     def refresh_auth_data(cls, api_auth_scheme: str = Depends(token_auth_scheme)) -> dict:
         return cls.verify_refresh_token(api_auth_scheme.credentials)  # type: ignore
+
+
+for _state in ("hits", "misses", "size"):
+    metrics.gauge(
+        "access_token_cache", functools.partial(JWTService._token_cache_state, _state), state=_state
+    )
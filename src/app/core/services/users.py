@@ -1,47 +1,123 @@
-from typing import Optional
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Optional
 
 from fastapi import HTTPException
+from loguru import logger
 from pydantic import validate_email
 
 from src.app.config.settings import settings
 from src.app.core.models.users import User
+from src.app.core.repositories.types import CountStrategy
 from src.app.core.repositories.users import UsersRepository
 from src.app.core.services.auth import AuthService
 from src.app.core.services.base import Service
+from src.app.core.utils.deadline import current_deadline
 
 
 class UsersService(Service):
+    _rehash_tasks: set = set()  # references of running rehash tasks, so they are not garbage collected
+
+    @staticmethod
+    def __to_user(row: Any) -> User:
+        # models of full rows or RowProxy of partial ones
+        return User(**(row.to_dict() if hasattr(row, "to_dict") else dict(row)))
+
+    @staticmethod
+    async def __without_cursor(rows: Awaitable[list]) -> tuple[list, None]:
+        return await rows, None
+
     async def get_users(  # noqa
         self,
         filter_data: Optional[dict] = None,
         order_by: Optional[list] = None,
         limit: int = settings.BATCH_SIZE,
         offset: int = 0,
-    ) -> tuple[list[User], int]:
-
-        users_rows = await UsersRepository.get_list(
-            filter_data=filter_data, order_by=order_by, limit=limit, offset=offset
-        )
-        users = [User(**item) for item in users_rows]
-        total_count = await UsersRepository.count(filter_data=filter_data)
-        return users, total_count
+        cursor: Optional[str] = None,
+        count_strategy: CountStrategy = CountStrategy(settings.COUNT_STRATEGY),
+        fields: Optional[list] = None,
+    ) -> tuple[list[User], int, bool, Optional[str]]:
+        """
+        Keyset pagination is used unless offset is set, offset is ignored with cursor.
+        Only fields are selected if set, other fields of users are None.
+        Returns users, total count, flag the total count is approximate and cursor of the next page.
+        """
 
-    async def update_or_create_user(self, data: dict) -> User:  # noqa
-
-        row = await UsersRepository.get_first(filter_data={"email": data["email"]})
-        if row:
-            meta_: dict = row.meta or {}
-            meta_.update(data["meta"])
-            data["meta"] = meta_
-            row = await UsersRepository.update_by_obj(obj=row, data=data)
+        if cursor or not offset:
+            if cursor:
+                ordering = UsersRepository.cursor_ordering(order_by)
+                try:
+                    UsersRepository.decode_cursor(cursor, ordering)
+                except ValueError:
+                    raise HTTPException(status_code=422, detail=f"Invalid value {cursor}")
+            if fields:
+                page = UsersRepository.get_list_keyset_partial(
+                    fields=fields, filter_data=filter_data, order_by=order_by, limit=limit, cursor=cursor
+                )
+            else:
+                page = UsersRepository.get_list_keyset(
+                    filter_data=filter_data, order_by=order_by, limit=limit, cursor=cursor
+                )
+        elif count_strategy == CountStrategy.EXACT:
+            users_rows, total_count = await UsersRepository.get_list_with_count(
+                filter_data=filter_data, order_by=order_by, limit=limit, offset=offset, fields=fields
+            )
+            users = [self.__to_user(item) for item in users_rows]
+            return users, total_count, False, None
+        elif fields:
+            page = self.__without_cursor(
+                UsersRepository.get_list_partial(
+                    fields=fields, filter_data=filter_data, order_by=order_by, limit=limit, offset=offset
+                )
+            )
         else:
-            row = await UsersRepository.create(data=data)
+            page = self.__without_cursor(
+                UsersRepository.get_list(
+                    filter_data=filter_data, order_by=order_by, limit=limit, offset=offset
+                )
+            )
+        count = UsersRepository.count_by_strategy(filter_data=filter_data, strategy=count_strategy)
+        # the count doesn't wait for the page, each query runs on its own connection
+        (users_rows, next_cursor), (total_count, is_count_approximate) = await asyncio.gather(page, count)
+        users = [self.__to_user(item) for item in users_rows]
+        return users, total_count, is_count_approximate, next_cursor
 
+    async def iter_users_batches(  # noqa
+        self,
+        filter_data: Optional[dict] = None,
+        fields: Optional[list] = None,
+        prefetch: int = settings.ITER_PREFETCH_SIZE,
+    ) -> AsyncIterator[list]:
+        """
+        Batches of users rows in id order, streamed through a server-side cursor on one connection,
+        so only prefetch rows are kept in memory whatever the count of users is.
+        """
+        async for rows in UsersRepository.iter_list_partial(
+            fields=fields, filter_data=filter_data, order_by=["id"], prefetch=prefetch, as_batches=True
+        ):
+            yield rows
+
+    async def update_or_create_user(self, data: dict) -> User:  # noqa
+        row = await UsersRepository.upsert(data=data, conflict_fields=["email"], merge_fields=["meta"])
         return User(**row.to_dict())
 
-    async def get_first(self, filter_data: dict) -> User:  # noqa
-        row = await UsersRepository.get_first(filter_data=filter_data)
-        return User(**row.to_dict())  # type: ignore
+    async def get_first(  # noqa
+        self, filter_data: dict, fields: Optional[list] = None, batched: bool = False
+    ) -> User:
+        """
+        With batched, a lookup by one field equal to a value is batched with concurrent ones.
+        """
+        if (
+            batched
+            and len(filter_data) == 1
+            and UsersRepository._ATR_SEPARATOR not in next(iter(filter_data))
+        ):
+            ((field, value),) = filter_data.items()
+            row = await UsersRepository.get_first_batched(field=field, value=value, fields=fields)
+        elif fields:
+            row = await UsersRepository.get_first_partial(fields=fields, filter_data=filter_data)
+        else:
+            row = await UsersRepository.get_first(filter_data=filter_data)
+        return self.__to_user(row)
 
     async def get_authenticated_user(self, email: str, password: str) -> User:
         try:
@@ -51,7 +127,32 @@ class UsersService(Service):
 
         auth_service = AuthService(request=self.request)
         row = await UsersRepository.get_first(filter_data={"email": email_validated})
-        is_password_verified = await auth_service.verify_password(password, getattr(row, "password_hashed"))
+        password_hashed = row.password_hashed if row else None
+        is_password_verified = await auth_service.verify_password(password, password_hashed)
         if not row or not is_password_verified:
             raise HTTPException(status_code=422, detail="Value email or password is incorrect")
+        if auth_service.needs_rehash(password_hashed):
+            task = asyncio.create_task(
+                self.__rehash_password(auth_service, row.uuid, password, password_hashed)
+            )
+            self._rehash_tasks.add(task)
+            task.add_done_callback(self._rehash_tasks.discard)
         return User(**row.to_dict())
+
+    @staticmethod
+    async def __rehash_password(
+        auth_service: AuthService, uuid: Any, password: str, password_hashed: str
+    ) -> None:
+        """
+        Replaces the stored hash by one of the current cost after the login is answered,
+        unless the password is changed meanwhile.
+        """
+        current_deadline.set(None)  # the task outlives the request
+        try:
+            await UsersRepository.update(
+                filter_data={"uuid": uuid, "password_hashed": password_hashed},
+                data={"password_hashed": await auth_service.get_password_hashed(password)},
+                return_updated=False,
+            )
+        except Exception as e:  # noqa
+            logger.warning(f"Password rehash of user {uuid} failed: {e!r}")
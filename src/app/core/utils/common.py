@@ -1,8 +1,17 @@
 import string
 import random
+from typing import List
 
 default_chars: str = string.ascii_uppercase + string.ascii_lowercase + string.digits
 
 
 def generate_str(size: int = 24, chars: str = default_chars) -> str:
     return "".join(random.choice(chars) for _ in range(size))
+
+
+def split_list(value: str, separator: str = ",") -> List[str]:
+    """
+    :param value: str - items separated by the separator, e.g. a comma separated env var
+    :return: list[str] - not empty stripped items
+    """
+    return [item.strip() for item in value.split(separator) if item.strip()]
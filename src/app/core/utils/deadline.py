@@ -0,0 +1,50 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# time.monotonic() of the moment the current request should be answered by
+current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Deadline of the request passed, the query in flight is cancelled"""
+
+
+def set_deadline(seconds: Optional[float]) -> None:
+    """
+    Sets the deadline of the current context, an earlier deadline set before is kept.
+
+    :param seconds: float - seconds from now, None or 0 keeps the current deadline
+    """
+    if not seconds:
+        return
+    at = time.monotonic() + seconds
+    current = current_deadline.get()
+    if current is None or at < current:
+        current_deadline.set(at)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Same as set_deadline, the previous deadline is restored on exit"""
+    token = current_deadline.set(current_deadline.get())
+    try:
+        set_deadline(seconds)
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    :return: float - seconds left till the deadline, None if no deadline is set
+    :raise DeadlineExceeded: if the deadline passed
+    """
+    at = current_deadline.get()
+    if at is None:
+        return None
+    left = at - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded()
+    return left
@@ -0,0 +1,75 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Hashable, List
+
+
+class DataLoader:
+    """
+    Collects keys loaded within one event loop tick (or `window` seconds) and resolves them with one
+    batch_load call. Loads of a key already waiting or in flight share its future.
+
+    batch_load gets a list of unique keys and returns values in the same order.
+    """
+
+    def __init__(
+        self,
+        batch_load: Callable[[List[Hashable]], Awaitable[List[Any]]],
+        window: float = 0,
+        max_batch_size: int = 1000,
+    ) -> None:
+        self.batch_load = batch_load
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.loads = 0
+        self._pending: dict = {}
+        self._in_flight: dict = {}
+        self._dispatch_handle: Any = None
+        self._tasks: set = set()
+
+    async def load(self, key: Hashable) -> Any:
+        self.loads += 1
+        future = self._pending.get(key) or self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if len(self._pending) >= self.max_batch_size:
+                self._dispatch()
+            elif self._dispatch_handle is None:
+                # batches run in an empty context, the connection or transaction of the caller is not reused,
+                # callbacks are scheduled with the context they are scheduled from
+                if self.window > 0:
+                    self._dispatch_handle = contextvars.Context().run(
+                        loop.call_later, self.window, self._dispatch
+                    )
+                else:
+                    self._dispatch_handle = contextvars.Context().run(loop.call_soon, self._dispatch)
+        # a cancelled caller doesn't cancel the load shared with others
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._dispatch_handle is not None:
+            self._dispatch_handle.cancel()
+            self._dispatch_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            self._in_flight.update(batch)
+            self.batches += 1
+            task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict) -> None:
+        try:
+            values = await self.batch_load(list(batch))
+            for future, value in zip(batch.values(), values):
+                if not future.done():
+                    future.set_result(value)
+        except Exception as e:  # noqa
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for key, future in batch.items():
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
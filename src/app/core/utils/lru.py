@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """Bounded mapping evicting the least recently used keys, counts hits, misses and evictions"""
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl  # seconds, entries never expire if not set
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del self._data[key]
+            item = None
+        if item is None:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        :param key: hashable - key
+        :param value: any - value
+        :param ttl: float - seconds to keep the entry, default ttl of the cache
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def items(self) -> list:
+        """
+        :return: list - keys with values not expired, from the least recently used
+        """
+        now = time.monotonic()
+        return [(key, item[0]) for key, item in self._data.items() if item[1] is None or item[1] > now]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def info(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
@@ -0,0 +1,101 @@
+import bisect
+from typing import Any, Callable, Hashable, Tuple
+
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    float("inf"),
+)  # seconds
+ROWS_BUCKETS: Tuple[float, ...] = (0, 1, 10, 100, 1000, 10000, float("inf"))
+
+
+class Histogram:
+    """Counts of observed values per bucket, buckets are upper bounds of values"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[min(bisect.bisect_left(self.buckets, value), len(self.buckets) - 1)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        :param q: float - quantile, 0..1
+        :return: float - upper bound of the bucket of the quantile, 0 if nothing is observed
+        """
+        if not self.count:
+            return 0.0
+        rank, cumulative = q * self.count, 0
+        for bucket, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bucket
+        return self.buckets[-1]
+
+    def info(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Metrics:
+    """In-process registry of metrics by name and labels"""
+
+    def __init__(self) -> None:
+        self.histograms: dict = {}
+        self.gauges: dict = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> Hashable:
+        return name, tuple(sorted(labels.items()))
+
+    def histogram(self, name: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels: Any) -> Histogram:
+        key = self._key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        return histogram
+
+    def gauge(self, name: str, value: Callable[[], float], **labels: Any) -> None:
+        """
+        :param name: str - name of the gauge
+        :param value: callable - returns the current value, called on snapshot
+        """
+        self.gauges[self._key(name, labels)] = value
+
+    def snapshot(self) -> list:
+        return [
+            {"name": name, "labels": dict(labels), **histogram.info()}
+            for (name, labels), histogram in self.histograms.items()
+        ] + [
+            {"name": name, "labels": dict(labels), "value": value()}
+            for (name, labels), value in self.gauges.items()
+        ]
+
+    def clear(self) -> None:
+        self.histograms.clear()
+        self.gauges.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,140 @@
+import pickle
+from abc import ABC, abstractmethod
+from typing import Any, Tuple
+
+from src.app.config.settings import settings
+from src.app.core.utils.lru import LRUCache
+
+MISSING = object()
+
+
+class BaseResultCache(ABC):
+    """
+    Cache of query results. Every namespace (table) has a generation, writes increment it,
+    so entries stored before a write are not returned anymore and expire by ttl.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    async def lookup(self, namespace: str, key: str) -> Tuple[int, Any]:
+        """
+        :param namespace: str - namespace of the key
+        :param key: str - key
+        :return: tuple - current generation of the namespace and the value, MISSING if not cached
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def store(self, namespace: str, key: str, generation: int, value: Any, ttl: float) -> None:
+        """
+        :param namespace: str - namespace of the key
+        :param key: str - key
+        :param generation: int - generation returned by lookup before the value was loaded
+        :param value: any - value
+        :param ttl: float - seconds to keep the value
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def invalidate(self, namespace: str) -> None:
+        raise NotImplementedError
+
+    async def evictions(self) -> int:
+        return 0
+
+    async def info(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0.0,
+            "evictions": await self.evictions(),
+        }
+
+    def _counted(self, generation: int, item: Any) -> Tuple[int, Any]:
+        if item is MISSING or item[0] != generation:
+            self.misses += 1
+            return generation, MISSING
+        self.hits += 1
+        return generation, item[1]
+
+
+class LocalResultCache(BaseResultCache):
+    """
+    In-process LRU with ttl, writes of other processes are not seen until entries expire.
+    Values are kept pickled, every hit returns new objects, so callers may change them.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        super().__init__()
+        self.cache = LRUCache(maxsize=maxsize)
+        self.generations: dict = {}
+
+    async def lookup(self, namespace: str, key: str) -> Tuple[int, Any]:
+        generation = self.generations.get(namespace, 0)
+        raw_value = self.cache.get((namespace, key), MISSING)
+        return self._counted(generation, MISSING if raw_value is MISSING else pickle.loads(raw_value))
+
+    async def store(self, namespace: str, key: str, generation: int, value: Any, ttl: float) -> None:
+        self.cache.set((namespace, key), pickle.dumps((generation, value)), ttl=ttl)
+
+    async def invalidate(self, namespace: str) -> None:
+        self.generations[namespace] = self.generations.get(namespace, 0) + 1
+
+    async def evictions(self) -> int:
+        return self.cache.evictions
+
+
+class RedisResultCache(BaseResultCache):
+    """
+    Shared by all processes. Values are pickled, so the redis server must be trusted.
+    The client is a redis.asyncio.Redis or any object with the same get, mget, set, incr and info coroutines.
+    """
+
+    def __init__(self, client: Any, prefix: str = "result_cache") -> None:
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisResultCache":
+        try:
+            from redis import asyncio as aioredis  # noqa
+        except ImportError:  # pragma: no cover
+            raise RuntimeError("redis package is required for the redis result cache backend")
+        return cls(aioredis.from_url(url))
+
+    def _generation_key(self, namespace: str) -> str:
+        return f"{self.prefix}:{namespace}:generation"
+
+    async def lookup(self, namespace: str, key: str) -> Tuple[int, Any]:
+        # generation and value are fetched in one round trip
+        raw_generation, raw_value = await self.client.mget(
+            self._generation_key(namespace), f"{self.prefix}:{namespace}:{key}"
+        )
+        generation = int(raw_generation or 0)
+        return self._counted(generation, MISSING if raw_value is None else pickle.loads(raw_value))
+
+    async def store(self, namespace: str, key: str, generation: int, value: Any, ttl: float) -> None:
+        raw_value = pickle.dumps((generation, value))
+        await self.client.set(f"{self.prefix}:{namespace}:{key}", raw_value, px=max(1, int(ttl * 1000)))
+
+    async def invalidate(self, namespace: str) -> None:
+        await self.client.incr(self._generation_key(namespace))
+
+    async def evictions(self) -> int:
+        # evicted keys of the whole server, not only of this cache
+        stats = await self.client.info("stats")
+        return int(stats.get("evicted_keys", 0))
+
+
+def create_result_cache() -> BaseResultCache:
+    if settings.RESULT_CACHE_BACKEND == "redis":
+        return RedisResultCache.from_url(settings.REDIS_URL)
+    return LocalResultCache(maxsize=settings.RESULT_CACHE_SIZE)
+
+
+result_cache = create_result_cache()
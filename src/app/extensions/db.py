@@ -1,11 +1,32 @@
+from typing import Any
+
 import sqlalchemy
 
 from src.app.config.settings import settings
+from src.app.extensions.pool import InstrumentedPool
+from src.app.extensions.shards import current_shard
 from gino.ext.starlette import Gino  # noqa
 
 metadata = sqlalchemy.MetaData()
 
-db = Gino(
+
+class ShardedGino(Gino):
+    """Bound to the engine of the shard of the context if any, see extensions.shards"""
+
+    @property
+    def bind(self):  # type: ignore
+        shard = current_shard.get()
+        if shard is not None:
+            return shard.engine
+        return super().bind
+
+    @bind.setter
+    def bind(self, bind):  # type: ignore
+        self._bind = bind
+
+
+# models are declared on db.Model, which is created at runtime
+db: Any = ShardedGino(
     ssl=None,
     echo=settings.DEBUG,
     dsn=settings.POSTGRES_DB_URL,  # URL for SqlAlchemy
@@ -13,4 +34,5 @@ db = Gino(
     pool_max_size=settings.POSTGRES_POOL_MAX_SIZE,
     retry_limit=5,
     retry_interval=3,
+    kwargs={"statement_cache_size": settings.POSTGRES_STATEMENT_CACHE_SIZE, "pool_class": InstrumentedPool},
 )
@@ -0,0 +1,153 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from passlib.context import CryptContext
+
+from src.app.config.settings import settings
+from src.app.core.utils import deadline
+from src.app.core.utils.deadline import DeadlineExceeded
+from src.app.core.utils.metrics import metrics
+
+# module level, so process workers build their own context on import.
+# Hashes of other costs need update, so changed PASSWORD_HASH_ROUNDS applies on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.PASSWORD_HASH_ROUNDS,
+    bcrypt__min_rounds=settings.PASSWORD_HASH_ROUNDS,
+    bcrypt__max_rounds=settings.PASSWORD_HASH_ROUNDS,
+)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, hashed_password: Optional[str]) -> bool:
+    if not hashed_password or pwd_context.identify(hashed_password) is None:
+        return False
+    return pwd_context.verify(password, hashed_password)
+
+
+def needs_rehash(hashed_password: Optional[str]) -> bool:
+    """Cheap, the hash is parsed only"""
+    return (
+        bool(hashed_password)
+        and pwd_context.identify(hashed_password) is not None
+        and pwd_context.needs_update(hashed_password)
+    )
+
+
+class HashingOverloaded(Exception):
+    """Too many password hashing calls are waiting for a worker"""
+
+
+class HashingPool:
+    """
+    Runs password hashing off the event loop in a thread or process pool of `workers` workers.
+    Calls over the workers count wait for a free worker, up to `max_waiting` of them (0 - no limit),
+    HashingOverloaded is raised for the next ones. A wait ends by the request deadline at most.
+    Busy and waiting calls are gauges, waits and hashing times are histograms.
+    """
+
+    def __init__(self, executor: str, workers: int, max_waiting: int) -> None:
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Not supported executor {executor}")
+        self.executor_type = executor
+        self.workers = max(1, workers)
+        self.max_waiting = max_waiting
+        self.busy = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        for state in ("busy", "waiting"):
+            metrics.gauge("password_hash_calls", functools.partial(getattr, self, state), state=state)
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.executor_type == "process" else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=self.workers)
+        return self._executor
+
+    async def _acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            # asyncio primitives are bound to the loop they are used in
+            self._semaphore, self._loop = asyncio.Semaphore(self.workers), loop
+        if self._semaphore.locked() and self.max_waiting and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise HashingOverloaded(f"{self.waiting} password hashing calls are waiting")
+        self.waiting += 1
+        started_at = time.perf_counter()
+        acquire = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            done, _ = await asyncio.wait({acquire}, timeout=deadline.remaining())
+            if not done:
+                raise DeadlineExceeded()
+        except BaseException:
+            self._abandon(acquire, self._semaphore)
+            raise
+        finally:
+            self.waiting -= 1
+            metrics.histogram("password_hash_wait_seconds").observe(time.perf_counter() - started_at)
+
+    @staticmethod
+    def _abandon(acquire: asyncio.Future, semaphore: asyncio.Semaphore) -> None:
+        """The acquire is cancelled, a worker it got after the wait ended is released"""
+
+        def release(acquire: asyncio.Future) -> None:
+            if not acquire.cancelled() and acquire.exception() is None:
+                semaphore.release()
+
+        acquire.cancel()
+        acquire.add_done_callback(release)
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        :param func: callable - module level function, so it is passed to process workers
+        :return: result of the function
+        """
+        await self._acquire()
+        self.busy += 1
+        started_at = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.busy -= 1
+            self._semaphore.release()  # type: ignore
+            metrics.histogram("password_hash_seconds", op=func.__name__).observe(
+                time.perf_counter() - started_at
+            )
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify(self, password: str, hashed_password: Optional[str]) -> bool:
+        return await self.run(verify_password, password, hashed_password)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def info(self) -> dict:
+        return {
+            "executor": self.executor_type,
+            "workers": self.workers,
+            "busy": self.busy,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+hashing_pool = HashingPool(
+    settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_waiting=settings.PASSWORD_HASH_MAX_WAITING,
+)
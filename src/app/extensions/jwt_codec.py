@@ -0,0 +1,166 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from abc import ABC, abstractmethod
+from calendar import timegm
+from datetime import datetime
+from typing import Any
+
+from jose import jwt
+from jose.exceptions import JWTError
+
+from src.app.config.settings import settings
+
+try:
+    import orjson  # noqa
+except ImportError:  # pragma: no cover
+    orjson = None
+
+TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+class InvalidToken(Exception):
+    """Token is malformed, its signature is wrong or its claims are not valid"""
+
+
+def json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def json_loads(value: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+
+def b64encode(value: bytes) -> bytes:
+    return base64.urlsafe_b64encode(value).rstrip(b"=")
+
+
+def b64decode(value: bytes) -> bytes:
+    return base64.urlsafe_b64decode(value + b"=" * (-len(value) % 4))
+
+
+class BaseJWTCodec(ABC):
+    """Encodes claims to signed tokens and decodes tokens to verified claims"""
+
+    def __init__(self, secret: str, algorithm: str) -> None:
+        self.secret = secret
+        self.algorithm = algorithm
+
+    @abstractmethod
+    def encode(self, claims: dict) -> str:
+        """
+        :param claims: dict - claims, datetime values of exp, iat and nbf are converted to timestamps
+        :return: str - signed token
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def decode(self, token: str) -> dict:
+        """
+        :param token: str - signed token
+        :return: dict - claims of the token, InvalidToken is raised if it is not valid
+        """
+        raise NotImplementedError
+
+
+class JoseJWTCodec(BaseJWTCodec):
+    """python-jose, any algorithm it supports"""
+
+    def encode(self, claims: dict) -> str:
+        # jose converts time claims in place
+        return jwt.encode(dict(claims), self.secret, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return jwt.decode(token=token, key=self.secret, algorithms=[self.algorithm])
+        except JWTError as e:
+            raise InvalidToken(str(e)) from e
+
+
+class HS256JWTCodec(BaseJWTCodec):
+    """
+    HS256 only, tokens are the same as of python-jose for ASCII claims and are decoded by each other.
+    The HMAC key state and the header are computed once, claims are serialized by orjson if installed.
+    Claims are checked as by python-jose without audience, issuer and leeway:
+    exp and nbf against the current time, iat is an integer, tokens with aud are rejected.
+    """
+
+    HEADER = {"alg": "HS256", "typ": "JWT"}
+
+    def __init__(self, secret: str, algorithm: str = "HS256") -> None:
+        if algorithm != "HS256":
+            raise ValueError(f"Not supported algorithm {algorithm}")
+        super().__init__(secret, algorithm)
+        self._hmac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+        # same header bytes as of python-jose, its keys are sorted
+        self._header = b64encode(json.dumps(self.HEADER, separators=(",", ":"), sort_keys=True).encode())
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._hmac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims: dict) -> str:
+        claims = {
+            key: timegm(value.utctimetuple()) if key in TIME_CLAIMS and isinstance(value, datetime) else value
+            for key, value in claims.items()
+        }
+        signing_input = self._header + b"." + b64encode(json_dumps(claims))
+        return (signing_input + b"." + b64encode(self._sign(signing_input))).decode()
+
+    def _verified_claims(self, token: str) -> dict:
+        signing_input, _, signature = token.encode().rpartition(b".")
+        header, _, payload = signing_input.partition(b".")
+        if not payload or b"." in payload:
+            raise InvalidToken("Not enough segments")
+        # tokens of other encoders may have the same header of other bytes
+        if header != self._header and json_loads(b64decode(header)).get("alg") != self.algorithm:
+            raise InvalidToken("The specified alg value is not allowed")
+        if not hmac.compare_digest(self._sign(signing_input), b64decode(signature)):
+            raise InvalidToken("Signature verification failed.")
+        claims = json_loads(b64decode(payload))
+        if not isinstance(claims, dict):
+            raise InvalidToken("Invalid payload string: must be a json object")
+        return claims
+
+    @staticmethod
+    def _validate_claims(claims: dict) -> None:
+        now = timegm(time.gmtime())
+        if "aud" in claims:
+            raise InvalidToken("Invalid audience")
+        times = {}
+        for claim in TIME_CLAIMS:
+            try:
+                times[claim] = int(claims.get(claim, now))
+            except (TypeError, ValueError):
+                raise InvalidToken(f"Invalid {claim} claim")
+        if times["exp"] < now:
+            raise InvalidToken("Signature has expired.")
+        if times["nbf"] > now:
+            raise InvalidToken("The token is not yet valid (nbf)")
+
+    def decode(self, token: str) -> dict:
+        try:
+            claims = self._verified_claims(token)
+        except (ValueError, TypeError, AttributeError, binascii.Error) as e:
+            raise InvalidToken(str(e)) from e
+        self._validate_claims(claims)
+        return claims
+
+
+def create_jwt_codec(name: str = settings.JWT_CODEC) -> BaseJWTCodec:
+    if name == "hs256":
+        return HS256JWTCodec(settings.SECRET_KEY, settings.ALGORITHM)
+    if name == "jose":
+        return JoseJWTCodec(settings.SECRET_KEY, settings.ALGORITHM)
+    raise ValueError(f"Not supported jwt codec {name}")
+
+
+jwt_codec = create_jwt_codec()
@@ -0,0 +1,104 @@
+import asyncio
+import functools
+import time
+from typing import Any, Awaitable, Optional
+
+import sqlalchemy
+from gino.dialects.asyncpg import Pool
+from gino.engine import GinoEngine
+from loguru import logger
+
+from src.app.config.settings import settings
+from src.app.core.utils import deadline
+from src.app.core.utils.deadline import DeadlineExceeded
+from src.app.core.utils.metrics import metrics
+
+
+class PoolAcquireTimeout(Exception):
+    """No connection of the pool got free for the acquire timeout"""
+
+
+class InstrumentedPool(Pool):
+    """
+    Pool of gino engines, set_bind(..., pool_class=InstrumentedPool). Acquiring waits for
+    POSTGRES_POOL_ACQUIRE_TIMEOUT seconds or till the request deadline at most.
+    Connections in use, idle and acquires waiting for a busy pool are gauges, acquire waits a histogram.
+    """
+
+    def __init__(self, url: Any, loop: Any, **kwargs: Any) -> None:
+        super().__init__(url, loop, **kwargs)
+        self.name = f"{url.host}:{url.port}/{url.database}"
+        self.waiting = 0
+        self.timeouts = 0
+
+    async def _init(self) -> "InstrumentedPool":
+        await super()._init()
+        for state in ("in_use", "idle", "waiting"):
+            metrics.gauge(
+                "db_pool_connections", functools.partial(self._state, state), pool=self.name, state=state
+            )
+        return self
+
+    def _state(self, state: str) -> int:
+        return self.info()[state]
+
+    def _blocks(self) -> bool:
+        # asyncpg queues free slots of the pool, connected or not, an acquire waits only if none is left
+        return self._pool._queue.empty()
+
+    async def acquire(self, *, timeout: Optional[float] = None) -> Any:
+        if timeout is None:
+            timeout = settings.POSTGRES_POOL_ACQUIRE_TIMEOUT or None
+        left = deadline.remaining()
+        by_deadline = left is not None and (timeout is None or left < timeout)
+        if by_deadline:
+            timeout = left
+        blocks = self._blocks()
+        self.waiting += blocks
+        started_at = time.perf_counter()
+        try:
+            return await self._pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError as e:
+            self.timeouts += 1
+            if by_deadline:
+                raise DeadlineExceeded() from e
+            raise PoolAcquireTimeout(f"No free connection of {self.name} for {timeout}s") from e
+        finally:
+            self.waiting -= blocks
+            metrics.histogram("db_pool_acquire_seconds", pool=self.name).observe(
+                time.perf_counter() - started_at
+            )
+
+    async def warm_up(self) -> None:
+        """Connections up to the min size of the pool are opened and checked before requests come"""
+        connections = [await self._pool.acquire() for _ in range(self._pool.get_min_size())]
+        try:
+            await asyncio.gather(*[connection.execute("SELECT 1") for connection in connections])
+        finally:
+            for connection in connections:
+                await self._pool.release(connection)
+        logger.info(f"Pool {self.name} warmed up, {len(connections)} connections")
+
+    def info(self) -> dict:
+        size, idle = self._pool.get_size(), self._pool.get_idle_size()
+        return {
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "waiting": self.waiting,
+            "timeouts": self.timeouts,
+        }
+
+
+def create_engine(dsn: str, **kwargs: Any) -> Awaitable[GinoEngine]:
+    """Same as gino.create_engine, an engine of the gino strategy to await"""
+    return sqlalchemy.create_engine(dsn, strategy="gino", **kwargs)
+
+
+async def warm_up(engine: Any) -> None:
+    """Warms up the pool of the engine if it is an InstrumentedPool"""
+    pool = getattr(engine, "_pool", None)
+    if isinstance(pool, InstrumentedPool):
+        await pool.warm_up()
@@ -0,0 +1,185 @@
+import asyncio
+import itertools
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, List, Optional
+
+import sqlalchemy
+from gino.engine import GinoEngine
+from loguru import logger
+
+from src.app.config.settings import settings
+from src.app.core.utils.common import split_list
+from src.app.extensions.pool import InstrumentedPool, create_engine, warm_up
+
+# seconds of replication lag, 0 for a primary or a replica which replayed everything it received
+REPLICA_LAG_QUERY = sqlalchemy.text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+# monotonic time until reads of the current context go to the primary, moved forward by writes
+_primary_until: ContextVar[float] = ContextVar("primary_until", default=0.0)
+
+
+class Replica:
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+        self.engine: Optional[GinoEngine] = None
+        self.lag: Optional[float] = None  # seconds, None if not checked yet or not reachable
+        self.is_healthy = False
+        self.reads = 0
+
+
+class ReplicaRouter:
+    """
+    Routes read queries to healthy replicas round-robin.
+
+    A replica is healthy if its lag check succeeds and the lag is not above max_lag.
+    Reads stay on the primary for `stickiness` seconds after a write of the same context (request),
+    so a request reads its own writes. With hedge_delay set, a read not finished in hedge_delay seconds
+    is sent to the next replica as well and the first result wins.
+    """
+
+    HEALTH_CHECK_TIMEOUT = 1.0  # seconds
+
+    def __init__(
+        self,
+        dsns: List[str],
+        max_lag: float,
+        health_interval: float,
+        stickiness: float,
+        hedge_delay: float,
+        **engine_kwargs: Any,
+    ) -> None:
+        self.replicas = [Replica(dsn) for dsn in dsns]
+        self.max_lag = max_lag
+        self.health_interval = health_interval
+        self.stickiness = stickiness
+        self.hedge_delay = hedge_delay
+        self.engine_kwargs = engine_kwargs
+        self.hedged_reads = 0
+        self._counter = itertools.count()
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_enabled(self) -> bool:
+        return any(replica.engine is not None for replica in self.replicas)
+
+    async def connect(self) -> None:
+        for replica in self.replicas:
+            if replica.engine is None:
+                replica.engine = await create_engine(replica.dsn, **self.engine_kwargs)
+                await warm_up(replica.engine)
+        await self.check_health()
+        if self.replicas and self.health_interval > 0 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._check_health_forever())
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for replica in self.replicas:
+            if replica.engine is not None:
+                await replica.engine.close()
+            replica.engine = None
+            replica.is_healthy = False
+
+    async def check_health(self) -> None:
+        await asyncio.gather(*[self._check_replica(replica) for replica in self.replicas if replica.engine])
+
+    async def _check_replica(self, replica: Replica) -> None:
+        engine = replica.engine
+        if engine is None:
+            return
+        try:
+            lag = await asyncio.wait_for(engine.scalar(REPLICA_LAG_QUERY), self.HEALTH_CHECK_TIMEOUT)
+            replica.lag = float(lag)
+        except Exception as e:  # noqa
+            replica.lag = None
+            logger.warning(f"Replica health check failed: {e!r}")
+        replica.is_healthy = replica.lag is not None and replica.lag <= self.max_lag
+
+    async def _check_health_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_health()
+
+    def stick_to_primary(self) -> None:
+        if self.stickiness > 0:
+            _primary_until.set(time.monotonic() + self.stickiness)
+
+    def is_sticky(self) -> bool:
+        return _primary_until.get() > time.monotonic()
+
+    def choose(self) -> List[Replica]:
+        """
+        :return: list - healthy replicas, starting from the next one in round-robin order
+        """
+        healthy = [replica for replica in self.replicas if replica.is_healthy and replica.engine is not None]
+        if not healthy:
+            return []
+        start = next(self._counter) % len(healthy)
+        return healthy[start:] + healthy[:start]
+
+    async def execute(self, run: Callable[[GinoEngine], Awaitable[Any]], primary: GinoEngine) -> Any:
+        """
+        :param run: callable - runs the read on the given engine
+        :param primary: GinoEngine - used while sticky to the primary or if there are no healthy replicas
+        :return: result of the first engine to answer
+        """
+        replicas = [] if self.is_sticky() else self.choose()
+        if not replicas:
+            return await run(primary)
+        if self.hedge_delay <= 0 or len(replicas) < 2:
+            replicas[0].reads += 1
+            return await run(replicas[0].engine)
+        return await self._execute_hedged(run, replicas[0], replicas[1])
+
+    async def _execute_hedged(
+        self, run: Callable[[GinoEngine], Awaitable[Any]], first: Replica, second: Replica
+    ) -> Any:
+        first.reads += 1
+        tasks = [asyncio.ensure_future(run(first.engine))]
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+        if not done or tasks[0].exception() is not None:
+            self.hedged_reads += 1
+            second.reads += 1
+            tasks.append(asyncio.ensure_future(run(second.engine)))
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return tasks[0].result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def info(self) -> dict:
+        return {
+            "replicas": [
+                {"lag": replica.lag, "is_healthy": replica.is_healthy, "reads": replica.reads}
+                for replica in self.replicas
+            ],
+            "hedged_reads": self.hedged_reads,
+        }
+
+
+replicas = ReplicaRouter(
+    split_list(settings.POSTGRES_REPLICA_DB_URLS),
+    max_lag=settings.POSTGRES_REPLICA_MAX_LAG,
+    health_interval=settings.POSTGRES_REPLICA_CHECK_PERIOD,
+    stickiness=settings.POSTGRES_PRIMARY_STICKINESS,
+    hedge_delay=settings.POSTGRES_REPLICA_HEDGE_DELAY,
+    min_size=settings.POSTGRES_POOL_MIN_SIZE,
+    max_size=settings.POSTGRES_POOL_MAX_SIZE,
+    statement_cache_size=settings.POSTGRES_STATEMENT_CACHE_SIZE,
+    pool_class=InstrumentedPool,
+)
@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, List, Optional
+
+from gino.engine import GinoEngine
+
+from src.app.config.settings import settings
+from src.app.core.utils.common import split_list
+from src.app.extensions.pool import InstrumentedPool, create_engine, warm_up
+
+
+class Shard:
+    def __init__(self, index: int, dsn: str) -> None:
+        self.index = index
+        self.dsn = dsn
+        self.engine: Optional[GinoEngine] = None
+
+    def __repr__(self) -> str:
+        return f"Shard({self.index})"
+
+
+# shard the queries of the current context go to, None - the default bind of db
+current_shard: ContextVar[Optional[Shard]] = ContextVar("current_shard", default=None)
+
+
+class ShardRouter:
+    """
+    Maps shard keys to shards by rendezvous hashing: a key goes to the shard with the highest
+    hash of (shard index, key). Adding a shard moves only the keys which go to the new one,
+    see commands.rebalance_shards. Shards are identified by position, new DSNs are appended.
+
+    Queries go to the engine of the shard set by `using`, see extensions.db.
+    """
+
+    def __init__(self, dsns: List[str], **engine_kwargs: Any) -> None:
+        self.shards = [Shard(index, dsn) for index, dsn in enumerate(dsns)]
+        self.engine_kwargs = engine_kwargs
+
+    @property
+    def is_enabled(self) -> bool:
+        return any(shard.engine is not None for shard in self.shards)
+
+    async def connect(self) -> None:
+        for shard in self.shards:
+            if shard.engine is None:
+                shard.engine = await create_engine(shard.dsn, **self.engine_kwargs)
+                await warm_up(shard.engine)
+
+    async def close(self) -> None:
+        for shard in self.shards:
+            if shard.engine is not None:
+                await shard.engine.close()
+            shard.engine = None
+
+    @staticmethod
+    def _score(shard: Shard, key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(f"{shard.index}:{key}".encode(), digest_size=8).digest(), "big")
+
+    def shard_for(self, key: Any) -> Shard:
+        """
+        :param key: Any - shard key value, compared as str
+        :return: Shard - shard the key belongs to
+        """
+        if not self.shards:
+            raise ValueError("Not supported shard lookup without shards")
+        key = str(key)
+        return max(self.shards, key=lambda shard: self._score(shard, key))
+
+    @staticmethod
+    def current() -> Optional[Shard]:
+        return current_shard.get()
+
+    @staticmethod
+    @contextmanager
+    def using(shard: Optional[Shard]) -> Iterator[None]:
+        """Queries of the context go to the shard, None - to the default bind"""
+        token = current_shard.set(shard)
+        try:
+            yield
+        finally:
+            current_shard.reset(token)
+
+    async def run_on(self, shard: Optional[Shard], func: Callable[[], Awaitable[Any]]) -> Any:
+        with self.using(shard):
+            return await func()
+
+    async def run_on_each(self, func: Callable[[], Awaitable[Any]]) -> List[Any]:
+        """
+        :param func: callable - runs the queries, called once per shard
+        :return: list - results of the shards in order of shards, queries run in parallel
+        """
+        return list(await asyncio.gather(*[self.run_on(shard, func) for shard in self.shards]))
+
+    def info(self) -> dict:
+        return {
+            "shards": [{"index": shard.index, "connected": shard.engine is not None} for shard in self.shards]
+        }
+
+
+shards = ShardRouter(
+    split_list(settings.POSTGRES_SHARD_DB_URLS),
+    min_size=settings.POSTGRES_POOL_MIN_SIZE,
+    max_size=settings.POSTGRES_POOL_MAX_SIZE,
+    statement_cache_size=settings.POSTGRES_STATEMENT_CACHE_SIZE,
+    pool_class=InstrumentedPool,
+)
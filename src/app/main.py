@@ -2,10 +2,19 @@ from typing import Callable
 
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
 
+from src.app.api.core.middleware import DeadlineMiddleware
 from src.app.api.routers import api_router
 from src.app.config.settings import settings
+from src.app.core.repositories.advisor import log_index_suggestions
+from src.app.core.utils.deadline import DeadlineExceeded
 from src.app.extensions.db import db
+from src.app.extensions.hashing import HashingOverloaded, hashing_pool
+from src.app.extensions.pool import PoolAcquireTimeout, warm_up
+from src.app.extensions.replicas import replicas
+from src.app.extensions.shards import shards
 from src.app.log_utils import logging_setup
 
 
@@ -27,14 +36,20 @@ def init_app() -> FastAPI:
     }
     application = FastAPI(**settings_)  # type: ignore
 
+    # event handlers run in order of registration: the index report, replicas and shards are closed
+    # before gino closes the pool, the pool is created by gino before it is warmed up
+    application.add_event_handler("shutdown", on_shutdown_handler(application))
+    db.init_app(application)
     register_middleware(application)
     application.include_router(api_router)
+    application.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+    application.add_exception_handler(PoolAcquireTimeout, overloaded_handler)
+    application.add_exception_handler(HashingOverloaded, overloaded_handler)
 
     application.add_event_handler(
         "startup",
         on_startup_app_handler(application),
     )
-    application.add_event_handler("shutdown", on_shutdown_handler(application))
 
     return application
 
@@ -43,19 +58,38 @@ def on_startup_app_handler(
     application: FastAPI,
 ) -> Callable:  # type: ignore
     async def start_app() -> None:
-        db.init_app(application)
+        await warm_up(db.bind)
+        await replicas.connect()
+        await shards.connect()
 
     return start_app
 
 
 def on_shutdown_handler(application: FastAPI) -> Callable:  # type: ignore
     async def stop_app() -> None:
-        pass
+        if settings.INDEX_ADVISOR_REPORT:
+            await log_index_suggestions()
+        await replicas.close()
+        await shards.close()
+        hashing_pool.close()
 
     return stop_app
 
 
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded) -> JSONResponse:
+    return JSONResponse({"detail": "Deadline exceeded"}, status_code=504)
+
+
+async def overloaded_handler(request: Request, exc: Exception) -> JSONResponse:
+    return JSONResponse({"detail": "Service overloaded"}, status_code=503, headers={"Retry-After": "1"})
+
+
 def register_middleware(application: FastAPI) -> None:
+    application.add_middleware(
+        DeadlineMiddleware,
+        timeout=settings.REQUEST_TIMEOUT,
+        exclude_paths=[f"{settings.API}/v1/users/export/"],
+    )
     if settings.CORS_ORIGIN_WHITELIST:
         application.add_middleware(
             CORSMiddleware,
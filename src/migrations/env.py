@@ -9,6 +9,7 @@ from alembic import context
 # access to the values within the .ini file in use.
 from src.app.config.settings import settings
 from src.app.core.db_schemas.users import *
+from src.app.core.db_schemas.shard_directory import *
 
 config = context.config
 
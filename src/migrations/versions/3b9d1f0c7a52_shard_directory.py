@@ -0,0 +1,32 @@
+"""shard directory
+
+Revision ID: 3b9d1f0c7a52
+Revises: 66e2c47d80ca
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "3b9d1f0c7a52"
+down_revision = "66e2c47d80ca"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "shard_directory",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("key_type", sa.String(length=64), nullable=False),
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column("shard", sa.SmallInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_shard_directory_key_type_key", "shard_directory", ["key_type", "key"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_shard_directory_key_type_key", table_name="shard_directory")
+    op.drop_table("shard_directory")
@@ -0,0 +1,51 @@
+"""users meta jsonb
+
+Revision ID: 66e2c47d80ca
+Revises: 71996f45e161
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "66e2c47d80ca"
+down_revision = "71996f45e161"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the table is rewritten under an exclusive lock
+    op.alter_column(
+        "users",
+        "meta",
+        existing_type=postgresql.JSON(astext_type=sa.Text()),
+        type_=postgresql.JSONB(astext_type=sa.Text()),
+        existing_nullable=False,
+        postgresql_using="meta::jsonb",
+    )
+    # built without blocking writes, CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_meta",
+            "users",
+            ["meta"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_users_meta", table_name="users", postgresql_concurrently=True)
+    op.alter_column(
+        "users",
+        "meta",
+        existing_type=postgresql.JSONB(astext_type=sa.Text()),
+        type_=postgresql.JSON(astext_type=sa.Text()),
+        existing_nullable=False,
+        postgresql_using="meta::json",
+    )
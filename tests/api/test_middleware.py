@@ -0,0 +1,106 @@
+import asyncio
+from typing import Any
+
+import pytest
+from httpx import AsyncClient
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+from starlette.types import Message
+
+from src.app.api.core.middleware import DeadlineMiddleware
+from src.app.core.utils.deadline import DeadlineExceeded, current_deadline
+from src.app.main import app
+
+
+async def plain_app(scope: Any, receive: Any, send: Any) -> None:
+    body = b"deadline" if current_deadline.get() is not None else b"no deadline"
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def slow_app(scope: Any, receive: Any, send: Any) -> None:
+    await asyncio.sleep(5)
+    await plain_app(scope, receive, send)
+
+
+@pytest.mark.asyncio
+async def test_deadline_middleware_sets_deadline() -> None:
+    async with AsyncClient(app=DeadlineMiddleware(plain_app, timeout=1), base_url="http://test") as client:
+        response = await client.get("/")
+    assert (response.status_code, response.content) == (200, b"deadline")
+
+    async with AsyncClient(app=DeadlineMiddleware(plain_app), base_url="http://test") as client:
+        response = await client.get("/")
+    assert response.content == b"no deadline"
+
+
+@pytest.mark.asyncio
+async def test_deadline_middleware_timeout() -> None:
+    async with AsyncClient(app=DeadlineMiddleware(slow_app, timeout=0.1), base_url="http://test") as client:
+        response = await client.get("/")
+    assert response.status_code == 504
+
+
+@pytest.mark.asyncio
+async def test_deadline_middleware_disconnect() -> None:
+    sent = []
+    cancelled = asyncio.Event()
+
+    async def app_(scope: Any, receive: Any, send: Any) -> None:
+        try:
+            await slow_app(scope, receive, send)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def receive() -> dict:
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        sent.append(message)
+
+    await asyncio.wait_for(DeadlineMiddleware(app_)({"type": "http"}, receive, send), timeout=1)
+    assert cancelled.is_set()
+    assert sent == []
+
+
+@pytest.mark.asyncio
+async def test_deadline_middleware_background_task() -> None:
+    done = []
+
+    async def task() -> None:
+        await asyncio.sleep(0.05)
+        done.append(True)
+
+    async def app_(scope: Any, receive: Any, send: Any) -> None:
+        await Response(b"sent", background=BackgroundTask(task))(scope, receive, send)
+
+    async with AsyncClient(app=DeadlineMiddleware(app_, timeout=1), base_url="http://test") as client:
+        response = await client.get("/")
+    assert response.content == b"sent"
+    assert done == [True]
+
+
+@pytest.mark.asyncio
+async def test_deadline_middleware_started_response() -> None:
+    async def app_(scope: Any, receive: Any, send: Any) -> None:
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"first ", "more_body": True})
+        await asyncio.sleep(0.2)
+        await send({"type": "http.response.body", "body": b"last"})
+
+    async with AsyncClient(app=DeadlineMiddleware(app_, timeout=0.1), base_url="http://test") as client:
+        response = await client.get("/")
+    assert (response.status_code, response.content) == (200, b"first last")
+
+
+def test_deadline_exceeded_handler_registered() -> None:
+    assert DeadlineExceeded in app.exception_handlers
+
+
+@pytest.mark.asyncio
+async def test_deadline_middleware_exclude_paths() -> None:
+    middleware = DeadlineMiddleware(plain_app, timeout=0.1, exclude_paths=["/export/"])
+    async with AsyncClient(app=middleware, base_url="http://test") as client:
+        response = await client.get("/export/")
+    assert response.content == b"no deadline"
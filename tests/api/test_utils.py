@@ -0,0 +1,46 @@
+import json
+import uuid
+from datetime import datetime
+from typing import AsyncIterator
+
+import pytest
+
+from src.app.api.core.utils import to_csv, to_ndjson
+
+ROW = {
+    "uuid": uuid.UUID("17d23e60-bb7a-4de2-a9d2-de86a09d852f"),
+    "created_at": datetime(2022, 1, 2),
+    "phone": None,
+}
+FIELDS = ["uuid", "created_at", "phone"]
+
+
+async def batches(count: int) -> AsyncIterator[list]:
+    for _ in range(count):
+        yield [ROW, ROW]
+
+
+@pytest.mark.asyncio
+async def test_to_ndjson() -> None:
+    chunks = [chunk async for chunk in to_ndjson(batches(2), FIELDS)]
+
+    assert len(chunks) == 2
+    lines = "".join(chunks).splitlines()
+    assert len(lines) == 4
+    assert json.loads(lines[0]) == {
+        "uuid": "17d23e60bb7a4de2a9d2de86a09d852f",
+        "created_at": "2022-01-02T00:00:00",
+        "phone": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_to_csv() -> None:
+    chunks = [chunk async for chunk in to_csv(batches(1), FIELDS)]
+    assert "".join(chunks).splitlines() == [
+        "uuid,created_at,phone",
+        "17d23e60bb7a4de2a9d2de86a09d852f,2022-01-02T00:00:00,",
+        "17d23e60bb7a4de2a9d2de86a09d852f,2022-01-02T00:00:00,",
+    ]
+
+    assert [chunk async for chunk in to_csv(batches(0), FIELDS)] == ["uuid,created_at,phone\r\n"]
@@ -0,0 +1,63 @@
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from src.app.commands.import_users import batched, import_users, parse_value, read_csv, read_ndjson
+from src.app.core.repositories.users import UsersRepository
+
+CSV_DATA = """email,username,birthday,is_active,meta
+u_name_0@gmail.com,u_name_0,1990-01-02,true,"{""source"": ""csv""}"
+u_name_1@gmail.com,,,false,{}
+"""
+
+
+def test_read_csv_success() -> None:
+    rows = list(read_csv(io.StringIO(CSV_DATA)))
+
+    assert rows[0] == {
+        "email": "u_name_0@gmail.com",
+        "username": "u_name_0",
+        "birthday": datetime(1990, 1, 2),
+        "is_active": True,
+        "meta": {"source": "csv"},
+    }
+    assert rows[1]["username"] is rows[1]["birthday"] is None
+    assert rows[1]["is_active"] is False
+
+
+def test_parse_value_empty() -> None:
+    columns = UsersRepository.MODEL.__table__.columns
+
+    assert parse_value(columns["email"], "") is None
+    assert parse_value(columns["secret"], "") == ""
+    assert parse_value(columns["is_active"], "") is None
+
+
+def test_batched_success() -> None:
+    rows = [{"email": "a"}, {"email": "b"}, {"email": "c"}, {"email": "d", "username": "d"}]
+
+    assert [len(batch) for batch in batched(rows, 2)] == [2, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_import_users_success() -> None:
+    stats = await import_users(read_csv(io.StringIO(CSV_DATA)), batch_size=1)
+    assert stats == {"read": 2, "affected": 2}
+
+    ndjson = "\n".join(
+        json.dumps(
+            {"email": f"u_name_{index}@gmail.com", "username": "u_name_imported", "meta": {"n": index}}
+        )
+        for index in range(1, 4)
+    )
+    stats = await import_users(read_ndjson(io.StringIO(ndjson)), on_conflict="skip")
+    assert stats == {"read": 3, "affected": 2}
+
+    users = await UsersRepository.get_list(order_by=["email"])
+    assert [user.username for user in users] == ["u_name_0", None, "u_name_imported", "u_name_imported"]
+    assert users[0].meta == {"source": "csv"}
+
+    with pytest.raises(ValueError):
+        await import_users([], on_conflict="replace")
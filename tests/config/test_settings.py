@@ -0,0 +1,33 @@
+import pytest
+
+from src.app.config.settings import SettingsTest
+from src.app.core.utils.common import split_list
+
+REPLICA_URLS = "postgresql://u:p@r1/db, postgresql://u:p@r2/db"
+
+
+def test_replica_db_urls_comma_separated(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("POSTGRES_REPLICA_DB_URLS", REPLICA_URLS)
+
+    settings_ = SettingsTest()
+
+    assert split_list(settings_.POSTGRES_REPLICA_DB_URLS) == [
+        "postgresql://u:p@r1/db",
+        "postgresql://u:p@r2/db",
+    ]
+
+
+def test_shard_db_urls_comma_separated(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("POSTGRES_SHARD_DB_URLS", "postgresql://u:p@shard0/db,postgresql://u:p@shard1/db")
+
+    settings_ = SettingsTest()
+
+    assert split_list(settings_.POSTGRES_SHARD_DB_URLS) == [
+        "postgresql://u:p@shard0/db",
+        "postgresql://u:p@shard1/db",
+    ]
+
+
+def test_split_list() -> None:
+    assert split_list("") == []
+    assert split_list("a,,b ,") == ["a", "b"]
@@ -0,0 +1,54 @@
+from datetime import datetime
+from typing import Coroutine
+
+import pytest
+
+from src.app.core.repositories.advisor import suggest_indexes
+from src.app.core.repositories.instrumentation import query_shapes
+from src.app.core.repositories.users import UsersRepository
+
+
+@pytest.mark.asyncio
+async def test_query_shapes_recorded(db_users: Coroutine) -> None:
+    await db_users
+    query_shapes.clear()
+    await UsersRepository.get_list(filter_data={"is_active": True}, order_by=["-created_at"])
+    await UsersRepository.get_list(filter_data={"is_active": False}, order_by=["-created_at"])
+    await UsersRepository.get_first(filter_data={"is_active": True})
+
+    stats = {(shape, order_by): item for (_, shape, order_by), item in query_shapes.items()}
+    assert stats[((("is_active",),), ("-created_at",))]["calls"] == 2
+    assert stats[((("is_active",),), None)]["calls"] == 1
+
+
+@pytest.mark.asyncio
+async def test_suggest_indexes(db_users: Coroutine) -> None:
+    await db_users
+    query_shapes.clear()
+    # served by existing indexes
+    await UsersRepository.get_first(filter_data={"email": "u_name_1@gmail.com"})
+    await UsersRepository.get_list(filter_data={"meta__has_key": "meta_key"})
+    await UsersRepository.get_list(filter_data={"id__gt": 0})
+    # missing indexes
+    for _ in range(2):
+        await UsersRepository.get_list(
+            filter_data={"gender": "male", "is_active": True, "birthday__gte": datetime(2000, 1, 1)}
+        )
+    await UsersRepository.get_list(filter_data={"birthday__isnull": True}, order_by=["-created_at"])
+    await UsersRepository.count(filter_data={"__or": [{"username": "u_name_1"}, {"phone": "9379992"}]})
+    await UsersRepository.count(filter_data={"__and": [{"username": "u_name_1"}, {"last_name": "l_name_1"}]})
+
+    suggestions = {
+        (item["using"], tuple(item["columns"]), item["where"]): item for item in await suggest_indexes()
+    }
+    assert set(suggestions) == {
+        ("btree", ("gender", "is_active", "birthday"), None),
+        ("btree", ("created_at",), "birthday IS NULL"),
+        ("btree", ("username", "last_name"), None),
+    }
+    suggestion = suggestions[("btree", ("gender", "is_active", "birthday"), None)]
+    assert suggestion["calls"] == 2
+    assert suggestion["statement"] == (
+        "CREATE INDEX CONCURRENTLY ix_users_gender_is_active_birthday ON users (gender, is_active, birthday)"
+    )
+    assert (await suggest_indexes(min_calls=2))[0]["columns"] == ["gender", "is_active", "birthday"]
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Coroutine
+
+import pytest
+
+from src.app.config.settings import settings
+from src.app.core.repositories.instrumentation import slow_query_log
+from src.app.core.repositories.users import UsersRepository
+from src.app.core.utils.metrics import Histogram, metrics
+
+
+def test_histogram_quantiles() -> None:
+    histogram = Histogram(buckets=(1, 10, 100, float("inf")))
+    for value in [0.5] * 90 + [50] * 9 + [1000]:
+        histogram.observe(value)
+    info = histogram.info()
+    assert (info["count"], info["p50"], info["p95"], info["p99"]) == (100, 1, 100, 100)
+    assert histogram.quantile(1) == float("inf")
+
+
+@pytest.mark.asyncio
+async def test_repository_calls_observed(db_users: Coroutine) -> None:
+    current_users = await db_users
+    metrics.clear()
+    await UsersRepository.get_list(filter_data={"is_active": True})
+    await UsersRepository.get_list(filter_data={"is_active": False})
+
+    shape = repr((("is_active",),))
+    seconds = metrics.histogram(
+        "repository_call_seconds", repository="UsersRepository", method="get_list", shape=shape
+    )
+    assert seconds.count == 2
+    rows = metrics.histogram(
+        "repository_call_rows", repository="UsersRepository", method="get_list", shape=shape
+    )
+    assert (rows.count, rows.sum) == (2, len(current_users))
+
+    users = [user async for user in UsersRepository.iter_list()]
+    rows = metrics.histogram(
+        "repository_call_rows", repository="UsersRepository", method="iter_list", shape=repr(())
+    )
+    assert rows.sum == len(users)
+
+
+@pytest.mark.asyncio
+async def test_slow_query_logged_with_plan(db_user: Coroutine, monkeypatch: pytest.MonkeyPatch) -> None:
+    current_user = await db_user
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD", 0)
+    monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN_RATE", 1)
+    slow_query_log.clear()
+
+    await UsersRepository.get_first(filter_data={"id": current_user.id})
+
+    entry = slow_query_log.entries[-1]
+    assert (entry["repository"], entry["method"], entry["shape"]) == (
+        "UsersRepository",
+        "get_first",
+        (("id",),),
+    )
+    assert entry["sql"].startswith("SELECT users.id")
+    for _ in range(100):
+        if entry["plan"] is not None:
+            break
+        await asyncio.sleep(0.01)
+    assert entry["plan"][0]["Plan"]["Actual Rows"] == 1
+    assert "Shared Hit Blocks" in entry["plan"][0]["Plan"]
@@ -0,0 +1,101 @@
+import asyncio
+import contextvars
+from typing import Coroutine
+
+import pytest
+from asyncpg.exceptions import LockNotAvailableError
+
+from src.app.core.repositories import base
+from src.app.core.repositories.uow import UnitOfWork, current_uow
+from src.app.core.repositories.users import UsersRepository
+from src.app.extensions.cache import LocalResultCache
+from src.app.extensions.db import db
+from tests.core.repositories.fixtures import CREATE_USERS_VALID_DATA, CREATE_USER_ROW_X_VALID_DATA
+
+
+@pytest.mark.asyncio
+async def test_uow_commit(db_user: Coroutine) -> None:
+    current_user = await db_user
+    async with UnitOfWork() as uow:
+        assert current_uow.get() is uow
+        assert UsersRepository.in_transaction()
+        connection = db.bind.current_connection
+        await UsersRepository.create(CREATE_USER_ROW_X_VALID_DATA)
+        await UsersRepository.update(filter_data={"id": current_user.id}, data={"username": "uow"})
+        assert db.bind.current_connection is connection
+    assert current_uow.get() is None
+    assert not UsersRepository.in_transaction()
+    assert await UsersRepository.count() == 2
+    assert (await UsersRepository.get_first(filter_data={"id": current_user.id})).username == "uow"
+
+
+@pytest.mark.asyncio
+async def test_uow_rollback_on_exception(db_user: Coroutine) -> None:
+    await db_user
+    with pytest.raises(RuntimeError):
+        async with UnitOfWork():
+            await UsersRepository.create(CREATE_USER_ROW_X_VALID_DATA)
+            raise RuntimeError
+    assert current_uow.get() is None
+    assert await UsersRepository.count() == 1
+
+
+@pytest.mark.asyncio
+async def test_uow_rollback(db_user: Coroutine) -> None:
+    await db_user
+    async with UnitOfWork() as uow:
+        await UsersRepository.create(CREATE_USER_ROW_X_VALID_DATA)
+        uow.rollback()
+    assert await UsersRepository.count() == 1
+
+
+@pytest.mark.asyncio
+async def test_uow_nested_rollback(db_user: Coroutine) -> None:
+    await db_user
+    async with UnitOfWork():
+        await UsersRepository.create(CREATE_USERS_VALID_DATA[1])
+        async with UnitOfWork() as nested:
+            await UsersRepository.create(CREATE_USER_ROW_X_VALID_DATA)
+            nested.rollback()
+    assert await UsersRepository.count() == 2
+
+
+@pytest.mark.asyncio
+async def test_for_update_out_of_transaction(db_user: Coroutine) -> None:
+    current_user = await db_user
+    with pytest.raises(ValueError):
+        await UsersRepository.get_first(filter_data={"id": current_user.id}, for_update=True)
+    with pytest.raises(ValueError):
+        await UsersRepository.get_list(filter_data={"id": current_user.id}, for_update=True)
+
+
+@pytest.mark.asyncio
+async def test_for_update_locks_rows(db_users: Coroutine) -> None:
+    current_users = await db_users
+    ids = [user.id for user in current_users]
+    async with UnitOfWork():
+        user = await UsersRepository.get_first(filter_data={"id": ids[0]}, for_update=True)
+        users = await UsersRepository.get_list(filter_data={"id__in": ids}, order_by=["id"], for_update=True)
+        assert user.id == ids[0]
+        assert [item.id for item in users] == ids
+
+        async with db.acquire(reuse=False) as conn:
+            with pytest.raises(LockNotAvailableError):
+                await conn.scalar(db.text("SELECT id FROM users WHERE id = :id FOR UPDATE NOWAIT"), id=ids[1])
+
+
+@pytest.mark.asyncio
+async def test_uow_invalidates_results_on_commit(db_user: Coroutine, monkeypatch: pytest.MonkeyPatch) -> None:
+    current_user = await db_user
+    monkeypatch.setattr(UsersRepository, "RESULT_CACHE_TTL", 60)
+    monkeypatch.setattr(base, "result_cache", LocalResultCache(maxsize=16))
+
+    async def read() -> str:
+        return (await UsersRepository.get_first(filter_data={"id": current_user.id})).username
+
+    async with UnitOfWork():
+        await UsersRepository.update(filter_data={"id": current_user.id}, data={"username": "uow"})
+        # a concurrent read out of the transaction caches the row before the commit
+        task = contextvars.Context().run(asyncio.get_running_loop().create_task, read())
+        assert await task == current_user.username
+    assert await read() == "uow"
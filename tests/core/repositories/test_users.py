@@ -1,12 +1,20 @@
+import asyncio
+import base64
+import json
 from copy import deepcopy
-from typing import Coroutine, AsyncGenerator
+from datetime import datetime
+from typing import Any, AsyncGenerator, Coroutine, Dict, List
 
 import pytest
 
 from src.app.core.db_schemas.users import User
+from src.app.core.repositories.types import CountStrategy, ListCountMode
 from src.app.core.repositories.users import UsersRepository
+from src.app.extensions.db import db
+from src.app.extensions.replicas import replicas
 from tests.core.repositories.fixtures import (
     CREATE_USERS_VALID_DATA,
+    CREATE_USER_ROW_VALID_DATA,
     UPDATE_USER_ROW_VALID_DATA,
     CREATE_USER_ROW_X_VALID_DATA,
 )
@@ -25,6 +33,13 @@ async def test_count_not_empty(db_user: Coroutine) -> None:
     assert count_before == 1
 
 
+@pytest.mark.asyncio
+async def test_exists_success(db_user: Coroutine) -> None:
+    current_user = await db_user
+    assert await UsersRepository.exists(filter_data={"id": current_user.id}) is True
+    assert await UsersRepository.exists(filter_data={"id": current_user.id + 1}) is False
+
+
 @pytest.mark.asyncio
 async def test_get_by_field_id_success(db_user: Coroutine) -> None:
     current_user = await db_user
@@ -475,3 +490,557 @@ async def test_delete_by_field_success(db_user: Coroutine) -> None:
     count_after = await UsersRepository.count()
     assert count_after == 0
     assert isinstance(result, bool) is True
+
+
+@pytest.mark.parametrize("order_by", [["-id"], ["id"], ["created_at"], ["-username", "id"]])
+@pytest.mark.asyncio
+async def test_get_list_keyset_pages_success(order_by: list) -> None:
+    # Prepare users
+    for data in CREATE_USERS_VALID_DATA:
+        await UsersRepository.create(data)
+    users = await UsersRepository.get_list(order_by=order_by + ["id"])
+
+    # Walk through pages of 1 user
+    users_paged: list = []
+    cursor = None
+    for _ in range(len(users)):
+        page, cursor = await UsersRepository.get_list_keyset(order_by=order_by, limit=1, cursor=cursor)
+        assert len(page) == 1
+        assert isinstance(page[0], User) is True
+        users_paged.extend(page)
+    assert cursor is None
+    assert [user.id for user in users_paged] == [user.id for user in users]
+
+
+@pytest.mark.asyncio
+async def test_get_list_keyset_partial_success() -> None:
+    # Prepare users
+    for data in CREATE_USERS_VALID_DATA:
+        await UsersRepository.create(data)
+
+    page, cursor = await UsersRepository.get_list_keyset_partial(fields=["email"], limit=1)
+    assert len(page) == 1
+    assert page[0].email == CREATE_USERS_VALID_DATA[-1]["email"]
+    assert cursor is not None
+
+    page, cursor = await UsersRepository.get_list_keyset_partial(fields=["email"], limit=1, cursor=cursor)
+    assert len(page) == 1
+    assert page[0].email == CREATE_USERS_VALID_DATA[0]["email"]
+    assert cursor is None
+
+
+@pytest.mark.asyncio
+async def test_get_list_keyset_filter_success() -> None:
+    # Prepare users
+    for data in CREATE_USERS_VALID_DATA:
+        await UsersRepository.create(data)
+
+    user_email_to_filter = CREATE_USERS_VALID_DATA[0]["email"]
+    page, cursor = await UsersRepository.get_list_keyset(filter_data={"email": user_email_to_filter}, limit=1)
+    assert len(page) == 1
+    assert page[0].email == user_email_to_filter
+    assert cursor is None
+
+
+@pytest.mark.parametrize("cursor", ["x", "WzEsMl0", "e30"])
+@pytest.mark.asyncio
+async def test_get_list_keyset_invalid_cursor(cursor: str) -> None:
+    with pytest.raises(ValueError):
+        await UsersRepository.get_list_keyset(cursor=cursor)
+
+
+@pytest.mark.parametrize(
+    "order_by, values",
+    [
+        (["id"], ["1"]),
+        (["id"], [True]),
+        (["-created_at"], [1, 1]),
+        (["-created_at"], ["yesterday", 1]),
+        (["email"], [1, 1]),
+        (["uuid"], ["not a uuid", 1]),
+        (["uuid"], [{}, 1]),
+    ],
+)
+@pytest.mark.asyncio
+async def test_get_list_keyset_cursor_of_other_types(order_by: list, values: list) -> None:
+    cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+    with pytest.raises(ValueError):
+        await UsersRepository.get_list_keyset(order_by=order_by, cursor=cursor)
+
+
+@pytest.mark.asyncio
+async def test_get_first_query_cache_hit(db_user: Coroutine) -> None:
+    current_user = await db_user
+    await UsersRepository.get_first(filter_data={"email": current_user.email})
+    info_before = UsersRepository.query_cache_info()
+
+    # Same filter shape with another value reuses cached query and compiled SQL
+    user = await UsersRepository.get_first(filter_data={"email": CREATE_USER_ROW_X_VALID_DATA["email"]})
+    info_after = UsersRepository.query_cache_info()
+    assert user is None
+    assert info_after["queries"]["hits"] == info_before["queries"]["hits"] + 1
+    assert info_after["compiled"]["hits"] == info_before["compiled"]["hits"] + 1
+    assert info_after["queries"]["size"] == info_before["queries"]["size"]
+
+
+@pytest.mark.asyncio
+async def test_get_first_query_cache_none_value(db_user: Coroutine) -> None:
+    current_user = await db_user
+    assert current_user.birthday is None
+
+    user = await UsersRepository.get_first(filter_data={"birthday": None})
+    assert user.id == current_user.id
+    user = await UsersRepository.get_first(filter_data={"birthday__ne": None})
+    assert user is None
+
+
+@pytest.mark.asyncio
+async def test_create_many_success() -> None:
+    rows = []
+    for index in range(25):
+        data = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+        data.pop("secret")
+        data["email"] = f"u_name_{index}@gmail.com"
+        rows.append(data)
+
+    users = await UsersRepository.create_many(rows, chunk_size=10)
+
+    assert len(users) == len(rows)
+    assert isinstance(users[0], User) is True
+    assert [user.email for user in users] == [data["email"] for data in rows]
+    # python side defaults are generated per row
+    assert len({user.uuid for user in users}) == len(rows)
+    assert len({user.secret for user in users}) == len(rows)
+    assert await UsersRepository.count() == len(rows)
+
+
+@pytest.mark.asyncio
+async def test_create_many_different_fields_fail() -> None:
+    data = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+    data.pop("phone")
+    with pytest.raises(ValueError):
+        await UsersRepository.create_many([CREATE_USER_ROW_VALID_DATA, data])
+
+
+@pytest.mark.asyncio
+async def test_upsert_success_update(db_user: Coroutine) -> None:
+    current_user = await db_user  # noqa
+    data: Dict[str, Any] = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+    data["email"] = current_user.email
+
+    user_affected = await UsersRepository.upsert(data=data, conflict_fields=["email"], merge_fields=["meta"])
+
+    assert isinstance(user_affected, User) is True
+    assert user_affected.id == current_user.id
+    assert user_affected.meta == {**current_user.meta, **data["meta"]}
+    assert user_affected.username == data["username"]
+    assert user_affected.first_name == data["first_name"]
+    assert user_affected.updated_at > current_user.updated_at
+    assert await UsersRepository.count() == 1
+
+
+@pytest.mark.asyncio
+async def test_upsert_success_create(db_user: Coroutine) -> None:
+    current_user = await db_user  # noqa
+    data = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+
+    user_affected = await UsersRepository.upsert(data=data, conflict_fields=["email"])
+
+    assert isinstance(user_affected, User) is True
+    assert user_affected.id != current_user.id
+    assert user_affected.email == data["email"]
+    assert user_affected.meta == data["meta"]
+    assert await UsersRepository.count() == 2
+
+
+@pytest.mark.asyncio
+async def test_upsert_many_success(db_user: Coroutine) -> None:
+    current_user = await db_user  # noqa
+    rows = [deepcopy(data) for data in CREATE_USERS_VALID_DATA]
+    for data in rows:
+        data["username"] = "u_name_upserted"
+    # duplicate of the first row, the last one wins
+    rows.append({**rows[0], "first_name": "f_name_upserted"})
+
+    users = await UsersRepository.upsert_many(
+        rows, conflict_fields=["email"], update_fields=["username", "first_name"]
+    )
+
+    assert len(users) == len(CREATE_USERS_VALID_DATA)
+    assert all(user.username == "u_name_upserted" for user in users)
+    user_updated = next(user for user in users if user.email == current_user.email)
+    assert user_updated.id == current_user.id
+    assert user_updated.first_name == "f_name_upserted"
+    assert user_updated.last_name == current_user.last_name
+    assert await UsersRepository.count() == len(CREATE_USERS_VALID_DATA)
+
+
+@pytest.mark.asyncio
+async def test_upsert_many_null_conflict_values() -> None:
+    rows = []
+    for username in ("u_name_null_1", "u_name_null_2"):
+        data = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+        data.pop("secret")
+        data.update(email=None, username=username)
+        rows.append(data)
+
+    users = await UsersRepository.upsert_many(rows, conflict_fields=["email"])
+
+    # NULLs don't conflict, every row is created
+    assert sorted(user.username for user in users) == ["u_name_null_1", "u_name_null_2"]
+    assert await UsersRepository.count(filter_data={"email": None}) == 2
+
+
+@pytest.mark.asyncio
+async def test_iter_list_success() -> None:
+    rows = []
+    for index in range(25):
+        data = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+        data.pop("secret")
+        data["email"] = f"u_name_{index}@gmail.com"
+        rows.append(data)
+    await UsersRepository.create_many(rows)
+
+    users = [user async for user in UsersRepository.iter_list(order_by=["id"], prefetch=10)]
+    assert len(users) == len(rows)
+    assert isinstance(users[0], User) is True
+    assert [user.email for user in users] == [data["email"] for data in rows]
+
+    batches = [batch async for batch in UsersRepository.iter_list(prefetch=10, as_batches=True)]
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+
+
+@pytest.mark.asyncio
+async def test_iter_list_partial_filter_success() -> None:
+    for data in CREATE_USERS_VALID_DATA:
+        await UsersRepository.create(data)
+
+    user_email_to_filter = CREATE_USERS_VALID_DATA[0]["email"]
+    users = [
+        user
+        async for user in UsersRepository.iter_list_partial(
+            fields=["id", "email"], filter_data={"email": user_email_to_filter}
+        )
+    ]
+    assert len(users) == 1
+    assert users[0].email == user_email_to_filter
+
+
+@pytest.mark.asyncio
+async def test_count_by_strategy_exact(db_users: Coroutine) -> None:
+    await db_users
+    count, is_approximate = await UsersRepository.count_by_strategy(strategy=CountStrategy.EXACT)
+    assert count == len(CREATE_USERS_VALID_DATA)
+    assert is_approximate is False
+
+
+@pytest.mark.asyncio
+async def test_count_by_strategy_estimate(db_users: Coroutine) -> None:
+    await db_users
+    await db.status(db.text("ANALYZE users"))
+
+    count, is_approximate = await UsersRepository.count_by_strategy(strategy=CountStrategy.ESTIMATE)
+    assert count == len(CREATE_USERS_VALID_DATA)
+    assert is_approximate is True
+
+    user_email_to_filter = CREATE_USERS_VALID_DATA[0]["email"]
+    count, is_approximate = await UsersRepository.count_by_strategy(
+        filter_data={"email": user_email_to_filter}, strategy=CountStrategy.ESTIMATE
+    )
+    assert count == 1
+    assert is_approximate is True
+
+
+@pytest.mark.asyncio
+async def test_count_by_strategy_auto_cached(db_users: Coroutine) -> None:
+    await db_users
+    filter_data = {"is_active": True}
+    count, is_approximate = await UsersRepository.count_by_strategy(filter_data, strategy=CountStrategy.AUTO)
+    assert count == len(CREATE_USERS_VALID_DATA)
+    assert is_approximate is False
+
+    # Cached count is returned until ttl is expired
+    await UsersRepository.create(CREATE_USER_ROW_X_VALID_DATA | {"is_active": True})
+    count_cached, _ = await UsersRepository.count_by_strategy(filter_data, strategy=CountStrategy.AUTO)
+    assert count_cached == count
+    UsersRepository.COUNT_CACHE.clear()
+    count_actual, _ = await UsersRepository.count_by_strategy(filter_data, strategy=CountStrategy.AUTO)
+    assert count_actual == count + 1
+
+
+@pytest.mark.parametrize("mode", list(ListCountMode))
+@pytest.mark.asyncio
+async def test_get_list_with_count_success(db_users: Coroutine, mode: ListCountMode) -> None:
+    await db_users
+
+    users, total_count = await UsersRepository.get_list_with_count(order_by=["id"], limit=1, mode=mode)
+    assert total_count == len(CREATE_USERS_VALID_DATA)
+    assert len(users) == 1
+    assert isinstance(users[0], User) is True
+    assert users[0].email == CREATE_USERS_VALID_DATA[0]["email"]
+
+    user_email_to_filter = CREATE_USERS_VALID_DATA[1]["email"]
+    users, total_count = await UsersRepository.get_list_with_count(
+        filter_data={"email": user_email_to_filter}, mode=mode
+    )
+    assert total_count == 1
+    assert users[0].email == user_email_to_filter
+
+
+@pytest.mark.parametrize("mode", list(ListCountMode))
+@pytest.mark.asyncio
+async def test_get_list_with_count_offset_out_of_rows(db_users: Coroutine, mode: ListCountMode) -> None:
+    await db_users
+
+    users, total_count = await UsersRepository.get_list_with_count(offset=10, mode=mode)
+    assert users == []
+    assert total_count == len(CREATE_USERS_VALID_DATA)
+
+
+@pytest.mark.asyncio
+async def test_get_list_with_count_concurrent_in_transaction(db_users: Coroutine) -> None:
+    await db_users
+
+    async with db.transaction():
+        await UsersRepository.create(CREATE_USER_ROW_X_VALID_DATA)
+        users, total_count = await UsersRepository.get_list_with_count(mode=ListCountMode.CONCURRENT)
+    assert total_count == len(CREATE_USERS_VALID_DATA) + 1
+    assert len(users) == total_count
+
+
+@pytest.mark.asyncio
+async def test_get_list_filter_in_success(db_users: Coroutine) -> None:
+    current_users = await db_users
+    uuids = [user.uuid for user in current_users]
+    users = await UsersRepository.get_list(filter_data={"uuid__in": uuids}, order_by=["id"])
+    assert [user.id for user in users] == [user.id for user in current_users]
+
+    # the number of values does not change the query
+    users = await UsersRepository.get_list(filter_data={"uuid__in": uuids[:1]}, order_by=["id"])
+    assert [user.id for user in users] == [current_users[0].id]
+    assert await UsersRepository.count(filter_data={"id__in": []}) == 0
+
+
+@pytest.mark.asyncio
+async def test_get_list_filter_lookups_success(db_users: Coroutine) -> None:
+    current_users = await db_users
+    first_user, second_user = current_users[0], current_users[1]
+
+    await UsersRepository.update(filter_data={"id": first_user.id}, data={"birthday": datetime.now()})
+    assert await UsersRepository.count(filter_data={"birthday__isnull": True}) == 1
+    users = await UsersRepository.get_list(filter_data={"birthday__isnull": False})
+    assert [user.id for user in users] == [first_user.id]
+    users = await UsersRepository.get_list(filter_data={"email__ilike": "U_NAME_2@%"})
+    assert [user.id for user in users] == [second_user.id]
+    users = await UsersRepository.get_list(filter_data={"id__range": (first_user.id, first_user.id)})
+    assert [user.id for user in users] == [first_user.id]
+    users = await UsersRepository.get_list(filter_data={"meta__contains": second_user.meta})
+    assert [user.id for user in users] == [second_user.id]
+    users = await UsersRepository.get_list(filter_data={"meta__has_key": "meta_key"}, order_by=["id"])
+    assert [user.id for user in users] == [first_user.id, second_user.id]
+    assert await UsersRepository.count(filter_data={"meta__has_key": "meta_value_1"}) == 0
+
+
+@pytest.mark.asyncio
+async def test_get_list_filter_groups_success(db_users: Coroutine) -> None:
+    current_users = await db_users
+    first_user, second_user = current_users[0], current_users[1]
+
+    filter_data: Dict[str, Any] = {"__or": [{"email": first_user.email}, {"username": second_user.username}]}
+    users = await UsersRepository.get_list(filter_data=filter_data, order_by=["id"])
+    assert [user.id for user in users] == [first_user.id, second_user.id]
+
+    filter_data = {
+        "is_active": True,
+        "__or": [{"__and": [{"email": first_user.email}, {"id__gt": first_user.id}]}, {"id": second_user.id}],
+    }
+    users = await UsersRepository.get_list(filter_data=filter_data)
+    assert [user.id for user in users] == [second_user.id]
+
+    deleted = await UsersRepository.delete(
+        filter_data={"__or": [{"id": first_user.id}, {"id": second_user.id}]}
+    )
+    assert deleted is True
+    assert await UsersRepository.count() == 0
+
+
+@pytest.mark.asyncio
+async def test_get_list_filter_group_invalid() -> None:
+    with pytest.raises(ValueError):
+        await UsersRepository.get_list(filter_data={"__or": {"id": 1}})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", [ListCountMode.WINDOW, ListCountMode.CONCURRENT])
+async def test_get_list_with_count_fields(db_users: Coroutine, mode: ListCountMode) -> None:
+    current_users = await db_users
+    rows, total_count = await UsersRepository.get_list_with_count(
+        order_by=["id"], limit=1, mode=mode, fields=["id", "email"]
+    )
+    assert total_count == len(current_users)
+    assert [(row.id, row.email) for row in rows] == [(current_users[0].id, current_users[0].email)]
+
+
+@pytest.mark.asyncio
+async def test_get_first_batched_success(db_users: Coroutine, monkeypatch: pytest.MonkeyPatch) -> None:
+    current_users = await db_users
+    monkeypatch.setattr(replicas, "is_sticky", lambda: False)  # users are just created
+    loader = UsersRepository.get_loader("uuid")
+    batches = loader.batches
+
+    users = await asyncio.gather(
+        UsersRepository.get_first_batched("uuid", current_users[0].uuid),
+        UsersRepository.get_first_batched("uuid", str(current_users[1].uuid)),
+        UsersRepository.get_first_batched("uuid", str(current_users[0].uuid)),
+        UsersRepository.get_first_batched("uuid", "00000000-0000-0000-0000-000000000000"),
+    )
+    assert [getattr(user, "id", None) for user in users] == [
+        current_users[0].id,
+        current_users[1].id,
+        current_users[0].id,
+        None,
+    ]
+    assert loader.batches == batches + 1
+
+    user = await UsersRepository.get_first_batched("uuid", current_users[1].uuid, fields=["email"])
+    assert user.email == current_users[1].email
+
+
+@pytest.mark.asyncio
+async def test_get_first_batched_in_transaction(db_user: Coroutine) -> None:
+    current_user = await db_user
+    loader = UsersRepository.get_loader("email")
+    async with db.transaction():
+        await UsersRepository.update(filter_data={"id": current_user.id}, data={"email": "batched@gmail.com"})
+        user = await UsersRepository.get_first_batched("email", "batched@gmail.com")
+    assert user.id == current_user.id
+    assert loader.loads == 0
+
+
+async def _create_users(count: int) -> list:
+    rows = []
+    for index in range(count):
+        data = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+        data.pop("secret")
+        data["email"] = f"u_name_{index}@gmail.com"
+        data["is_active"] = index % 2 == 0
+        rows.append(data)
+    return await UsersRepository.create_many(rows)
+
+
+@pytest.mark.asyncio
+async def test_update_in_batches_success() -> None:
+    users = await _create_users(11)
+    progress = []
+
+    updated = await UsersRepository.update_in_batches(
+        filter_data={"is_active": True},
+        data={"is_active": False},
+        chunk_size=2,
+        on_progress=lambda chunk, total: progress.append((chunk, total)),
+    )
+
+    assert updated == 6
+    assert progress == [(2, 2), (2, 4), (2, 6)]
+    assert await UsersRepository.count(filter_data={"is_active": True}) == 0
+    assert await UsersRepository.count(filter_data={"is_active": False}) == len(users)
+
+
+@pytest.mark.asyncio
+async def test_delete_in_batches_success() -> None:
+    users = await _create_users(7)
+    progress = []
+
+    async def on_progress(chunk: int, total: int) -> None:
+        progress.append((chunk, total))
+
+    deleted = await UsersRepository.delete_in_batches(
+        filter_data={"is_active": False}, chunk_size=2, pause=0.001, on_progress=on_progress
+    )
+
+    assert deleted == 3
+    assert progress == [(2, 2), (1, 3)]
+    rows = await UsersRepository.get_list(order_by=["id"])
+    assert [user.id for user in rows] == [user.id for user in users if user.is_active]
+    assert await UsersRepository.delete_in_batches(filter_data={"is_active": False}) == 0
+
+
+@pytest.mark.asyncio
+async def test_delete_in_batches_invalid_chunk_size() -> None:
+    with pytest.raises(ValueError):
+        await UsersRepository.delete_in_batches(filter_data={}, chunk_size=0)
+
+
+@pytest.mark.asyncio
+async def test_update_merge_fields_success(db_user: Coroutine) -> None:
+    current_user = await db_user
+    user = await UsersRepository.update(
+        filter_data={"id": current_user.id},
+        data={"meta": {"meta_key_update": "meta_value_updated"}, "username": "merged"},
+        merge_fields=["meta"],
+    )
+    assert user.meta == {**current_user.meta, "meta_key_update": "meta_value_updated"}
+    assert user.username == "merged"
+
+    user = await UsersRepository.update(
+        filter_data={"id": current_user.id}, data={"meta": {"meta_key": None}}, merge_fields=["meta"]
+    )
+    assert user.meta == {"meta_key": None, "meta_key_update": "meta_value_updated"}
+
+
+@pytest.mark.asyncio
+async def test_copy_upsert_success(db_user: Coroutine) -> None:
+    current_user = await db_user  # noqa
+    rows = [
+        {"email": current_user.email, "username": "u_name_copied", "meta": {"copied": True}},
+        {"email": "u_name_copied_1@gmail.com", "username": "u_name_copied", "meta": {}},
+        {"email": "u_name_copied_2@gmail.com", "username": "u_name_copied", "meta": {}},
+        # duplicate of the previous row, the last one wins
+        {"email": "u_name_copied_2@gmail.com", "username": "u_name_copied_last", "meta": {}},
+    ]
+
+    affected = await UsersRepository.copy_upsert(rows, conflict_fields=["email"], merge_fields=["meta"])
+
+    assert affected == 3
+    user_updated = await UsersRepository.get_first(filter_data={"email": current_user.email})
+    assert user_updated.id == current_user.id
+    assert user_updated.secret == current_user.secret
+    assert user_updated.username == "u_name_copied"
+    assert user_updated.meta == {**current_user.meta, "copied": True}
+    users = await UsersRepository.get_list(filter_data={"email__in": [row["email"] for row in rows[1:]]})
+    assert {user.username for user in users} == {"u_name_copied", "u_name_copied_last"}
+    # defaults are generated per row
+    assert len({user.uuid for user in users}) == len({user.secret for user in users}) == 2
+    assert all(user.created_at is not None for user in users)
+
+    affected = await UsersRepository.copy_upsert(
+        [{"email": current_user.email, "username": "u_name_skipped"}],
+        conflict_fields=["email"],
+        update_fields=[],
+    )
+    assert affected == 0
+    assert (await UsersRepository.get_first(filter_data={"id": current_user.id})).username == "u_name_copied"
+
+
+@pytest.mark.asyncio
+async def test_copy_upsert_null_conflict_values() -> None:
+    rows: List[Dict[str, Any]] = [
+        {"email": None, "username": "u_name_null_1"},
+        {"email": None, "username": "u_name_null_2"},
+        {"email": "u_name_copied@gmail.com", "username": "u_name_copied"},
+        {"email": "u_name_copied@gmail.com", "username": "u_name_copied_last"},
+    ]
+
+    assert await UsersRepository.copy_upsert(rows, conflict_fields=["email"]) == 3
+    users = await UsersRepository.get_list(order_by=["username"])
+    assert [user.username for user in users] == ["u_name_copied_last", "u_name_null_1", "u_name_null_2"]
+
+
+@pytest.mark.asyncio
+async def test_copy_upsert_fail() -> None:
+    with pytest.raises(ValueError):
+        await UsersRepository.copy_upsert(
+            [{"email": "a@gmail.com"}, {"username": "a"}], conflict_fields=["email"]
+        )
+    with pytest.raises(ValueError):
+        await UsersRepository.copy_upsert([{"email": "a@gmail.com", "x": 1}], conflict_fields=["email"])
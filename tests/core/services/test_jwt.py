@@ -0,0 +1,35 @@
+import pytest
+from fastapi import HTTPException
+
+from src.app.core.services.jwt import JWTService
+
+USER_DATA = {"uuid": "b7a3f1c2-54d1-4c2e-9d0a-6f1e2d3c4b5a", "email": "u_name_x@gmail.com", "sid": "abcdef"}
+
+
+@pytest.fixture(scope="function", autouse=True)
+def clear_token_cache() -> None:
+    JWTService.TOKEN_CACHE.clear()
+
+
+def test_verify_access_token_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    token = JWTService.create_access_token(USER_DATA)
+    hits, misses = JWTService.TOKEN_CACHE.hits, JWTService.TOKEN_CACHE.misses
+
+    assert JWTService.verify_access_token(token) == USER_DATA
+    # next calls are not decoded
+    monkeypatch.setattr(JWTService, "_decode", lambda token: pytest.fail("decoded again"))
+    user_data = JWTService.verify_access_token(token)
+    user_data["uuid"] = None
+    assert JWTService.verify_access_token(token) == USER_DATA
+
+    assert JWTService.TOKEN_CACHE.hits - hits == 2
+    assert JWTService.TOKEN_CACHE.misses - misses == 1
+    assert JWTService.token_cache_info()["size"] == 1
+
+
+def test_verify_access_token_not_cached_invalid() -> None:
+    token = JWTService.create_access_token(USER_DATA)
+
+    with pytest.raises(HTTPException):
+        JWTService.verify_access_token(token[:-2])
+    assert len(JWTService.TOKEN_CACHE) == 0
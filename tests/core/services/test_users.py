@@ -0,0 +1,181 @@
+import asyncio
+from copy import deepcopy
+from types import SimpleNamespace
+from typing import Any, Coroutine, Dict
+
+import pytest
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+
+from src.app.core.models.users import User
+from src.app.core.repositories.types import CountStrategy
+from src.app.core.repositories.users import UsersRepository
+from src.app.core.services.users import UsersService
+from src.app.extensions.hashing import needs_rehash
+from tests.core.repositories.fixtures import CREATE_USER_ROW_X_VALID_DATA
+
+
+@pytest.mark.asyncio
+async def test_update_or_create_user_success_update(db_user: Coroutine) -> None:
+    current_user = await db_user  # noqa
+    data: Dict[str, Any] = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+    data["email"] = current_user.email
+
+    user = await UsersService(request=None).update_or_create_user(data)  # type: ignore
+
+    assert isinstance(user, User) is True
+    assert user.id == current_user.id
+    assert user.meta == {**current_user.meta, **data["meta"]}
+    assert user.username == data["username"]
+    assert await UsersRepository.count() == 1
+
+
+@pytest.mark.asyncio
+async def test_update_or_create_user_success_create(db_user: Coroutine) -> None:
+    current_user = await db_user  # noqa
+    data = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+
+    user = await UsersService(request=None).update_or_create_user(data)  # type: ignore
+
+    assert isinstance(user, User) is True
+    assert user.id != current_user.id
+    assert user.meta == data["meta"]
+    assert await UsersRepository.count() == 2
+
+
+@pytest.mark.asyncio
+async def test_get_first_fields(db_user: Coroutine) -> None:
+    current_user = await db_user
+
+    user = await UsersService(request=None).get_first(  # type: ignore
+        filter_data={"uuid": current_user.uuid}, fields=["uuid", "email"]
+    )
+
+    assert user.uuid == current_user.uuid
+    assert user.email == current_user.email
+    assert user.password_hashed is None and user.secret is None and user.meta is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "offset, count_strategy", [(0, CountStrategy.AUTO), (1, CountStrategy.EXACT), (1, CountStrategy.AUTO)]
+)
+async def test_get_users_fields(db_users: Coroutine, offset: int, count_strategy: CountStrategy) -> None:
+    current_users = await db_users
+
+    users, total_count, _, _ = await UsersService(request=None).get_users(  # type: ignore
+        order_by=["id"], offset=offset, count_strategy=count_strategy, fields=["uuid", "username"]
+    )
+
+    assert total_count == len(current_users)
+    assert [user.username for user in users] == [
+        user.username for user in current_users[offset:]
+    ]  # noqa: E203
+    assert all(user.email is None and user.secret is None for user in users)
+
+
+@pytest.mark.asyncio
+async def test_get_users_counts_with_page(monkeypatch: pytest.MonkeyPatch) -> None:
+    counted = asyncio.Event()
+
+    async def get_list_keyset(**kwargs: Any) -> tuple:
+        # the page is done only after the count is started
+        await asyncio.wait_for(counted.wait(), 1)
+        return [], None
+
+    async def count_by_strategy(**kwargs: Any) -> tuple:
+        counted.set()
+        return 0, False
+
+    monkeypatch.setattr(UsersRepository, "get_list_keyset", get_list_keyset)
+    monkeypatch.setattr(UsersRepository, "count_by_strategy", count_by_strategy)
+
+    assert await UsersService(request=None).get_users() == ([], 0, False, None)  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_get_users_offset_counts_with_page(monkeypatch: pytest.MonkeyPatch) -> None:
+    counted = asyncio.Event()
+
+    async def get_list(**kwargs: Any) -> list:
+        await asyncio.wait_for(counted.wait(), 1)
+        return []
+
+    async def count_by_strategy(**kwargs: Any) -> tuple:
+        counted.set()
+        return 0, True
+
+    monkeypatch.setattr(UsersRepository, "get_list", get_list)
+    monkeypatch.setattr(UsersRepository, "count_by_strategy", count_by_strategy)
+
+    users = await UsersService(request=None).get_users(  # type: ignore
+        offset=10, count_strategy=CountStrategy.ESTIMATE
+    )
+    assert users == ([], 0, True, None)
+
+
+@pytest.mark.asyncio
+async def test_get_users_invalid_cursor(monkeypatch: pytest.MonkeyPatch) -> None:
+    with pytest.raises(HTTPException) as e:
+        await UsersService(request=None).get_users(cursor="not a cursor")  # type: ignore
+    assert e.value.status_code == 422
+
+    async def count_by_strategy(**kwargs: Any) -> tuple:
+        raise ValueError("count failed")
+
+    monkeypatch.setattr(UsersRepository, "count_by_strategy", count_by_strategy)
+    cursor = UsersRepository.encode_cursor(SimpleNamespace(id=1), UsersRepository.cursor_ordering(["id"]))
+    with pytest.raises(ValueError):
+        await UsersService(request=None).get_users(order_by=["id"], cursor=cursor)  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_get_first_batched(db_user: Coroutine) -> None:
+    current_user = await db_user
+
+    user = await UsersService(request=None).get_first(  # type: ignore
+        filter_data={"uuid": str(current_user.uuid)}, fields=["uuid", "email"], batched=True
+    )
+
+    assert user.uuid == current_user.uuid
+    assert user.email == current_user.email
+
+
+@pytest.mark.asyncio
+async def test_iter_users_batches(db_users: Coroutine) -> None:
+    current_users = await db_users
+
+    batches = [
+        batch
+        async for batch in UsersService(request=None).iter_users_batches(  # type: ignore
+            filter_data={"gender": current_users[0].gender}, fields=["uuid", "email"], prefetch=1
+        )
+    ]
+
+    assert all(len(batch) == 1 for batch in batches)
+    assert [batch[0]["email"] for batch in batches] == [
+        user.email for user in current_users if user.gender == current_users[0].gender
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_authenticated_user_rehash(db_user: Coroutine) -> None:
+    current_user = await db_user  # noqa
+    old_hash = bcrypt.using(rounds=5).hash("password")
+    await UsersRepository.update(filter_data={"id": current_user.id}, data={"password_hashed": old_hash})
+
+    service = UsersService(request=None)  # type: ignore
+    user = await service.get_authenticated_user(current_user.email, "password")
+    await asyncio.gather(*UsersService._rehash_tasks)
+
+    assert user.id == current_user.id
+    new_hash = (await UsersRepository.get_first(filter_data={"id": current_user.id})).password_hashed
+    assert new_hash != old_hash
+    assert needs_rehash(new_hash) is False
+    assert bcrypt.verify("password", new_hash) is True
+
+
+@pytest.mark.asyncio
+async def test_get_authenticated_user_fail() -> None:
+    with pytest.raises(HTTPException):
+        await UsersService(request=None).get_authenticated_user("u_missing@gmail.com", "pass")  # type: ignore
@@ -0,0 +1,56 @@
+import time
+from typing import Coroutine
+
+import pytest
+
+from src.app.core.repositories.uow import UnitOfWork
+from src.app.core.repositories.users import UsersRepository
+from src.app.core.utils import deadline
+from src.app.core.utils.deadline import DeadlineExceeded, current_deadline
+from src.app.extensions.db import db
+
+
+def test_deadline_nested() -> None:
+    assert deadline.remaining() is None
+    with deadline.deadline(10):
+        outer = current_deadline.get()
+        with deadline.deadline(20):
+            assert current_deadline.get() == outer  # the earlier deadline is kept
+        with deadline.deadline(1):
+            remaining = deadline.remaining()
+            assert remaining is not None and remaining <= 1
+        assert current_deadline.get() == outer
+    assert current_deadline.get() is None
+
+    with deadline.deadline(0.001):
+        time.sleep(0.002)
+        with pytest.raises(DeadlineExceeded):
+            deadline.remaining()
+
+
+@pytest.mark.asyncio
+async def test_deadline_cancels_query(db_user: Coroutine) -> None:
+    await db_user
+    started_at = time.monotonic()
+    with deadline.deadline(0.2):
+        with pytest.raises(DeadlineExceeded):
+            await UsersRepository._execute("scalar", db.text("SELECT pg_sleep(5)"))
+    assert time.monotonic() - started_at < 2
+    assert await UsersRepository.count() == 1
+
+
+@pytest.mark.asyncio
+async def test_deadline_statement_timeout_in_uow(db_user: Coroutine) -> None:
+    await db_user
+    async with UnitOfWork():
+        assert await db.scalar("SHOW statement_timeout") == "0"
+
+    with deadline.deadline(5):
+        async with UnitOfWork():
+            assert await db.scalar("SHOW statement_timeout") != "0"
+        assert await db.scalar("SHOW statement_timeout") == "0"  # SET LOCAL ends with the transaction
+
+    with deadline.deadline(0.2):
+        with pytest.raises(DeadlineExceeded):
+            async with UnitOfWork():
+                await db.status("SELECT pg_sleep(5)")
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from src.app.core.utils.loader import DataLoader
+
+
+@pytest.mark.asyncio
+async def test_loads_of_one_tick_batched() -> None:
+    batches = []
+
+    async def batch_load(keys: list) -> list:
+        batches.append(keys)
+        return [key * 2 for key in keys]
+
+    loader = DataLoader(batch_load)
+    assert await asyncio.gather(loader.load(1), loader.load(2), loader.load(1)) == [2, 4, 2]
+    assert batches == [[1, 2]]
+    assert await loader.load(3) == 6
+    assert batches == [[1, 2], [3]]
+
+
+@pytest.mark.asyncio
+async def test_loads_in_flight_shared() -> None:
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def batch_load(keys: list) -> list:
+        started.set()
+        await release.wait()
+        return keys
+
+    loader = DataLoader(batch_load)
+    first = asyncio.ensure_future(loader.load("key"))
+    await started.wait()
+    second = asyncio.ensure_future(loader.load("key"))
+    release.set()
+    assert await asyncio.gather(first, second) == ["key", "key"]
+    assert loader.batches == 1
+
+
+@pytest.mark.asyncio
+async def test_loads_max_batch_size_and_errors() -> None:
+    async def batch_load(keys: list) -> list:
+        if 0 in keys:
+            raise ValueError("invalid key")
+        return keys
+
+    loader = DataLoader(batch_load, max_batch_size=2)
+    assert await asyncio.gather(loader.load(1), loader.load(2), loader.load(3)) == [1, 2, 3]
+    assert loader.batches == 2
+
+    results = await asyncio.gather(loader.load(0), loader.load(4), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
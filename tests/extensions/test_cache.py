@@ -0,0 +1,123 @@
+import time
+from typing import Any, Coroutine, Optional
+
+import pytest
+
+from src.app.core.repositories import base
+from src.app.core.repositories.users import UsersRepository
+from src.app.extensions.cache import MISSING, LocalResultCache, RedisResultCache
+from src.app.extensions.replicas import replicas
+from tests.core.repositories.fixtures import CREATE_USER_ROW_X_VALID_DATA
+
+
+class FakeRedis:
+    """Subset of redis.asyncio.Redis used by RedisResultCache"""
+
+    def __init__(self) -> None:
+        self.data: dict = {}
+
+    def _get(self, key: str) -> Optional[bytes]:
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key)
+            return None
+        return value
+
+    async def mget(self, *keys: str) -> list:
+        return [self._get(key) for key in keys]
+
+    async def set(self, key: str, value: Any, px: Optional[int] = None) -> None:
+        self.data[key] = (value, time.monotonic() + px / 1000 if px else None)
+
+    async def incr(self, key: str) -> int:
+        value = int(self._get(key) or 0) + 1
+        self.data[key] = (str(value).encode(), None)
+        return value
+
+    async def info(self, section: str) -> dict:
+        return {"evicted_keys": 0}
+
+
+@pytest.fixture(scope="function", params=["local", "redis"])
+def result_cache(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> Any:
+    cache = LocalResultCache(maxsize=16) if request.param == "local" else RedisResultCache(FakeRedis())
+    monkeypatch.setattr(base, "result_cache", cache)
+    monkeypatch.setattr(UsersRepository, "RESULT_CACHE_TTL", 60)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_result_cache_store_and_invalidate(result_cache: Any) -> None:
+    generation, value = await result_cache.lookup("users", "key")
+    assert value is MISSING
+    await result_cache.store("users", "key", generation, {"id": 1}, ttl=60)
+    assert (await result_cache.lookup("users", "key"))[1] == {"id": 1}
+
+    await result_cache.invalidate("users")
+    assert (await result_cache.lookup("users", "key"))[1] is MISSING
+    info = await result_cache.info()
+    assert (info["hits"], info["misses"], info["hit_ratio"]) == (1, 2, 1 / 3)
+
+
+@pytest.mark.asyncio
+async def test_result_cache_evictions() -> None:
+    cache = LocalResultCache(maxsize=1)
+    await cache.store("users", "key_1", 0, 1, ttl=60)
+    await cache.store("users", "key_2", 0, 2, ttl=60)
+    assert (await cache.lookup("users", "key_1"))[1] is MISSING
+    assert (await cache.info())["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_repository_reads_cached(result_cache: Any, db_users: Coroutine) -> None:
+    current_users = await db_users
+    filter_data = {"is_active": True, "id__gte": current_users[0].id}
+    users = await UsersRepository.get_list(filter_data=filter_data)
+    # filter keys order doesn't matter
+    users_cached = await UsersRepository.get_list(filter_data=dict(reversed(filter_data.items())))
+    assert [user.id for user in users_cached] == [user.id for user in users]
+    assert await UsersRepository.get_first(filter_data={"id": 0}) is None
+    assert await UsersRepository.get_first(filter_data={"id": 0}) is None
+    info = await result_cache.info()
+    assert (info["hits"], info["misses"]) == (2, 2)
+
+
+@pytest.mark.asyncio
+async def test_repository_writes_invalidate(result_cache: Any, db_users: Coroutine) -> None:
+    current_users = await db_users
+    count = await UsersRepository.count()
+    user = await UsersRepository.create(CREATE_USER_ROW_X_VALID_DATA)
+    assert await UsersRepository.count() == count + 1
+
+    await UsersRepository.update(filter_data={"id": user.id}, data={"first_name": "f_name_cached"})
+    assert (await UsersRepository.get_first(filter_data={"id": user.id})).first_name == "f_name_cached"
+    await UsersRepository.update_by_obj(user, data={"first_name": "f_name_updated"})
+    assert (await UsersRepository.get_first(filter_data={"id": user.id})).first_name == "f_name_updated"
+
+    await UsersRepository.delete(filter_data={"id": current_users[0].id})
+    assert await UsersRepository.exists(filter_data={"id": current_users[0].id}) is False
+    assert (await result_cache.info())["hits"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batched_reads_not_cached(
+    result_cache: Any, db_users: Coroutine, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    current_users = await db_users
+    monkeypatch.setattr(replicas, "is_sticky", lambda: False)  # users are just created
+    for user in current_users:
+        assert (await UsersRepository.get_first_batched("uuid", user.uuid)).id == user.id
+    assert (await UsersRepository.get_first_batched("uuid", current_users[0].uuid)).id == current_users[0].id
+    info = await result_cache.info()
+    assert (info["hits"], info["misses"]) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_repository_cached_rows_not_shared(result_cache: Any, db_user: Coroutine) -> None:
+    current_user = await db_user
+    user = await UsersRepository.get_first(filter_data={"id": current_user.id})
+    user.first_name = "f_name_changed"
+    user.meta["changed"] = True
+    user_cached = await UsersRepository.get_first(filter_data={"id": current_user.id})
+    assert (user_cached.first_name, user_cached.meta) == (current_user.first_name, current_user.meta)
+    assert (await result_cache.info())["hits"] == 1
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from typing import Generator
+
+import pytest
+from passlib.hash import bcrypt
+
+from src.app.commands.calibrate_password_hash import calibrate
+from src.app.core.services.auth import AuthService
+from src.app.core.utils.deadline import DeadlineExceeded, deadline
+from src.app.extensions.hashing import HashingOverloaded, HashingPool, needs_rehash, pwd_context
+from src.app.main import app
+
+
+def blocking_sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture(scope="function")
+def pool() -> Generator:
+    pool_ = HashingPool("thread", workers=1, max_waiting=1)
+    yield pool_
+    pool_.close()
+
+
+@pytest.mark.asyncio
+async def test_hashing_off_event_loop(pool: HashingPool) -> None:
+    ticks = 0
+
+    async def tick() -> None:
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker = asyncio.ensure_future(tick())
+    assert await pool.run(blocking_sleep, 0.2) == 0.2
+    ticker.cancel()
+    assert ticks >= 10
+
+
+@pytest.mark.asyncio
+async def test_hashing_bounded(pool: HashingPool) -> None:
+    first = asyncio.ensure_future(pool.run(blocking_sleep, 0.2))
+    second = asyncio.ensure_future(pool.run(blocking_sleep, 0.2))
+    await asyncio.sleep(0.05)
+    assert pool.info()["busy"] == 1 and pool.info()["waiting"] == 1
+
+    with pytest.raises(HashingOverloaded):
+        await pool.run(blocking_sleep, 0.2)
+    assert pool.rejected == 1
+
+    await asyncio.gather(first, second)
+    assert pool.info()["busy"] == 0 and pool.info()["waiting"] == 0
+
+    # a wait for the worker ends by the deadline
+    first = asyncio.ensure_future(pool.run(blocking_sleep, 0.2))
+    await asyncio.sleep(0.01)
+    with pytest.raises(DeadlineExceeded):
+        with deadline(0.05):
+            await pool.run(blocking_sleep, 0.2)
+    await first
+
+
+@pytest.mark.asyncio
+async def test_hashing_cancelled_wait_keeps_worker(pool: HashingPool) -> None:
+    first = asyncio.ensure_future(pool.run(blocking_sleep, 0.1))
+    await asyncio.sleep(0.01)
+    waiting = asyncio.ensure_future(pool.run(blocking_sleep, 0))
+    await asyncio.sleep(0.01)
+    await first
+    # the worker is already handed over to the waiting call when it is cancelled
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    assert pool.info()["busy"] == 0 and pool.info()["waiting"] == 0
+    assert await asyncio.wait_for(pool.run(blocking_sleep, 0), 1) == 0
+    assert not pool._semaphore.locked()  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_auth_service_password_hashing() -> None:
+    auth_service = AuthService(request=None)  # type: ignore
+    hashed = await auth_service.get_password_hashed("password")
+
+    assert await auth_service.verify_password("password", hashed) is True
+    assert await auth_service.verify_password("wrong", hashed) is False
+
+
+def test_hashing_overloaded_handler_registered() -> None:
+    assert HashingOverloaded in app.exception_handlers
+
+
+def test_needs_rehash() -> None:
+    assert needs_rehash(pwd_context.hash("password")) is False
+    assert needs_rehash(bcrypt.using(rounds=5).hash("password")) is True
+    assert needs_rehash("") is False
+    assert needs_rehash("not a hash") is False
+
+
+def test_calibrate() -> None:
+    rounds, timings = calibrate(target_seconds=60, samples=1, min_rounds=4, max_rounds=5)
+    assert rounds == 5
+    assert list(timings) == [4, 5]
+
+    rounds, _ = calibrate(target_seconds=0, samples=1, min_rounds=4, max_rounds=5)
+    assert rounds == 4
+    with pytest.raises(ValueError):
+        calibrate(target_seconds=1, min_rounds=3)
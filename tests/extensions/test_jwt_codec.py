@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.app.extensions.jwt_codec import HS256JWTCodec, InvalidToken, JoseJWTCodec, b64encode
+
+SECRET = "secret"
+CLAIMS = {"user": {"uuid": "b7a3f1c2-54d1-4c2e-9d0a-6f1e2d3c4b5a", "sid": "abcdef"}, "exp": 4102444800}
+
+jose_codec = JoseJWTCodec(SECRET, "HS256")
+hs256_codec = HS256JWTCodec(SECRET)
+
+
+def test_hs256_interoperable() -> None:
+    token = hs256_codec.encode(CLAIMS)
+
+    assert token == jose_codec.encode(CLAIMS)
+    assert jose_codec.decode(token) == CLAIMS
+    assert hs256_codec.decode(jose_codec.encode({**CLAIMS, "user": {"name": "Ünïcode"}}))["user"] == {
+        "name": "Ünïcode"
+    }
+    expires_at = datetime.utcnow() + timedelta(minutes=5)
+    assert hs256_codec.encode({"exp": expires_at}) == jose_codec.encode({"exp": expires_at})
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "",
+        "not.a.token",
+        hs256_codec.encode(CLAIMS)[:-2],
+        HS256JWTCodec("other_secret").encode(CLAIMS),
+        hs256_codec.encode({**CLAIMS, "exp": 946684800}),
+        hs256_codec.encode({**CLAIMS, "nbf": 4102444800}),
+        hs256_codec.encode({**CLAIMS, "exp": "soon"}),
+        hs256_codec.encode({**CLAIMS, "aud": "other"}),
+        b64encode(b'{"alg":"none","typ":"JWT"}').decode()
+        + "."
+        + hs256_codec.encode(CLAIMS).split(".")[1]
+        + ".",
+    ],
+)
+def test_hs256_decode_fail(token: str) -> None:
+    with pytest.raises(InvalidToken):
+        hs256_codec.decode(token)
+    with pytest.raises(InvalidToken):
+        jose_codec.decode(token)
+
+
+def test_hs256_not_supported_algorithm() -> None:
+    with pytest.raises(ValueError):
+        HS256JWTCodec(SECRET, "HS512")
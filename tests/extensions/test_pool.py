@@ -0,0 +1,97 @@
+import asyncio
+from asyncio import AbstractEventLoop
+from typing import Callable, Generator
+
+import pytest
+
+from src.app.config.settings import settings
+from src.app.core.utils.deadline import DeadlineExceeded, deadline
+from src.app.core.utils.metrics import metrics
+from src.app.extensions.pool import InstrumentedPool, PoolAcquireTimeout, create_engine, warm_up
+from src.app.main import app
+
+
+@pytest.fixture(scope="function")
+def engine(event_loop: AbstractEventLoop) -> Generator:
+    async def make(**kwargs) -> InstrumentedPool:  # type: ignore
+        engine_ = await create_engine(settings.POSTGRES_DB_URL, pool_class=InstrumentedPool, **kwargs)
+        engines.append(engine_)
+        return engine_
+
+    engines: list = []
+    yield make
+    for engine_ in engines:
+        event_loop.run_until_complete(engine_.close())
+
+
+@pytest.mark.asyncio
+async def test_pool_warm_up_and_gauges(engine: Callable) -> None:
+    metrics.clear()
+    engine_ = await engine(min_size=2, max_size=4)
+    await warm_up(engine_)
+    pool = engine_._pool
+    assert pool.info() == {
+        "min_size": 2,
+        "max_size": 4,
+        "size": 2,
+        "idle": 2,
+        "in_use": 0,
+        "waiting": 0,
+        "timeouts": 0,
+    }
+
+    async with engine_.acquire() as conn:
+        await conn.scalar("SELECT 1")
+        gauges = {item["labels"]["state"]: item["value"] for item in metrics.snapshot() if "value" in item}
+        assert gauges == {"in_use": 1, "idle": 1, "waiting": 0}
+    assert metrics.histogram("db_pool_acquire_seconds", pool=pool.name).count == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_acquire_timeout(engine: Callable, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "POSTGRES_POOL_ACQUIRE_TIMEOUT", 0.05)
+    engine_ = await engine(min_size=1, max_size=1)
+    pool = engine_._pool
+
+    async def select() -> int:
+        async with engine_.acquire(reuse=False) as conn:
+            return await conn.scalar("SELECT 1")
+
+    async with engine_.acquire():
+        with pytest.raises(PoolAcquireTimeout):
+            await select()
+        with deadline(0.01):
+            with pytest.raises(DeadlineExceeded):
+                await select()
+        assert (pool.info()["waiting"], pool.timeouts) == (0, 2)
+        waiting = asyncio.ensure_future(select())
+        await asyncio.sleep(0)
+        assert pool.info()["waiting"] == 1
+
+    # the connection is acquired once freed
+    assert await waiting == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_waiting_counts_blocked_acquires(engine: Callable) -> None:
+    engine_ = await engine(min_size=1, max_size=2)
+    pool = engine_._pool
+
+    async def hold(release: asyncio.Event) -> None:
+        async with engine_.acquire(reuse=False):
+            await release.wait()
+
+    release = asyncio.Event()
+    holders = [asyncio.ensure_future(hold(release)) for _ in range(3)]
+    await asyncio.sleep(0.1)
+    try:
+        # the second connection is opened without waiting, the third acquire waits for a free one
+        assert (pool.info()["in_use"], pool.info()["waiting"]) == (2, 1)
+    finally:
+        release.set()
+        await asyncio.gather(*holders)
+    assert pool.info()["waiting"] == 0
+
+
+def test_pool_acquire_timeout_handler_registered() -> None:
+    assert PoolAcquireTimeout in app.exception_handlers
@@ -0,0 +1,90 @@
+import asyncio
+import itertools
+from asyncio import AbstractEventLoop
+from typing import Callable, Coroutine, Generator
+
+import pytest
+
+from src.app.config.settings import settings
+from src.app.core.repositories import base
+from src.app.core.repositories.users import UsersRepository
+from src.app.extensions.db import db
+from src.app.extensions.replicas import ReplicaRouter
+from tests.core.repositories.fixtures import CREATE_USERS_VALID_DATA
+
+
+def make_router(**kwargs) -> ReplicaRouter:  # type: ignore
+    options = {"max_lag": 5, "health_interval": 0, "stickiness": 0, "hedge_delay": 0}
+    options.update(kwargs)
+    # the primary plays the replica role, its lag is 0
+    return ReplicaRouter([settings.POSTGRES_DB_URL], min_size=1, max_size=2, **options)
+
+
+@pytest.fixture(scope="function")
+def router(event_loop: AbstractEventLoop, monkeypatch: pytest.MonkeyPatch) -> Generator:
+    async def make(**kwargs) -> ReplicaRouter:  # type: ignore
+        router_ = make_router(**kwargs)
+        await router_.connect()
+        monkeypatch.setattr(base, "replicas", router_)
+        routers.append(router_)
+        return router_
+
+    routers: list = []
+    yield make
+    for router_ in routers:
+        event_loop.run_until_complete(router_.close())
+
+
+@pytest.mark.asyncio
+async def test_reads_routed_to_replica(router: Callable, db_users: Coroutine) -> None:
+    router_ = await router()
+    await db_users
+    assert router_.replicas[0].is_healthy is True
+    assert router_.replicas[0].lag == 0
+
+    users = await UsersRepository.get_list()
+    assert len(users) == len(CREATE_USERS_VALID_DATA)
+    assert await UsersRepository.count() == len(CREATE_USERS_VALID_DATA)
+    assert router_.replicas[0].reads == 2
+
+
+@pytest.mark.asyncio
+async def test_reads_stick_to_primary_after_write(router: Callable) -> None:
+    router_ = await router(stickiness=60)
+    user = await UsersRepository.create(CREATE_USERS_VALID_DATA[0])
+    assert (await UsersRepository.get_first(filter_data={"id": user.id})).id == user.id
+    assert router_.replicas[0].reads == 0
+
+
+@pytest.mark.asyncio
+async def test_reads_in_transaction_on_primary(router: Callable) -> None:
+    router_ = await router()
+    async with db.transaction():
+        await UsersRepository.create(CREATE_USERS_VALID_DATA[0])
+        assert await UsersRepository.count() == 1
+    assert router_.replicas[0].reads == 0
+
+
+@pytest.mark.asyncio
+async def test_lagging_replica_not_used(router: Callable, db_user: Coroutine) -> None:
+    router_ = await router(max_lag=-1)
+    await db_user
+    assert router_.replicas[0].is_healthy is False
+    assert await UsersRepository.count() == 1
+    assert router_.replicas[0].reads == 0
+
+
+@pytest.mark.asyncio
+async def test_hedged_read_first_result_wins() -> None:
+    router_ = ReplicaRouter(["slow", "fast"], max_lag=5, health_interval=0, stickiness=0, hedge_delay=0.01)
+    for replica in router_.replicas:
+        replica.engine, replica.is_healthy = replica.dsn, True
+
+    async def run(engine: str) -> str:
+        await asyncio.sleep(10 if engine == "slow" else 0)
+        return engine
+
+    router_._counter = itertools.count()  # the slow replica goes first
+    assert await router_.execute(run, primary="primary") == "fast"
+    assert router_.hedged_reads == 1
+    assert [replica.reads for replica in router_.replicas] == [1, 1]
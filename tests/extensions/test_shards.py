@@ -0,0 +1,295 @@
+import uuid
+from asyncio import AbstractEventLoop
+from copy import deepcopy
+from typing import Callable, Generator, List
+
+import pytest
+from asyncpg.exceptions import UniqueViolationError
+
+from src.app.commands.rebalance_shards import rebalance
+from src.app.config.settings import settings
+from src.app.core.repositories.shard_directory import ShardDirectoryRepository
+from src.app.core.repositories.types import CountStrategy, ListCountMode
+from src.app.core.repositories.users import UsersRepository
+from src.app.extensions.db import db
+from src.app.extensions.pool import create_engine
+from src.app.extensions.shards import Shard, ShardRouter, shards
+from tests.core.repositories.fixtures import CREATE_USER_ROW_X_VALID_DATA
+
+SHARDS_COUNT = 3
+
+
+def shard_dsn(index: int) -> str:
+    return f"{settings.POSTGRES_DB_URL}_shard_{index}"
+
+
+@pytest.fixture(scope="function")
+def use_shards(event_loop: AbstractEventLoop, monkeypatch: pytest.MonkeyPatch) -> Generator:
+    """Local databases <POSTGRES_DB>_shard_<index> play shards, the default one keeps the directory"""
+
+    async def create_shard(index: int) -> Shard:
+        name = f"{settings.POSTGRES_DB}_shard_{index}"
+        if not await db.scalar(db.text("SELECT 1 FROM pg_database WHERE datname = :name"), name=name):
+            await db.status(db.text(f'CREATE DATABASE "{name}"'))
+        shard = Shard(index, shard_dsn(index))
+        shard.engine = await create_engine(shard.dsn, min_size=1, max_size=4)
+        with shards.using(shard):
+            await db.gino.create_all()
+        return shard
+
+    async def make(count: int) -> List[Shard]:
+        while len(created) < count:
+            created.append(await create_shard(len(created)))
+        monkeypatch.setattr(shards, "shards", created[:count])
+        return created[:count]
+
+    created: List[Shard] = []
+    yield make
+    for shard in created:
+        with shards.using(shard):
+            event_loop.run_until_complete(db.gino.drop_all())
+        if shard.engine is not None:
+            event_loop.run_until_complete(shard.engine.close())
+
+
+async def _create_users(count: int) -> list:
+    users = []
+    for index in range(count):
+        data = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+        data.pop("secret")
+        data["email"] = f"u_name_{index}@gmail.com"
+        users.append(await UsersRepository.create(data))
+    return users
+
+
+async def _shard_emails(shard: Shard) -> set:
+    with shards.using(shard):
+        return {user.email for user in await UsersRepository.get_list(limit=None)}
+
+
+def test_shard_for_rendezvous() -> None:
+    keys = [str(uuid.uuid4()) for _ in range(1000)]
+    router = ShardRouter([shard_dsn(index) for index in range(SHARDS_COUNT)])
+    grown = ShardRouter([shard_dsn(index) for index in range(SHARDS_COUNT + 1)])
+
+    assigned = {key: router.shard_for(key).index for key in keys}
+    assert set(assigned.values()) == set(range(SHARDS_COUNT))
+    assert all(router.shard_for(key).index == index for key, index in assigned.items())
+    # keys move to the added shard only
+    moved = [key for key in keys if grown.shard_for(key).index != assigned[key]]
+    assert moved and all(grown.shard_for(key).index == SHARDS_COUNT for key in moved)
+
+
+@pytest.mark.asyncio
+async def test_sharded_users(use_shards: Callable) -> None:
+    shards_ = await use_shards(SHARDS_COUNT)
+    users = await _create_users(12)
+
+    for shard in shards_:
+        assert await _shard_emails(shard) == {
+            user.email for user in users if UsersRepository.shard_of(user.uuid) is shard
+        }
+    assert await ShardDirectoryRepository.count() == len(users)
+    assert (await UsersRepository.get_first(filter_data={"uuid": users[3].uuid})).email == users[3].email
+    assert (await UsersRepository.get_first(filter_data={"email": users[4].email})).uuid == users[4].uuid
+    assert await UsersRepository.count() == len(users)
+    assert await UsersRepository.count(filter_data={"email": users[5].email}) == 1
+
+    emails = sorted(user.email for user in users)
+    page = await UsersRepository.get_list(order_by=["-email"], limit=4, offset=2)
+    assert [user.email for user in page] == emails[::-1][2:6]
+    rows = await UsersRepository.get_list_partial(fields=["uuid"], order_by=["email"], limit=None)
+    assert [row["email"] for row in rows] == emails
+
+    # emails are unique across shards
+    data = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+    data.update(email=users[0].email, secret="secret_y")
+    with pytest.raises(UniqueViolationError):
+        await UsersRepository.create(data)
+    assert await ShardDirectoryRepository.count() == len(users)
+
+
+@pytest.mark.asyncio
+async def test_sharded_users_update_delete(use_shards: Callable) -> None:
+    await use_shards(SHARDS_COUNT)
+    users = await _create_users(4)
+
+    updated = await UsersRepository.update(
+        filter_data={"uuid": users[0].uuid}, data={"email": "u_name_updated@gmail.com"}
+    )
+    assert updated.uuid == users[0].uuid
+    assert (
+        await UsersRepository.get_first(filter_data={"email": "u_name_updated@gmail.com"})
+    ).id == updated.id
+    assert await ShardDirectoryRepository.count(filter_data={"key": users[0].email}) == 0
+
+    assert await UsersRepository.delete(filter_data={"email__in": [users[1].email, users[2].email]}) is True
+    assert await UsersRepository.count() == 2
+    keys = {entry.key for entry in await ShardDirectoryRepository.get_list(limit=None)}
+    assert keys == {"u_name_updated@gmail.com", users[3].email}
+
+
+@pytest.mark.asyncio
+async def test_rebalance(use_shards: Callable, monkeypatch: pytest.MonkeyPatch) -> None:
+    await use_shards(1)
+    users = await _create_users(10)
+    shards_ = await use_shards(SHARDS_COUNT)
+    monkeypatch.setattr(settings, "POSTGRES_SHARD_MIGRATING", True)
+
+    misplaced = [user for user in users if UsersRepository.shard_of(user.uuid).index != 0]
+    assert misplaced
+    # not moved rows are found on their previous shard
+    assert (await UsersRepository.get_first(filter_data={"uuid": misplaced[0].uuid})).id == misplaced[0].id
+
+    stats = await rebalance(batch_size=3, dry_run=True)
+    assert stats[0] == {"checked": len(users), "moved": len(misplaced)}
+    stats = await rebalance(batch_size=3)
+    assert stats[0] == {"checked": len(users), "moved": len(misplaced)}
+
+    for shard in shards_:
+        assert await _shard_emails(shard) == {
+            user.email for user in users if UsersRepository.shard_of(user.uuid) is shard
+        }
+    entries = await ShardDirectoryRepository.get_list(limit=None)
+    assert {entry.key: entry.shard for entry in entries} == {
+        user.email: UsersRepository.shard_of(user.uuid).index for user in users
+    }
+    assert all(stats_["moved"] == 0 for stats_ in (await rebalance(dry_run=True)).values())
+
+
+@pytest.mark.asyncio
+async def test_sharded_users_reads(use_shards: Callable) -> None:
+    await use_shards(SHARDS_COUNT)
+    users = await _create_users(9)
+    emails = sorted(user.email for user in users)
+
+    assert await UsersRepository.exists(filter_data={"email": users[2].email}) is True
+    assert await UsersRepository.exists(filter_data={"email": "missing@gmail.com"}) is False
+    assert await UsersRepository.count_estimate() >= 0
+    UsersRepository.COUNT_CACHE.clear()
+    assert await UsersRepository.count_by_strategy(strategy=CountStrategy.AUTO) == (len(users), False)
+
+    pages, cursor = [], None
+    while True:
+        rows, cursor = await UsersRepository.get_list_keyset_partial(
+            fields=["uuid"], order_by=["email"], limit=4, cursor=cursor
+        )
+        pages.append([row["email"] for row in rows])
+        if cursor is None:
+            break
+        assert UsersRepository.decode_cursor(cursor, UsersRepository.cursor_ordering(["email"]))
+    assert pages == [emails[:4], emails[4:8], emails[8:]]
+    rows, cursor = await UsersRepository.get_list_keyset(filter_data={"email": users[1].email})
+    assert [row.uuid for row in rows] == [users[1].uuid] and cursor is None
+
+    for mode in ListCountMode:
+        rows, total_count = await UsersRepository.get_list_with_count(
+            order_by=["-email"], limit=3, offset=2, mode=mode
+        )
+        assert [row.email for row in rows] == emails[::-1][2:5]
+        assert total_count == len(users)
+
+    batches = [
+        [row["email"] for row in batch]
+        async for batch in UsersRepository.iter_list_partial(
+            fields=["uuid"], order_by=["email"], prefetch=4, as_batches=True
+        )
+    ]
+    assert batches == [emails[:4], emails[4:8], emails[8:]]
+    assert [row.email async for row in UsersRepository.iter_list(order_by=["email"])] == emails
+
+
+@pytest.mark.asyncio
+async def test_sharded_users_upserts(use_shards: Callable) -> None:
+    await use_shards(SHARDS_COUNT)
+    users = await _create_users(2)
+
+    data = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+    data.pop("secret")
+    data.update(email=users[0].email, first_name="upserted", meta={"upserted": True})
+    row = await UsersRepository.upsert(data=data, conflict_fields=["email"], merge_fields=["meta"])
+    assert (row.uuid, row.first_name, row.meta["upserted"]) == (users[0].uuid, "upserted", True)
+
+    created = await UsersRepository.create_many(
+        [{**data, "email": f"u_name_many_{index}@gmail.com"} for index in range(4)]
+    )
+    assert len(created) == 4
+    rows = [
+        {**data, "email": email, "last_name": "upserted"}
+        for email in ("u_name_new@gmail.com", users[1].email)
+    ]
+    affected = await UsersRepository.upsert_many(
+        rows + [{**rows[0], "last_name": "last"}], conflict_fields=["email"]
+    )
+    assert sorted(row.last_name for row in affected) == ["last", "upserted"]
+    assert (
+        await UsersRepository.copy_upsert(
+            [{"email": users[1].email, "phone": "1"}, {"email": "u_name_copy@gmail.com", "phone": "2"}],
+            conflict_fields=["email"],
+        )
+        == 2
+    )
+
+    emails = {user.email for user in await UsersRepository.get_list(limit=None)}
+    assert len(emails) == await UsersRepository.count() == 8
+    entries = await ShardDirectoryRepository.get_list(limit=None)
+    assert {entry.key for entry in entries} == emails
+    for entry in entries:
+        with shards.using(shards.shards[entry.shard]):
+            assert await UsersRepository.exists(filter_data={"email": entry.key})
+
+    with pytest.raises(ValueError):
+        await UsersRepository.upsert(data=data, conflict_fields=["phone"])
+    with pytest.raises(ValueError):
+        await UsersRepository.upsert(data=data, conflict_fields=["email"], update_fields=["uuid"])
+
+
+@pytest.mark.asyncio
+async def test_sharded_users_batches(use_shards: Callable) -> None:
+    await use_shards(SHARDS_COUNT)
+    users = await _create_users(7)
+    progress: list = []
+
+    updated = await UsersRepository.update_in_batches(
+        filter_data={"is_active": False},
+        data={"is_active": True},
+        chunk_size=2,
+        pause=0,
+        on_progress=lambda affected, total: progress.append(total),
+    )
+    assert updated == progress[-1] == len(users)
+    assert await UsersRepository.count(filter_data={"is_active": True}) == len(users)
+    with pytest.raises(ValueError):
+        await UsersRepository.update_in_batches(filter_data={}, data={"email": "x@gmail.com"})
+
+    row = await UsersRepository.update_by_obj(users[0], {"first_name": "by_obj"})
+    assert (row.uuid, row.first_name) == (users[0].uuid, "by_obj")
+
+    deleted = await UsersRepository.delete_in_batches(
+        filter_data={"email__in": [user.email for user in users[:5]]}, chunk_size=2, pause=0
+    )
+    assert deleted == 5
+    assert await UsersRepository.count() == 2
+    keys = {entry.key for entry in await ShardDirectoryRepository.get_list(limit=None)}
+    assert keys == {user.email for user in users[5:]}
+
+
+@pytest.mark.asyncio
+async def test_sharded_users_get_or_create(use_shards: Callable) -> None:
+    await use_shards(SHARDS_COUNT)
+    users = await _create_users(3)
+
+    row = await UsersRepository.get_or_create(filter_data={"uuid": users[1].uuid}, data={})
+    assert row.id == users[1].id
+    row = await UsersRepository.get_or_create(filter_data={"email": users[2].email}, data={})
+    assert row.uuid == users[2].uuid
+
+    data = deepcopy(CREATE_USER_ROW_X_VALID_DATA)
+    data.pop("secret")
+    data["email"] = "u_name_created@gmail.com"
+    row = await UsersRepository.get_or_create(filter_data={"email": data["email"]}, data=data)
+    assert (await UsersRepository.get_first(filter_data={"email": data["email"]})).uuid == row.uuid
+
+    row = await UsersRepository.update_or_create("email", data["email"], {"first_name": "updated"})
+    assert row.first_name == "updated"
+    assert await UsersRepository.count() == 4
@@ -0,0 +1,24 @@
+import pytest
+
+from src.app import main
+from src.app.config.settings import settings
+from src.app.extensions.db import db
+
+
+@pytest.mark.asyncio
+async def test_shutdown_before_db_is_closed(monkeypatch: pytest.MonkeyPatch) -> None:
+    reported = []
+
+    async def log_index_suggestions() -> None:
+        reported.append(await db.scalar("SELECT 1"))
+
+    monkeypatch.setattr(main, "log_index_suggestions", log_index_suggestions)
+    monkeypatch.setattr(settings, "INDEX_ADVISOR_REPORT", True)
+    application = main.init_app()
+    bind = db.bind
+    try:
+        await application.router.startup()
+        await application.router.shutdown()
+    finally:
+        db.bind = bind
+    assert reported == [1]